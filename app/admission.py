@@ -0,0 +1,298 @@
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+from app import metrics
+from app.tenant_config import get_tenant_setting
+
+# =====================================================
+# Admission control for retrieval + generation
+# =====================================================
+# In front of the expensive /query stages (store open, embedding,
+# search, LLM), per worker process:
+#
+#   1. per-tenant token bucket ("rate_limit_per_second" and
+#      "rate_limit_burst" tenant settings; unset = unlimited)
+#      -> 429 + Retry-After when empty
+#   2. global in-flight limit (P1_MAX_IN_FLIGHT). Requests beyond it
+#      wait in per-tenant queues served round-robin, so one tenant's
+#      backlog cannot starve the others.
+#      -> 429 when the tenant already has "max_queued" requests waiting
+#      -> 503 + Retry-After when the expected (or actual) wait exceeds
+#         P1_ADMISSION_MAX_WAIT_MS
+#
+# Waiting happens on the event loop (admit() is async), before the work
+# is handed to the threadpool: a queued request holds no thread, so the
+# round-robin queue sees every waiting request. Tokens are reserved on
+# arrival and returned if the request is shed while queued.
+#
+# Limits are keyed by the tenant_id claim set by auth_middleware().
+
+MAX_IN_FLIGHT = int(os.getenv("P1_MAX_IN_FLIGHT", "32"))
+MAX_WAIT_SECONDS = float(os.getenv("P1_ADMISSION_MAX_WAIT_MS", "5000")) / 1000.0
+MAX_QUEUED_PER_TENANT = int(os.getenv("P1_ADMISSION_MAX_QUEUED", "64"))
+DEFAULT_RATE_PER_SECOND = float(os.getenv("P1_TENANT_RATE_PER_SECOND", "0"))  # 0 = unlimited
+
+# Smoothing for the service-time estimate used to predict queue waits
+_EWMA_ALPHA = 0.2
+
+
+class Rejected(Exception):
+    """
+    Request shed by admission control; rendered as status_code with a
+    Retry-After header.
+    """
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(int(math.ceil(retry_after)), 1)
+
+    @property
+    def detail(self) -> str:
+        if self.status_code == 429:
+            return "Too many requests for this tenant, retry later."
+        return "Server is busy, retry later."
+
+
+_lock = threading.Lock()
+_buckets: Dict[str, List[float]] = {}  # tenant_id -> [tokens, last_refill]
+_in_flight = 0
+_waiting: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+_service_seconds = 0.0  # EWMA of time a slot is held
+
+
+class _Waiter:
+    """
+    A queued request. `granted` is decided under _lock; the future only
+    wakes the waiting coroutine (on its own loop).
+    """
+
+    __slots__ = ("loop", "future", "granted")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future: "asyncio.Future[None]" = loop.create_future()
+        self.granted = False
+
+    def grant(self) -> None:
+        # Caller holds _lock
+        self.granted = True
+        self.loop.call_soon_threadsafe(_wake, self.future)
+
+
+def _wake(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+metrics.describe("p1_admission_rejections_total", "counter", "Requests shed by admission control")
+metrics.describe("p1_admission_wait_seconds", "histogram", "Time spent queued for an in-flight slot")
+
+
+# =====================================================
+# Token bucket
+# =====================================================
+def _rate_limit(tenant_id: str):
+    rate = get_tenant_setting(tenant_id, "rate_limit_per_second", DEFAULT_RATE_PER_SECOND)
+    rate = float(rate or 0)
+    if rate <= 0:
+        return None, None
+    burst = float(get_tenant_setting(tenant_id, "rate_limit_burst", max(rate, 1.0)))
+    return rate, max(burst, 1.0)
+
+
+def _take_tokens(tenant_id: str, tokens: int) -> None:
+    rate, burst = _rate_limit(tenant_id)
+    if rate is None:
+        return
+
+    now = time.monotonic()
+    with _lock:
+        bucket = _buckets.setdefault(tenant_id, [burst, now])
+        bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+
+        # A batch larger than the burst is admitted once the bucket is
+        # full and then leaves it in debt
+        needed = min(float(tokens), burst)
+        if bucket[0] < needed:
+            _reject(tenant_id, 429, "rate_limited", (needed - bucket[0]) / rate)
+        bucket[0] -= tokens
+
+
+def _refund_tokens(tenant_id: str, tokens: int) -> None:
+    # The request was shed before it got a slot
+    rate, burst = _rate_limit(tenant_id)
+    if rate is None:
+        return
+
+    with _lock:
+        bucket = _buckets.get(tenant_id)
+        if bucket is not None:
+            bucket[0] = min(burst, bucket[0] + tokens)
+
+
+# =====================================================
+# In-flight slots + round-robin queue
+# =====================================================
+def _reject(tenant_id: str, status_code: int, reason: str, retry_after: float):
+    metrics.inc("p1_admission_rejections_total", {"tenant_id": tenant_id, "reason": reason})
+    raise Rejected(status_code, reason, retry_after)
+
+
+def _queued_ahead(tenant_id: str) -> int:
+    # Round-robin: a new request for this tenant waits behind its own
+    # queue plus at most that many (+1) requests of every other tenant
+    own = len(_waiting.get(tenant_id) or ())
+    return own + sum(
+        min(len(q), own + 1) for t, q in _waiting.items() if t != tenant_id
+    )
+
+
+async def _acquire_slot(tenant_id: str) -> None:
+    global _in_flight
+
+    with _lock:
+        if _in_flight < MAX_IN_FLIGHT and not _waiting:
+            _in_flight += 1
+            return
+
+        queue = _waiting.get(tenant_id)
+        max_queued = int(get_tenant_setting(tenant_id, "max_queued", MAX_QUEUED_PER_TENANT))
+        if queue is not None and len(queue) >= max_queued:
+            _reject(tenant_id, 429, "queue_full", _service_seconds or 1.0)
+
+        expected_wait = (_queued_ahead(tenant_id) + 1) * _service_seconds / max(MAX_IN_FLIGHT, 1)
+        if expected_wait > MAX_WAIT_SECONDS:
+            _reject(tenant_id, 503, "overloaded", expected_wait)
+
+        waiter = _Waiter(asyncio.get_running_loop())
+        if queue is None:
+            queue = _waiting[tenant_id] = deque()
+        queue.append(waiter)
+
+    started = time.monotonic()
+    try:
+        await asyncio.wait_for(waiter.future, MAX_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        with _lock:
+            if not waiter.granted:
+                _dequeue(tenant_id, queue, waiter)
+                _reject(tenant_id, 503, "queue_timeout", _service_seconds or MAX_WAIT_SECONDS)
+        # Granted just as the wait timed out: the slot is ours
+    except asyncio.CancelledError:
+        # Client went away while queued
+        with _lock:
+            granted = waiter.granted
+            if not granted:
+                _dequeue(tenant_id, queue, waiter)
+        if granted:
+            _release_slot(0.0, observe=False)
+        raise
+
+    metrics.observe("p1_admission_wait_seconds", {"tenant_id": tenant_id}, time.monotonic() - started)
+
+
+def _dequeue(tenant_id: str, queue: "Deque[_Waiter]", waiter: _Waiter) -> None:
+    # Caller holds _lock
+    queue.remove(waiter)
+    if not queue and _waiting.get(tenant_id) is queue:
+        del _waiting[tenant_id]
+
+
+def _release_slot(held_seconds: float, observe: bool = True) -> None:
+    global _in_flight, _service_seconds
+
+    with _lock:
+        if observe:
+            _service_seconds = (
+                held_seconds if _service_seconds == 0.0
+                else (1 - _EWMA_ALPHA) * _service_seconds + _EWMA_ALPHA * held_seconds
+            )
+
+        if not _waiting:
+            _in_flight -= 1
+            return
+
+        # Hand the slot straight to the next tenant in turn
+        tenant_id, queue = next(iter(_waiting.items()))
+        waiter = queue.popleft()
+        if queue:
+            _waiting.move_to_end(tenant_id)
+        else:
+            del _waiting[tenant_id]
+        waiter.grant()
+
+
+@asynccontextmanager
+async def admit(
+    tenant_id: str, tokens: int = 1, timings: Optional[metrics.Timings] = None
+) -> AsyncIterator[None]:
+    """
+    Holds one in-flight slot for the block after charging `tokens`
+    against the tenant's rate limit. Raises Rejected. Time spent
+    waiting is recorded as the "admission" stage.
+
+    Use from the event loop, and run the blocking work inside the block
+    in the threadpool.
+    """
+    timings = timings or metrics.Timings()
+
+    with timings.span("admission"):
+        _take_tokens(tenant_id, tokens)
+        if MAX_IN_FLIGHT > 0:
+            try:
+                await _acquire_slot(tenant_id)
+            except BaseException:
+                _refund_tokens(tenant_id, tokens)
+                raise
+
+    if MAX_IN_FLIGHT <= 0:
+        yield
+        return
+
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        _release_slot(time.monotonic() - started)
+
+
+# =====================================================
+# Introspection
+# =====================================================
+def stats() -> Dict[str, Any]:
+    with _lock:
+        queued = {tenant_id: len(q) for tenant_id, q in _waiting.items()}
+        in_flight = _in_flight
+
+    return {
+        "in_flight": in_flight,
+        "max_in_flight": MAX_IN_FLIGHT,
+        "queued": sum(queued.values()),
+        "queued_by_tenant": queued,
+        "service_ms_estimate": round(_service_seconds * 1000.0, 3),
+    }
+
+
+def _gauges():
+    snapshot = stats()
+    samples = [
+        ("p1_admission_in_flight", {}, snapshot["in_flight"]),
+        ("p1_admission_queue_depth_total", {}, snapshot["queued"]),
+    ]
+    samples.extend(
+        ("p1_admission_queue_depth", {"tenant_id": tenant_id}, depth)
+        for tenant_id, depth in snapshot["queued_by_tenant"].items()
+    )
+    return samples
+
+
+metrics.register_gauges(_gauges)
@@ -0,0 +1,193 @@
+import os
+import math
+import time
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from app import metrics, snapshot
+from app.persist import chunk_id_for
+from app.tenant_config import get_tenant_setting
+
+# =====================================================
+# Semantic answer cache (per tenant, per process, opt-in)
+# =====================================================
+# Rephrasings of a question ("What are Volvo's core values?" /
+# "Volvo core values?") retrieve the same chunks and get the same
+# answer, but each pays a generate_answer() call. A direct_answer is
+# reused when a new query
+#
+#   1. retrieves exactly the same chunk set, and
+#   2. has a query embedding within the cosine similarity threshold
+#      of the cached query's.
+#
+# Tenant settings (app.tenant_config):
+#   "semantic_answer_cache": true             enable (default off)
+#   "semantic_answer_cache_threshold": 0.95   minimum cosine similarity
+#
+# Entries are dropped when the tenant is reindexed: explicitly by
+# store_vectors() and, for other processes, because the cache is tagged
+# with the index version it was filled from.
+
+DEFAULT_THRESHOLD = float(os.getenv("P1_ANSWER_CACHE_THRESHOLD", "0.95"))
+MAX_ENTRIES_PER_TENANT = int(os.getenv("P1_ANSWER_CACHE_SIZE", "256"))
+TTL_SECONDS = float(os.getenv("P1_ANSWER_CACHE_TTL_SECONDS", "3600"))
+
+# Phrasings kept per chunk set
+MAX_ENTRIES_PER_CHUNK_SET = 8
+
+ChunkKey = FrozenSet[str]
+
+
+class Entry:
+    __slots__ = ("query", "answer", "embedding", "expires_at", "created_at")
+
+    def __init__(self, query: str, answer: str, embedding: "array[float]"):
+        self.query = query
+        self.answer = answer
+        self.embedding = embedding
+        self.created_at = time.monotonic()
+        self.expires_at = self.created_at + TTL_SECONDS
+
+
+class _TenantCache:
+    def __init__(self, generation: Optional[str]):
+        self.generation = generation
+        # chunk set -> phrasings that retrieved it; insertion order = LRU
+        self.entries: "OrderedDict[ChunkKey, List[Entry]]" = OrderedDict()
+        self.size = 0
+
+
+_lock = threading.Lock()
+_tenants: Dict[str, _TenantCache] = {}
+
+
+metrics.describe("p1_answer_cache_total", "counter", "Semantic answer cache lookups by result")
+
+
+def enabled(tenant_id: str) -> bool:
+    return MAX_ENTRIES_PER_TENANT > 0 and bool(
+        get_tenant_setting(tenant_id, "semantic_answer_cache", False)
+    )
+
+
+def chunk_key(results) -> ChunkKey:
+    """
+    Identity of a retrieved chunk set, independent of order and score.
+    """
+    return frozenset(
+        chunk_id_for(doc.metadata.get("source"), doc.metadata.get("page"), doc.page_content)
+        for doc, _score in results
+    )
+
+
+def _normalized(embedding) -> "Optional[array[float]]":
+    values = [float(x) for x in embedding]
+    norm = math.sqrt(sum(x * x for x in values))
+    if norm == 0.0:
+        return None
+    return array("f", (x / norm for x in values))
+
+
+def _generation(tenant_id: str) -> Optional[str]:
+    # Changes whenever the tenant is reindexed (in any process)
+    current = snapshot.current(tenant_id)
+    if current is not None:
+        return current
+    try:
+        path = os.path.join(snapshot.TENANTS_ROOT, tenant_id, "chroma", "chroma.sqlite3")
+        return str(os.stat(path).st_mtime_ns)
+    except OSError:
+        return None
+
+
+def _tenant(tenant_id: str, generation: Optional[str]) -> _TenantCache:
+    # Caller holds _lock
+    cache = _tenants.get(tenant_id)
+    if cache is None or cache.generation != generation:
+        cache = _tenants[tenant_id] = _TenantCache(generation)
+    return cache
+
+
+def lookup(tenant_id: str, embedding, key: ChunkKey) -> Optional[Dict[str, Any]]:
+    """
+    Cached answer for a query with this embedding and chunk set, as
+    {"answer", "query", "similarity", "age_seconds"}, or None.
+    """
+    query_vector = _normalized(embedding)
+    best = None
+
+    if query_vector is not None:
+        now = time.monotonic()
+        threshold = float(get_tenant_setting(tenant_id, "semantic_answer_cache_threshold", DEFAULT_THRESHOLD))
+        generation = _generation(tenant_id)
+        with _lock:
+            cache = _tenant(tenant_id, generation)
+            entries = cache.entries.get(key) or []
+            for entry in entries:
+                if entry.expires_at <= now:
+                    continue
+                similarity = sum(a * b for a, b in zip(query_vector, entry.embedding))
+                if similarity >= threshold and (best is None or similarity > best[0]):
+                    best = (similarity, entry)
+            if best is not None:
+                cache.entries.move_to_end(key)
+
+    metrics.inc("p1_answer_cache_total", {"tenant_id": tenant_id, "result": "hit" if best else "miss"})
+    if best is None:
+        return None
+
+    similarity, entry = best
+    return {
+        "answer": entry.answer,
+        "query": entry.query,
+        "similarity": round(similarity, 4),
+        "age_seconds": round(time.monotonic() - entry.created_at, 1),
+    }
+
+
+def store(tenant_id: str, embedding, key: ChunkKey, query: str, answer: str) -> None:
+    query_vector = _normalized(embedding)
+    if query_vector is None:
+        return
+
+    now = time.monotonic()
+    generation = _generation(tenant_id)
+    with _lock:
+        cache = _tenant(tenant_id, generation)
+        entries = cache.entries.pop(key, [])
+
+        live = [e for e in entries if e.expires_at > now]
+        live.append(Entry(query, answer, query_vector))
+        live = live[-MAX_ENTRIES_PER_CHUNK_SET:]
+        cache.size += len(live) - len(entries)
+        cache.entries[key] = live
+
+        while cache.size > MAX_ENTRIES_PER_TENANT and cache.entries:
+            _, dropped = cache.entries.popitem(last=False)
+            cache.size -= len(dropped)
+
+
+def clear(tenant_id: str) -> None:
+    with _lock:
+        _tenants.pop(tenant_id, None)
+
+
+def footprint() -> Dict[str, int]:
+    """
+    Approximate resident bytes per tenant (used by app.memory_budget).
+    """
+    with _lock:
+        caches = [
+            (tenant_id, [e for entries in cache.entries.values() for e in entries])
+            for tenant_id, cache in _tenants.items()
+        ]
+
+    return {
+        tenant_id: sum(
+            200 + len(e.query) + len(e.answer) + e.embedding.itemsize * len(e.embedding)
+            for e in entries
+        )
+        for tenant_id, entries in caches
+    }
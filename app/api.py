@@ -1,7 +1,7 @@
 import os
 import re
+import time
 import uuid
-import sqlite3
 from datetime import datetime, timezone
 from typing import Optional, Any
 
@@ -9,12 +9,32 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 
 from app.llm import generate_answer
-from app.retrieve import retrieve, dedupe_results, MAX_DISTANCE
-from app.persist import save_query_result
+from app.retrieve import (
+    document_source,
+    retrieve_with_embedding,
+    retrieve_many_with_embeddings,
+    dedupe_results,
+    MAX_DISTANCE,
+)
+from app import (
+    admission,
+    answer_cache,
+    conversation_cache,
+    db_pool,
+    memory_budget,
+    metrics,
+    persist_queue,
+    profiler,
+    retention,
+    startup,
+)
+from app.persist import ensure_schema, migrate_all_tenants
 from app.read_api import router as read_router
 
 # -----------------------------------------------------
@@ -38,18 +58,137 @@ app.add_middleware(
 
 app.include_router(read_router)
 
-from app.auth import auth_middleware
+from app.auth import METRICS_PUBLIC, auth_middleware, is_privileged
 
 auth_middleware(app)
 
 # -----------------------------------------------------
-# Health
+# Health (liveness) / readiness
 # -----------------------------------------------------
+@app.get("/ready")
+def readiness_check():
+    # 503 until warmup (model + hot tenant stores) has finished
+    return JSONResponse(
+        status_code=200 if startup.is_ready() else 503,
+        content=startup.readiness(),
+    )
+
+
 @app.get("/health")
 def health_check():
+    # Unauthenticated: liveness only (internals are in /admin/runtime)
     return {"status": "ok"}
 
 
+# -----------------------------------------------------
+# Load shedding (admission control)
+# -----------------------------------------------------
+@app.exception_handler(admission.Rejected)
+def admission_rejected(request: Request, exc: admission.Rejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail, "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+# -----------------------------------------------------
+# Metrics (Prometheus text format)
+# -----------------------------------------------------
+@app.get("/metrics")
+def metrics_endpoint(request: Request):
+    # Series are labelled with every tenant's id
+    if not METRICS_PUBLIC and not is_privileged(request):
+        raise HTTPException(status_code=403, detail="Requires a privileged token")
+    return PlainTextResponse(
+        metrics.render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+def _runtime_gauges():
+    persistence = persist_queue.stats()
+    pool = db_pool.stats()
+    return [
+        ("p1_persist_queue_depth", {}, persistence["queue_depth"]),
+        ("p1_persist_oldest_pending_seconds", {}, persistence["oldest_pending_ms"] / 1000.0),
+        ("p1_persist_last_batch_lag_seconds", {}, persistence["last_batch_lag_ms"] / 1000.0),
+        ("p1_db_connections_in_use", {}, pool["connections_in_use"]),
+        ("p1_db_connections_idle", {}, pool["connections_idle"]),
+    ]
+
+
+metrics.register_gauges(_runtime_gauges)
+
+
+# -----------------------------------------------------
+# Admin: resident memory per tenant (this worker process)
+# -----------------------------------------------------
+@app.get("/admin/memory")
+def memory_report(request: Request):
+    if not is_privileged(request):
+        raise HTTPException(status_code=403, detail="Requires a privileged token")
+    return memory_budget.report()
+
+
+@app.get("/admin/runtime")
+def runtime_report(request: Request):
+    # Write-behind queue, DB pools, admission queues and warmup detail
+    # (this worker process); lists tenant ids
+    if not is_privileged(request):
+        raise HTTPException(status_code=403, detail="Requires a privileged token")
+    return {
+        "pid": os.getpid(),
+        "persistence": persist_queue.stats(),
+        "db_pool": db_pool.stats(),
+        "admission": admission.stats(),
+        "warmup": startup.readiness(detail=True),
+    }
+
+
+@app.get("/admin/persistence/failures")
+def persistence_failures(request: Request):
+    # Rows the write-behind writer could not commit (this worker process)
+    if not is_privileged(request):
+        raise HTTPException(status_code=403, detail="Requires a privileged token")
+    return {"pid": os.getpid(), "failures": persist_queue.recent_failures()}
+
+
+@app.on_event("startup")
+def migrate_tenant_dbs():
+    # Optional: pay schema migrations up front instead of on first use
+    if os.getenv("P1_MIGRATE_ON_STARTUP") == "true":
+        migrate_all_tenants()
+
+
+@app.on_event("startup")
+def start_warmup():
+    # Background: the server accepts requests (and /health) immediately
+    startup.start_warmup()
+
+
+@app.on_event("startup")
+async def size_threadpool():
+    # Admitted /query work runs in the threadpool; leave room for it plus
+    # the sync endpoints (reads, ingestion, health)
+    import anyio.to_thread
+
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = max(limiter.total_tokens, admission.MAX_IN_FLIGHT + 16)
+
+
+@app.on_event("startup")
+def start_retention():
+    # No-op unless P1_RETENTION_INTERVAL_SECONDS > 0
+    retention.start_scheduler()
+
+
+@app.on_event("shutdown")
+def flush_persistence():
+    retention.stop_scheduler()
+    persist_queue.shutdown()
+
+
 # -----------------------------------------------------
 # Ingestion API (DISABLED IN CI)
 # -----------------------------------------------------
@@ -92,30 +231,64 @@ def wrap_response(
 
 
 # =====================================================
-# Persistence wrapper (BEST-EFFORT)
+# Persistence wrapper (BEST-EFFORT, write-behind)
 # =====================================================
-def persist_and_return(response: dict):
+def persist_and_return(response: dict, timings: Optional[metrics.Timings] = None):
+    if timings is not None and response.get("debug") is not None:
+        # Stages up to here; persistence time is only in /metrics
+        response["debug"]["timings"] = timings.as_ms()
+
+    timings = timings or metrics.Timings()
+    with timings.span("persist"):
+        try:
+            persist_queue.submit(response)
+        except Exception:
+            pass
+        else:
+            conversation_cache.record_response(response)
+
+    metrics.observe_query(response["tenant_id"], response["mode"], timings)
+    return response
+
+
+def persist_many_and_return(responses: list[dict], timings_list: list[metrics.Timings]):
+    # Batch form of persist_and_return(): one hand-off for the whole wave
+    for response, timings in zip(responses, timings_list):
+        if response.get("debug") is not None:
+            response["debug"]["timings"] = timings.as_ms()
+
+    started = time.perf_counter()
     try:
-        save_query_result(
-            tenant_id=response["tenant_id"],
-            conversation_id=response["conversation_id"],
-            payload=response,
-        )
+        persist_queue.submit_many(responses)
     except Exception:
         pass
-    return response
+    else:
+        for response in responses:
+            conversation_cache.record_response(response)
+    elapsed = time.perf_counter() - started
+
+    for response, timings in zip(responses, timings_list):
+        timings.add("persist", elapsed)
+        metrics.observe_query(response["tenant_id"], response["mode"], timings)
+    return responses
 
 
 # =====================================================
-# DB-backed conversation state
+# DB-backed conversation state (cached)
 # =====================================================
 def get_last_successful_query(tenant_id: str, conversation_id: str) -> Optional[str]:
+    return conversation_cache.get_last_successful_query(
+        tenant_id, conversation_id, _load_last_successful_query
+    )
+
+
+def _load_last_successful_query(tenant_id: str, conversation_id: str) -> Optional[str]:
     db_path = os.path.join("data", "tenants", tenant_id, "p1.db")
     if not os.path.isfile(db_path):
         return None
 
-    conn = sqlite3.connect(db_path)
-    try:
+    ensure_schema(db_path)
+    with db_pool.connection(db_path) as conn:
         row = conn.execute(
             """
             SELECT query
@@ -129,18 +302,29 @@ def get_last_successful_query(tenant_id: str, conversation_id: str) -> Optional[
             (tenant_id, conversation_id),
         ).fetchone()
         return row[0] if row else None
-    finally:
-        conn.close()
 
 
 # =====================================================
 # Request model
 # =====================================================
+class DocumentScope(BaseModel):
+    document: str  # file name, as listed by GET /tenants/{tenant_id}/documents
+    # Inclusive, numbered like citation "page"; None = open-ended
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+
+
 class QueryRequest(BaseModel):
     query: str
     conversation_id: str
     tenant_id: Optional[str] = None
     debug: bool = False
+    profile: bool = False  # privileged tokens only
+    scope: Optional[list[DocumentScope]] = None  # search only these documents/pages
+
+
+class QueryBatchRequest(BaseModel):
+    items: list[QueryRequest]
 
 
 # =====================================================
@@ -210,102 +394,290 @@ def build_citations(results: list[tuple[Any, float]]) -> list[dict]:
 # Main Query Endpoint
 # =====================================================
 @app.post("/query")
-def query_docs(payload: QueryRequest, request: Request):
-    original_query = payload.query
+async def query_docs(payload: QueryRequest, request: Request):
+    if payload.profile and not is_privileged(request):
+        raise HTTPException(status_code=403, detail="Profiling requires a privileged token")
+
     tenant_id = request.state.tenant_id
-    conversation_id = payload.conversation_id
+    timings = metrics.Timings()
 
-    # ---------------- reset ----------------
-    if is_reset_query(original_query):
-        return persist_and_return(
-            wrap_response(
-                tenant_id=tenant_id,
-                conversation_id=conversation_id,
-                query=original_query,
-                mode="hard_refusal",
-                answer=refusal_message("reset"),
-                citations=[],
-                artifacts={"reason": "reset"},
-                debug={"reset": True} if payload.debug else None,
+    response = screen_query(payload, tenant_id)
+    if response is not None:
+        return await run_in_threadpool(run_query, payload, tenant_id, timings, response)
+
+    # Retrieval + generation only run once admitted (429/503 otherwise);
+    # the wait happens here on the event loop, not on a threadpool thread
+    async with admission.admit(tenant_id, timings=timings):
+        return await run_in_threadpool(run_query, payload, tenant_id, timings)
+
+
+def run_query(
+    payload: QueryRequest,
+    tenant_id: str,
+    timings: metrics.Timings,
+    screened: Optional[dict] = None,
+) -> dict:
+    # Threadpool side of /query (the profiler samples this thread)
+    if not payload.profile:
+        return answer_query(payload, tenant_id, timings, screened)
+
+    with profiler.SamplingProfiler() as prof:
+        response = answer_query(payload, tenant_id, timings, screened)
+
+    summary = profiler.save(prof, tenant_id, response["request_id"])
+
+    # Copy: the persisted response may still be queued for write-behind
+    response = dict(response)
+    response["debug"] = {**(response.get("debug") or {}), "profile": summary}
+    return response
+
+
+# Upper bound on items per /query/batch request
+QUERY_BATCH_MAX_ITEMS = int(os.getenv("P1_QUERY_BATCH_MAX_ITEMS", "100"))
+
+
+@app.post("/query/batch")
+async def query_batch(payload: QueryBatchRequest, request: Request):
+    """
+    N queries for the authenticated tenant, each answered exactly as
+    /query would. Items are processed in waves so that items sharing a
+    conversation_id see each other's results (same rewrite as sequential
+    /query calls); within a wave the store is opened once, queries are
+    embedded and searched together and results are persisted together.
+    """
+    items = payload.items
+    if len(items) > QUERY_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {QUERY_BATCH_MAX_ITEMS} items per batch",
+        )
+    if any(item.profile for item in items):
+        raise HTTPException(status_code=400, detail="profile is not supported in batch")
+
+    tenant_id = request.state.tenant_id
+
+    # Wave n holds the n-th item of every conversation
+    waves: list[list[int]] = []
+    seen: dict[str, int] = {}
+    for index, item in enumerate(items):
+        wave = seen.get(item.conversation_id, 0)
+        seen[item.conversation_id] = wave + 1
+        if wave == len(waves):
+            waves.append([])
+        waves[wave].append(index)
+
+    # Admitted as a whole: one in-flight slot, one token per item
+    admitted = metrics.Timings()
+    async with admission.admit(tenant_id, tokens=len(items), timings=admitted):
+        results = await run_in_threadpool(answer_waves, items, waves, tenant_id, admitted)
+
+    return {"tenant_id": tenant_id, "count": len(results), "results": results}
+
+
+def answer_waves(
+    items: list[QueryRequest], waves: list[list[int]], tenant_id: str, admitted: metrics.Timings
+) -> list[Optional[dict]]:
+    results: list[Optional[dict]] = [None] * len(items)
+    for wave in waves:
+        wave_items = [items[i] for i in wave]
+        for index, response in zip(wave, answer_wave(wave_items, tenant_id, admitted)):
+            results[index] = response
+    return results
+
+
+def answer_wave(
+    items: list[QueryRequest], tenant_id: str, admitted: metrics.Timings
+) -> list[dict]:
+    # At most one item per conversation_id
+    timings_list = [metrics.Timings() for _ in items]
+    for timings in timings_list:
+        for stage, seconds in admitted.stages.items():
+            timings.add(stage, seconds)
+    responses: list[Optional[dict]] = [screen_query(item, tenant_id) for item in items]
+
+    pending = [i for i, response in enumerate(responses) if response is None]
+    rewritten = {
+        i: rewrite_query(items[i], tenant_id, timings_list[i]) for i in pending
+    }
+
+    # One shared retrieval per distinct scope
+    by_scope: dict[Optional[tuple], list[int]] = {}
+    for i in pending:
+        by_scope.setdefault(retrieval_scope(items[i], tenant_id), []).append(i)
+
+    for scope, indexes in by_scope.items():
+        shared = metrics.Timings()
+        retrieved, embeddings = retrieve_many_with_embeddings(
+            [rewritten[i] for i in indexes], k=6, tenant_id=tenant_id, timings=shared,
+            scope=scope and list(scope),
+        )
+
+        for i, (raw_results, status), query_embedding in zip(indexes, retrieved, embeddings):
+            # Every item waited for the shared open/embed/search work
+            for stage, seconds in shared.stages.items():
+                timings_list[i].add(stage, seconds)
+            responses[i] = build_answer(
+                items[i], tenant_id, rewritten[i], raw_results, status, timings_list[i],
+                query_embedding=query_embedding,
             )
+
+    return persist_many_and_return(responses, timings_list)
+
+
+def answer_query(
+    payload: QueryRequest,
+    tenant_id: str,
+    timings: metrics.Timings,
+    screened: Optional[dict] = None,
+) -> dict:
+    # screened: the rule-based response from screen_query(), if any;
+    # otherwise the caller holds an admission slot
+    response = screened
+    if response is None:
+        rewritten_query = rewrite_query(payload, tenant_id, timings)
+
+        scope = retrieval_scope(payload, tenant_id)
+        raw_results, status, query_embedding = retrieve_with_embedding(
+            rewritten_query, k=6, tenant_id=tenant_id, timings=timings,
+            scope=scope and list(scope),
         )
 
-    # ---------------- rewrite (DB-backed) ----------------
-    last_successful_query = get_last_successful_query(tenant_id, conversation_id)
+        response = build_answer(
+            payload, tenant_id, rewritten_query, raw_results, status, timings,
+            query_embedding=query_embedding,
+        )
 
-    rewritten_query = (
-        f"In the context of {last_successful_query}, {original_query}"
-        if len(original_query.split()) <= 6 and last_successful_query
-        else original_query
-    )
+    return persist_and_return(response, timings)
+
+
+# =====================================================
+# Query stages (shared by /query and /query/batch)
+# =====================================================
+def screen_query(payload: QueryRequest, tenant_id: str) -> Optional[dict]:
+    """
+    Rule-based responses that never reach retrieval (reset, vague,
+    external comparison). None = continue to retrieval.
+    """
+    original_query = payload.query
+    conversation_id = payload.conversation_id
+
+    # ---------------- reset ----------------
+    if is_reset_query(original_query):
+        return wrap_response(
+            tenant_id=tenant_id,
+            conversation_id=conversation_id,
+            query=original_query,
+            mode="hard_refusal",
+            answer=refusal_message("reset"),
+            citations=[],
+            artifacts={"reason": "reset"},
+            debug={"reset": True} if payload.debug else None,
+        )
 
     # ---------------- refusals ----------------
     if is_vague_query(original_query):
-        return persist_and_return(
-            wrap_response(
-                tenant_id=tenant_id,
-                conversation_id=conversation_id,
-                query=original_query,
-                mode="hard_refusal",
-                answer=refusal_message("no_chunks"),
-                citations=[],
-                artifacts={"reason": "vague_query"},
-                debug={"reason": "vague_query"} if payload.debug else None,
-            )
+        return wrap_response(
+            tenant_id=tenant_id,
+            conversation_id=conversation_id,
+            query=original_query,
+            mode="hard_refusal",
+            answer=refusal_message("no_chunks"),
+            citations=[],
+            artifacts={"reason": "vague_query"},
+            debug={"reason": "vague_query"} if payload.debug else None,
         )
 
     if mentions_external_entity(original_query):
-        return persist_and_return(
-            wrap_response(
-                tenant_id=tenant_id,
-                conversation_id=conversation_id,
-                query=original_query,
-                mode="hard_refusal",
-                answer=refusal_message("external_entity"),
-                citations=[],
-                artifacts={"reason": "external_entity"},
-                debug={"reason": "external_entity"} if payload.debug else None,
-            )
+        return wrap_response(
+            tenant_id=tenant_id,
+            conversation_id=conversation_id,
+            query=original_query,
+            mode="hard_refusal",
+            answer=refusal_message("external_entity"),
+            citations=[],
+            artifacts={"reason": "external_entity"},
+            debug={"reason": "external_entity"} if payload.debug else None,
         )
 
-    # ---------------- retrieval ----------------
-    raw_results, status = retrieve(
-        rewritten_query, k=6, tenant_id=tenant_id, return_status=True
+    return None
+
+
+def retrieval_scope(payload: QueryRequest, tenant_id: str) -> Optional[tuple]:
+    """
+    The request's document scope as retrieve() takes it:
+    ((source, first_page, last_page), ...), or None for the whole
+    tenant. Hashable, so batch items can share a retrieval.
+    """
+    if not payload.scope:
+        return None
+    return tuple(
+        (document_source(tenant_id, item.document), item.page_start, item.page_end)
+        for item in payload.scope
     )
-    results = dedupe_results(raw_results)
+
+
+def rewrite_query(payload: QueryRequest, tenant_id: str, timings: metrics.Timings) -> str:
+    # ---------------- rewrite (cached, DB-backed) ----------------
+    # Only needed once the request is headed for retrieval.
+    original_query = payload.query
+
+    with timings.span("rewrite_lookup"):
+        last_successful_query = get_last_successful_query(tenant_id, payload.conversation_id)
+
+    return (
+        f"In the context of {last_successful_query}, {original_query}"
+        if len(original_query.split()) <= 6 and last_successful_query
+        else original_query
+    )
+
+
+def build_answer(
+    payload: QueryRequest,
+    tenant_id: str,
+    rewritten_query: str,
+    raw_results: list,
+    status: str,
+    timings: metrics.Timings,
+    query_embedding: Optional[list] = None,
+) -> dict:
+    """
+    Mode selection (and answer generation) from retrieval results.
+    query_embedding enables the tenant's semantic answer cache.
+    """
+    original_query = payload.query
+    conversation_id = payload.conversation_id
+
+    with timings.span("dedupe"):
+        results = dedupe_results(raw_results)
 
     if status == "no_documents_ingested":
-        return persist_and_return(
-            wrap_response(
-                tenant_id=tenant_id,
-                conversation_id=conversation_id,
-                query=original_query,
-                mode="hard_refusal",
-                answer="There are no documents available yet to answer this question.",
-                citations=[],
-                artifacts={"reason": "no_documents_ingested"},
-                debug={"status": status} if payload.debug else None,
-            )
+        return wrap_response(
+            tenant_id=tenant_id,
+            conversation_id=conversation_id,
+            query=original_query,
+            mode="hard_refusal",
+            answer="There are no documents available yet to answer this question.",
+            citations=[],
+            artifacts={"reason": "no_documents_ingested"},
+            debug={"status": status} if payload.debug else None,
         )
 
     if not results:
-        return persist_and_return(
-            wrap_response(
-                tenant_id=tenant_id,
-                conversation_id=conversation_id,
-                query=original_query,
-                mode="hard_refusal",
-                answer=refusal_message("no_chunks"),
-                citations=[],
-                artifacts={"reason": "no_chunks"},
-                debug={
-                    "status": status,
-                    "rewritten_query": rewritten_query,
-                    "results_count": 0,
-                }
-                if payload.debug
-                else None,
-            )
+        return wrap_response(
+            tenant_id=tenant_id,
+            conversation_id=conversation_id,
+            query=original_query,
+            mode="hard_refusal",
+            answer=refusal_message("no_chunks"),
+            citations=[],
+            artifacts={"reason": "no_chunks"},
+            debug={
+                "status": status,
+                "rewritten_query": rewritten_query,
+                "results_count": 0,
+            }
+            if payload.debug
+            else None,
         )
 
     best_score = min(score for _, score in results)
@@ -316,50 +688,17 @@ def query_docs(payload: QueryRequest, request: Request):
     # - If we HAVE chunks, we should NOT return blank answer.
     # - We will still show citations + chunk evidence.
     if is_explanatory_query(original_query) or best_score > MAX_DISTANCE:
-        return persist_and_return(
-            wrap_response(
-                tenant_id=tenant_id,
-                conversation_id=conversation_id,
-                query=original_query,
-                mode="guided_fallback",
-                answer="No direct answer was found verbatim in the documents. Try asking more specifically, or use keywords from the document.",
-                citations=citations,
-                artifacts={
-                    "reason": "No direct answer was found in the documents for this question.",
-                    "best_score": best_score,
-                },
-                debug={
-                    "rewritten_query": rewritten_query,
-                    "best_score": best_score,
-                    "max_distance": MAX_DISTANCE,
-                    "results_count": len(results),
-                }
-                if payload.debug
-                else None,
-            )
-        )
-
-    # ---------------- direct answer ----------------
-    contexts = [
-        {
-            "content": doc.page_content,
-            "source": doc.metadata.get("source"),
-            "page": doc.metadata.get("page"),
-        }
-        for doc, _score in results
-    ]
-
-    answer = generate_answer(rewritten_query, contexts)
-
-    return persist_and_return(
-        wrap_response(
+        return wrap_response(
             tenant_id=tenant_id,
             conversation_id=conversation_id,
             query=original_query,
-            mode="direct_answer",
-            answer=answer,
+            mode="guided_fallback",
+            answer="No direct answer was found verbatim in the documents. Try asking more specifically, or use keywords from the document.",
             citations=citations,
-            artifacts={"additional_resources": [], "best_score": best_score},
+            artifacts={
+                "reason": "No direct answer was found in the documents for this question.",
+                "best_score": best_score,
+            },
             debug={
                 "rewritten_query": rewritten_query,
                 "best_score": best_score,
@@ -369,4 +708,54 @@ def query_docs(payload: QueryRequest, request: Request):
             if payload.debug
             else None,
         )
+
+    # ---------------- direct answer ----------------
+    contexts = [
+        {
+            "content": doc.page_content,
+            "source": doc.metadata.get("source"),
+            "page": doc.metadata.get("page"),
+        }
+        for doc, _score in results
+    ]
+
+    # Same chunks + near-identical query: reuse the answer (app.answer_cache)
+    cache_key = cached = None
+    if query_embedding is not None and answer_cache.enabled(tenant_id):
+        with timings.span("answer_cache"):
+            cache_key = answer_cache.chunk_key(results)
+            cached = answer_cache.lookup(tenant_id, query_embedding, cache_key)
+
+    if cached is not None:
+        answer = cached["answer"]
+    else:
+        with timings.span("generate"):
+            answer = generate_answer(rewritten_query, contexts)
+        if cache_key is not None:
+            answer_cache.store(tenant_id, query_embedding, cache_key, rewritten_query, answer)
+
+    debug = None
+    if payload.debug:
+        debug = {
+            "rewritten_query": rewritten_query,
+            "best_score": best_score,
+            "max_distance": MAX_DISTANCE,
+            "results_count": len(results),
+        }
+        if cache_key is not None:
+            debug["answer_cache"] = (
+                {"hit": True, **{k: v for k, v in cached.items() if k != "answer"}}
+                if cached is not None
+                else {"hit": False}
+            )
+
+    return wrap_response(
+        tenant_id=tenant_id,
+        conversation_id=conversation_id,
+        query=original_query,
+        mode="direct_answer",
+        answer=answer,
+        citations=citations,
+        artifacts={"additional_resources": [], "best_score": best_score},
+        debug=debug,
     )
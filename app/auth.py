@@ -1,16 +1,206 @@
 import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 from fastapi import Request, HTTPException
 from jose import jwt, JWTError
 from fastapi.responses import JSONResponse
 
 
+logger = logging.getLogger("p1.auth")
+
+# Signing keys:
+#   - P1_JWT_SECRET: single key (kid-less tokens, and tokens whose kid is
+#     not in the keys file)
+#   - P1_JWT_KEYS_FILE: JSON {"keys": {"<kid>": "<secret>", ...}}, re-read
+#     when it changes, for zero-downtime rotation (add new key, switch
+#     issuers, then remove the old one)
 JWT_SECRET = os.getenv("P1_JWT_SECRET")
-if not JWT_SECRET:
+JWT_KEYS_FILE = os.getenv("P1_JWT_KEYS_FILE")
+if not JWT_SECRET and not JWT_KEYS_FILE:
     raise RuntimeError("P1_JWT_SECRET is not set")
 JWT_ALGO = "HS256"
 
-EXEMPT_PATHS = {"/health"}
+# Verified-token cache: sha256(token) -> (tenant_id, claims, expires_at)
+TOKEN_CACHE_SIZE = int(os.getenv("P1_AUTH_CACHE_SIZE", "10000"))
+TOKEN_CACHE_MAX_TTL_SECONDS = float(os.getenv("P1_AUTH_CACHE_MAX_TTL_SECONDS", "300"))
+
+EXEMPT_PATHS = {"/health", "/ready"}
+
+# Let a Prometheus scraper read /metrics without a token (opt-in:
+# label values include tenant ids). Otherwise it needs a privileged token.
+METRICS_PUBLIC = os.getenv("P1_METRICS_PUBLIC") == "true"
+if METRICS_PUBLIC:
+    EXEMPT_PATHS.add("/metrics")
+
+_TENANT_PATH = re.compile(r"^/tenants/([^/]*)")
+
+_keys_lock = threading.Lock()
+# generation changes on every reload; tokens verified under an older
+# generation are not cached
+_keys_state: Dict[str, Any] = {"mtime": None, "keys": {}, "generation": 0}
+
+_cache_lock = threading.Lock()
+_token_cache: "OrderedDict[bytes, Tuple[str, Dict[str, Any], float]]" = OrderedDict()
+
+
+# =====================================================
+# Signing keys
+# =====================================================
+def _load_keys() -> Dict[str, str]:
+    if not JWT_KEYS_FILE:
+        return {}
+
+    try:
+        mtime = os.path.getmtime(JWT_KEYS_FILE)
+    except OSError:
+        mtime = None
 
+    with _keys_lock:
+        if _keys_state["mtime"] == mtime:
+            return _keys_state["keys"]
+
+        if mtime is None:
+            # Deleted or renamed: fail closed, its kids are revoked
+            logger.error("JWT keys file is missing; no kid keys are active")
+            _set_keys(None, {})
+            return _keys_state["keys"]
+
+        try:
+            with open(JWT_KEYS_FILE, "r", encoding="utf-8") as f:
+                keys = json.load(f).get("keys") or {}
+            if not isinstance(keys, dict):
+                raise ValueError("keys must be an object of kid -> secret")
+        except Exception:
+            logger.exception("Failed to load JWT keys file")
+            return _keys_state["keys"]
+
+        _set_keys(mtime, {str(k): str(v) for k, v in keys.items()})
+        return _keys_state["keys"]
+
+
+def _set_keys(mtime: Optional[float], keys: Dict[str, str]) -> None:
+    # Caller holds _keys_lock
+    _keys_state["mtime"] = mtime
+    _keys_state["keys"] = keys
+
+    # Removed keys must stop authenticating immediately
+    with _cache_lock:
+        _keys_state["generation"] += 1
+        _token_cache.clear()
+
+
+def _candidate_secrets(token: str) -> List[str]:
+    keys = _load_keys()
+
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
+    except JWTError:
+        kid = None
+
+    if kid is not None and kid in keys:
+        return [keys[kid]]
+    if kid is not None:
+        # Unknown kid (or no keys file): tokens signed with the single
+        # secret may carry a kid too
+        return [JWT_SECRET] if JWT_SECRET else []
+
+    secrets = [JWT_SECRET] if JWT_SECRET else []
+    secrets.extend(s for s in keys.values() if s != JWT_SECRET)
+    return secrets
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """
+    Full verification (signature + registered claims) against the
+    active keys. Raises JWTError.
+    """
+    secrets = _candidate_secrets(token)
+    if not secrets:
+        raise JWTError("Unknown signing key")
+
+    error: Optional[JWTError] = None
+    for secret in secrets:
+        try:
+            return jwt.decode(
+                token,
+                secret,
+                algorithms=[JWT_ALGO],
+                options={"verify_aud": False},
+            )
+        except JWTError as e:
+            error = e
+    raise error
+
+
+# =====================================================
+# Verified-token cache
+# =====================================================
+def verify_token(token: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Returns (tenant_id, claims) for a valid token, serving repeat tokens
+    from a bounded cache until their exp (capped by the max TTL).
+    Raises JWTError / ValueError (missing tenant_id).
+    """
+    # Picks up key rotation (and clears the cache) before any cache hit
+    _load_keys()
+    generation = _keys_state["generation"]
+
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    now = time.time()
+
+    with _cache_lock:
+        entry = _token_cache.get(key)
+        if entry is not None:
+            if entry[2] > now:
+                _token_cache.move_to_end(key)
+                return entry[0], entry[1]
+            del _token_cache[key]
+
+    claims = decode_token(token)
+
+    tenant_id = claims.get("tenant_id")
+    if not tenant_id:
+        raise ValueError("tenant_id missing in token")
+
+    expires_at = now + TOKEN_CACHE_MAX_TTL_SECONDS
+    if isinstance(claims.get("exp"), (int, float)):
+        expires_at = min(expires_at, float(claims["exp"]))
+
+    if TOKEN_CACHE_SIZE > 0 and expires_at > now:
+        with _cache_lock:
+            # Keys reloaded while verifying: the result may be stale
+            if _keys_state["generation"] == generation:
+                _token_cache[key] = (tenant_id, claims, expires_at)
+                _token_cache.move_to_end(key)
+                while len(_token_cache) > TOKEN_CACHE_SIZE:
+                    _token_cache.popitem(last=False)
+
+    return tenant_id, claims
+
+
+def clear_token_cache() -> None:
+    with _cache_lock:
+        _token_cache.clear()
+
+
+def is_privileged(request: Request) -> bool:
+    """
+    Operator tokens carry "p1_admin": true (debug/admin features such as
+    request profiling).
+    """
+    claims = getattr(request.state, "token_claims", None) or {}
+    return claims.get("p1_admin") is True
+
+
+# =====================================================
+# Middleware
+# =====================================================
 def auth_middleware(app):
     @app.middleware("http")
     async def authenticate(request: Request, call_next):
@@ -19,7 +209,8 @@ def auth_middleware(app):
         if request.method == "OPTIONS":
             return await call_next(request)
 
-        if request.url.path in EXEMPT_PATHS:
+        path = request.url.path
+        if path in EXEMPT_PATHS:
             return await call_next(request)
 
         auth = request.headers.get("Authorization")
@@ -33,22 +224,14 @@ def auth_middleware(app):
         token = auth.split(" ", 1)[1]
 
         try:
-             payload = jwt.decode(
-	         token,
-                 JWT_SECRET,
-                 algorithms=[JWT_ALGO],
-                 options={"verify_aud": False}
-             )
+            tenant_id, claims = verify_token(token)
 
         except JWTError:
             return JSONResponse(
                 status_code=401,
                 content={"detail": "Invalid or expired token"}
             )
-
-
-        tenant_id = payload.get("tenant_id")
-        if not tenant_id:
+        except ValueError:
             return JSONResponse(
                 status_code=401,
                 content={"detail": "tenant_id missing in token"}
@@ -57,14 +240,14 @@ def auth_middleware(app):
 
         # Attach tenant to request context
         request.state.tenant_id = tenant_id
+        request.state.token_claims = claims
 
         # Enforce tenant match for ingestion routes
-        parts = request.url.path.split("/")
-        if len(parts) > 2 and parts[1] == "tenants":
-            if parts[2] != tenant_id:
-                return JSONResponse(
-                    status_code=403,
-                    content={"detail": "Tenant access denied"}
-                )
+        match = _TENANT_PATH.match(path)
+        if match and match.group(1) != tenant_id:
+            return JSONResponse(
+                status_code=403,
+                content={"detail": "Tenant access denied"}
+            )
 
         return await call_next(request)
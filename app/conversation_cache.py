@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+# =====================================================
+# Conversation state cache (per process, write-through)
+# =====================================================
+# Holds the last successful (direct_answer) query per
+# (tenant_id, conversation_id) so query rewriting does not
+# need a SQLite round-trip on the hot path.
+#
+# SQLite stays the source of truth:
+#   - misses fall back to the DB loader and are cached
+#   - entries expire after a TTL so other workers' writes
+#     become visible without cross-process invalidation
+#   - a loaded value is only cached if nothing was recorded for
+#     the key while the loader ran (the DB read may predate that
+#     write, e.g. one still pending in app.persist_queue)
+
+CACHE_MAX_ENTRIES = int(os.getenv("P1_CONVERSATION_CACHE_SIZE", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("P1_CONVERSATION_CACHE_TTL_SECONDS", "300"))
+
+# Approximate per-entry cost besides the strings (tuple, dict slot, float)
+ENTRY_OVERHEAD_BYTES = 240
+
+_Key = Tuple[str, str]
+
+_lock = threading.Lock()
+_entries: "OrderedDict[_Key, Tuple[Optional[str], float]]" = OrderedDict()
+
+# key -> generation of the load in flight for it; a write (or
+# invalidation) removes it so the stale loaded value is discarded
+_loading: Dict[_Key, int] = {}
+_generation = 0
+
+
+def _store_locked(key: _Key, value: Optional[str]) -> None:
+    # Caller holds _lock
+    if CACHE_MAX_ENTRIES <= 0:
+        return
+    _entries[key] = (value, time.monotonic() + CACHE_TTL_SECONDS)
+    _entries.move_to_end(key)
+    while len(_entries) > CACHE_MAX_ENTRIES:
+        _entries.popitem(last=False)
+
+
+def get_last_successful_query(
+    tenant_id: str,
+    conversation_id: str,
+    loader: Callable[[str, str], Optional[str]],
+) -> Optional[str]:
+    """
+    Returns the cached last successful query for a conversation.
+    On a miss (or expired entry) calls loader(tenant_id, conversation_id)
+    and caches its result, including None, unless a newer value was
+    recorded while it ran.
+    """
+    global _generation
+
+    key = (tenant_id, conversation_id)
+
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.monotonic():
+                _entries.move_to_end(key)
+                return value
+            del _entries[key]
+        _generation += 1
+        generation = _loading[key] = _generation
+
+    try:
+        value = loader(tenant_id, conversation_id)
+    except Exception:
+        with _lock:
+            if _loading.get(key) == generation:
+                del _loading[key]
+        raise
+
+    with _lock:
+        if _loading.get(key) == generation:
+            del _loading[key]
+            _store_locked(key, value)
+        else:
+            # Recorded (or invalidated) meanwhile: the cache wins
+            entry = _entries.get(key)
+            if entry is not None:
+                value = entry[0]
+    return value
+
+
+def record_response(response: dict) -> None:
+    """
+    Write-through update from a final /query response.
+    Only direct answers change the conversation's rewrite context.
+    """
+    if response.get("mode") != "direct_answer":
+        return
+
+    tenant_id = response.get("tenant_id")
+    conversation_id = response.get("conversation_id")
+    if not tenant_id or not conversation_id:
+        return
+
+    key = (tenant_id, conversation_id)
+    with _lock:
+        _loading.pop(key, None)
+        _store_locked(key, response.get("query"))
+
+
+def invalidate(tenant_id: str, conversation_id: Optional[str] = None) -> None:
+    """
+    Drops cached state for one conversation, or for every
+    conversation of a tenant when conversation_id is None.
+    """
+    with _lock:
+        if conversation_id is not None:
+            _entries.pop((tenant_id, conversation_id), None)
+            _loading.pop((tenant_id, conversation_id), None)
+            return
+
+        for key in [k for k in _entries if k[0] == tenant_id]:
+            del _entries[key]
+        for key in [k for k in _loading if k[0] == tenant_id]:
+            del _loading[key]
+
+
+def footprint() -> Dict[str, int]:
+    """
+    Approximate resident bytes per tenant (used by app.memory_budget).
+    """
+    with _lock:
+        keys = [(key, value) for key, (value, _) in _entries.items()]
+
+    sizes: Dict[str, int] = {}
+    for (tenant_id, conversation_id), value in keys:
+        size = ENTRY_OVERHEAD_BYTES + len(tenant_id) + len(conversation_id) + len(value or "")
+        sizes[tenant_id] = sizes.get(tenant_id, 0) + size
+    return sizes
@@ -0,0 +1,230 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+# =====================================================
+# Per-tenant SQLite connection pool
+# =====================================================
+# One pool per DB file (one DB per tenant). Every module that touches a
+# tenant p1.db (persist, read_api, api) goes through here.
+#
+# Rules:
+#   - Connections are opened in autocommit mode with WAL, busy_timeout
+#     and foreign keys configured ONCE, plus a statement cache.
+#   - A connection is checked out by exactly one thread at a time and
+#     must be returned before another thread can use it (it may be
+#     returned from a different thread than the one that checked it
+#     out, e.g. streaming responses).
+#   - At most POOL_SIZE connections per DB; callers wait up to
+#     ACQUIRE_TIMEOUT_SECONDS for a free slot.
+#   - At most MAX_TENANTS pools stay open; the least recently used
+#     tenant's idle connections are closed first. Pools idle longer
+#     than IDLE_SECONDS are closed as well.
+#   - Pools are per process and are dropped after fork().
+
+POOL_SIZE = int(os.getenv("P1_DB_POOL_SIZE", "4"))
+MAX_TENANTS = int(os.getenv("P1_DB_POOL_MAX_TENANTS", "64"))
+IDLE_SECONDS = float(os.getenv("P1_DB_POOL_IDLE_SECONDS", "300"))
+ACQUIRE_TIMEOUT_SECONDS = float(os.getenv("P1_DB_POOL_ACQUIRE_TIMEOUT_SECONDS", "10"))
+BUSY_TIMEOUT_MS = int(os.getenv("P1_DB_BUSY_TIMEOUT_MS", "5000"))
+STATEMENT_CACHE_SIZE = int(os.getenv("P1_DB_STATEMENT_CACHE_SIZE", "256"))
+
+
+def _open(db_path: str) -> sqlite3.Connection:
+    # Autocommit mode; multi-statement writes use transaction()
+    conn = sqlite3.connect(
+        db_path,
+        isolation_level=None,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    conn.row_factory = sqlite3.Row
+
+    # Must precede the first table: lets retention reclaim pages with
+    # incremental_vacuum (existing DBs are converted by app.retention)
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+
+    # Safer concurrent reads/writes + fewer "database is locked" issues
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.execute("PRAGMA foreign_keys=ON;")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS};")
+
+    return conn
+
+
+class _Pool:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.idle: List[sqlite3.Connection] = []
+        self.slots = threading.BoundedSemaphore(POOL_SIZE)
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.opened = 0
+        self.closed = False
+        self.last_used = time.monotonic()
+
+    def acquire(self) -> sqlite3.Connection:
+        if not self.slots.acquire(timeout=ACQUIRE_TIMEOUT_SECONDS):
+            raise sqlite3.OperationalError(
+                f"connection pool exhausted for {self.db_path}"
+            )
+        try:
+            with self.lock:
+                self.in_use += 1
+                self.last_used = time.monotonic()
+                if self.idle:
+                    return self.idle.pop()
+            conn = _open(self.db_path)
+            with self.lock:
+                self.opened += 1
+            return conn
+        except Exception:
+            with self.lock:
+                self.in_use -= 1
+            self.slots.release()
+            raise
+
+    def release(self, conn: sqlite3.Connection, reusable: bool) -> None:
+        try:
+            with self.lock:
+                self.in_use -= 1
+                self.last_used = time.monotonic()
+                if reusable and not self.closed:
+                    self.idle.append(conn)
+                    return
+            conn.close()
+        finally:
+            self.slots.release()
+
+    def close_idle(self) -> int:
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        return len(idle)
+
+
+_lock = threading.Lock()
+_pools: "OrderedDict[str, _Pool]" = OrderedDict()
+_pid = os.getpid()
+
+
+def _get_pool(db_path: str) -> _Pool:
+    global _pid
+
+    with _lock:
+        if os.getpid() != _pid:
+            # Never share SQLite handles across fork()
+            _pools.clear()
+            _pid = os.getpid()
+
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _Pool(db_path)
+            _pools[db_path] = pool
+        _pools.move_to_end(db_path)
+
+        evicted = _evict_locked()
+
+    for old in evicted:
+        old.close_idle()
+    return pool
+
+
+def _evict_locked() -> List[_Pool]:
+    now = time.monotonic()
+    evicted: List[_Pool] = []
+
+    # Oldest first: over capacity, or idle for too long
+    for path in list(_pools.keys()):
+        pool = _pools[path]
+        over_capacity = len(_pools) > MAX_TENANTS
+        stale = now - pool.last_used > IDLE_SECONDS and pool.in_use == 0
+        if not (over_capacity or stale):
+            break
+        pool.closed = True
+        evicted.append(_pools.pop(path))
+
+    return evicted
+
+
+@contextmanager
+def connection(db_path: str) -> Iterator[sqlite3.Connection]:
+    """
+    Checks out a configured connection for db_path.
+    Any transaction left open by the caller is rolled back on return.
+    """
+    pool = _get_pool(db_path)
+    conn = pool.acquire()
+    reusable = True
+    try:
+        yield conn
+    finally:
+        if reusable and conn.in_transaction:
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                reusable = False
+        pool.release(conn, reusable)
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection, immediate: bool = True) -> Iterator[sqlite3.Connection]:
+    """
+    Explicit transaction on an autocommit pooled connection.
+    IMMEDIATE takes the write lock up front (no upgrade deadlocks).
+    """
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield conn
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def close(db_path: str) -> None:
+    """
+    Closes a DB's pooled connections (e.g. before deleting/replacing it).
+    Checked-out connections are closed when returned.
+    """
+    with _lock:
+        pool = _pools.pop(db_path, None)
+    if pool is not None:
+        pool.closed = True
+        pool.close_idle()
+
+
+def usage() -> Dict[str, Dict[str, Any]]:
+    """
+    Open connections and last use (time.monotonic()) per DB path.
+    """
+    with _lock:
+        pools = list(_pools.values())
+
+    return {
+        p.db_path: {"connections": len(p.idle) + p.in_use, "last_used": p.last_used}
+        for p in pools
+    }
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        pools = list(_pools.values())
+
+    return {
+        "pools": len(pools),
+        "pool_size": POOL_SIZE,
+        "max_tenants": MAX_TENANTS,
+        "connections_idle": sum(len(p.idle) for p in pools),
+        "connections_in_use": sum(p.in_use for p in pools),
+        "connections_opened": sum(p.opened for p in pools),
+    }
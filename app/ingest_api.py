@@ -4,6 +4,7 @@ import logging
 from datetime import datetime
 from fastapi import APIRouter, UploadFile, File, HTTPException
 
+from app import metrics
 from app.store_vectors import load_and_chunk, store_vectors
 
 # =====================================================
@@ -28,6 +29,19 @@ def _tenant_docs_path(tenant_id: str) -> str:
     return os.path.join(_tenant_root(tenant_id), "docs")
 
 
+def _index_tenant(tenant_id: str) -> None:
+    # Parse, chunk, embed and write; stage times and item counts go to /metrics
+    timings = metrics.Timings()
+    items = {}
+    try:
+        chunks = load_and_chunk(tenant_id, timings)
+        items["pages"] = len({(c.metadata.get("source"), c.metadata.get("page")) for c in chunks})
+        items["chunks"] = len(chunks)
+        items["vectors"] = store_vectors(tenant_id, chunks, timings)
+    finally:
+        metrics.observe_ingest(tenant_id, timings, items)
+
+
 # =====================================================
 # Upload document (storage only)
 # =====================================================
@@ -58,8 +72,7 @@ def upload_document(tenant_id: str, file: UploadFile = File(...)):
             shutil.copyfileobj(file.file, f)
 
         # Auto-index (all docs for tenant)
-        chunks = load_and_chunk(tenant_id)
-        store_vectors(tenant_id, chunks)
+        _index_tenant(tenant_id)
 
     except RuntimeError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -188,8 +201,7 @@ def index_documents(tenant_id: str):
         )
 
     try:
-        chunks = load_and_chunk(tenant_id)
-        store_vectors(tenant_id, chunks)
+        _index_tenant(tenant_id)
     except RuntimeError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception:
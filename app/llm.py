@@ -1,4 +1,10 @@
 import os
+import time
+
+# "together" (default) or "fake": a local stand-in with fixed latency for
+# load tests (bench.load_test) and offline development
+LLM_BACKEND = os.getenv("P1_LLM_BACKEND", "together")
+FAKE_LLM_LATENCY_SECONDS = float(os.getenv("P1_FAKE_LLM_LATENCY_MS", "500")) / 1000.0
 
 SYSTEM_PROMPT = """
 You are an internal document assistant.
@@ -26,7 +32,20 @@ Important:
 """
 
 
+def _fake_answer(query: str, contexts: list[dict]) -> str:
+    time.sleep(FAKE_LLM_LATENCY_SECONDS)
+    first = contexts[0] if contexts else {}
+    excerpt = " ".join((first.get("content") or "").split())[:200]
+    return (
+        f"{excerpt} "
+        f"({os.path.basename(first.get('source') or 'unknown')}, {first.get('page')})"
+    )
+
+
 def generate_answer(query: str, contexts: list[dict]) -> str:
+    if LLM_BACKEND == "fake":
+        return _fake_answer(query, contexts)
+
     # Lazy import so CI and API startup do NOT require Together SDK
     from together import Together
 
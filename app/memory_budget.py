@@ -0,0 +1,253 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app import answer_cache, conversation_cache, db_pool, metrics, snapshot
+from app.persist import DB_FILENAME, DB_ROOT
+
+# =====================================================
+# Memory budget for resident tenant state (per process)
+# =====================================================
+# Each tenant that has been queried keeps memory in this process:
+#
+#   index          its open Chroma store (HNSW segment loaded in full,
+#                  plus the chroma.sqlite3 page cache), or its mapped
+#                  snapshot (app.snapshot; scanned in full per query)
+#   db             pooled p1.db connections (SQLite page cache each)
+#   conversations  conversation_cache entries
+#   answers        answer_cache entries (semantic answer reuse)
+#
+# Sizes are estimates from file sizes and entry counts, not RSS. When
+# the total (plus the shared embedding model) exceeds
+# P1_MEMORY_BUDGET_MB, the least recently used tenants are evicted:
+# store dropped, connections closed, cache entries removed. The next
+# request for an evicted tenant reloads it lazily (retrieve() reopens
+# the store), so eviction only costs latency.
+#
+#   P1_MEMORY_BUDGET_MB=0   no budget (report only)
+
+BUDGET_BYTES = int(float(os.getenv("P1_MEMORY_BUDGET_MB", "0")) * 1024 * 1024)
+
+# SQLite default cache_size (-2000 => 2000 KiB) per connection
+SQLITE_CACHE_BYTES = 2000 * 1024
+
+# Used when the model's parameters cannot be inspected (all-MiniLM-L6-v2)
+DEFAULT_MODEL_BYTES = 90 * 1024 * 1024
+
+_lock = threading.Lock()
+_enforce_lock = threading.Lock()
+_last_used: "OrderedDict[str, float]" = OrderedDict()  # tenant_id -> monotonic
+_index_bytes: Dict[str, int] = {}  # tenant_id -> estimate at open
+_evictions = 0
+
+
+metrics.describe("p1_memory_evictions_total", "counter", "Tenants evicted to stay within the memory budget")
+
+
+def touch(tenant_id: str) -> None:
+    with _lock:
+        _last_used[tenant_id] = time.monotonic()
+        _last_used.move_to_end(tenant_id)
+
+
+def forget(tenant_id: str) -> None:
+    """
+    Drops the cached index estimate (store evicted or reindexed).
+    """
+    with _lock:
+        _index_bytes.pop(tenant_id, None)
+
+
+# =====================================================
+# Estimates
+# =====================================================
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _estimate_index(tenant_id: str) -> int:
+    from app.retrieve import TENANTS_ROOT
+
+    total = 0
+    for root, _, files in os.walk(os.path.join(TENANTS_ROOT, tenant_id, "chroma")):
+        for name in files:
+            size = _file_size(os.path.join(root, name))
+            # Vector segment files are read into memory whole; the
+            # metadata DB only through its page cache
+            total += min(size, SQLITE_CACHE_BYTES) if name.endswith(".sqlite3") else size
+    return total
+
+
+def _index_estimate(tenant_id: str) -> int:
+    with _lock:
+        cached = _index_bytes.get(tenant_id)
+    if cached is None:
+        cached = _estimate_index(tenant_id)
+        with _lock:
+            _index_bytes[tenant_id] = cached
+    return cached
+
+
+def _model_bytes() -> int:
+    from app.retrieve import cached_embeddings
+
+    model = cached_embeddings()
+    if model is None:
+        return 0
+    client = getattr(model, "_client", None) or getattr(model, "client", None)
+    try:
+        return sum(p.numel() * p.element_size() for p in client.parameters())
+    except Exception:
+        return DEFAULT_MODEL_BYTES
+
+
+def _tenant_footprints() -> Dict[str, Dict[str, Any]]:
+    from app.retrieve import cached_tenants
+
+    tenants: Dict[str, Dict[str, Any]] = {}
+
+    def entry(tenant_id: str) -> Dict[str, Any]:
+        return tenants.setdefault(
+            tenant_id,
+            {
+                "index_bytes": 0,
+                "db_bytes": 0,
+                "conversation_bytes": 0,
+                "answer_cache_bytes": 0,
+                "last_used": 0.0,
+            },
+        )
+
+    for tenant_id in cached_tenants():
+        entry(tenant_id)["index_bytes"] = _index_estimate(tenant_id)
+    for tenant_id, size in snapshot.resident().items():
+        entry(tenant_id)["index_bytes"] += size
+
+    for db_path, pool in db_pool.usage().items():
+        if os.path.basename(db_path) != DB_FILENAME:
+            continue
+        tenant_id = os.path.basename(os.path.dirname(db_path))
+        per_connection = min(_file_size(db_path), SQLITE_CACHE_BYTES)
+        e = entry(tenant_id)
+        e["db_bytes"] = pool["connections"] * per_connection
+        e["last_used"] = max(e["last_used"], pool["last_used"])
+
+    for tenant_id, size in conversation_cache.footprint().items():
+        entry(tenant_id)["conversation_bytes"] = size
+    for tenant_id, size in answer_cache.footprint().items():
+        entry(tenant_id)["answer_cache_bytes"] = size
+
+    with _lock:
+        last_used = dict(_last_used)
+    for tenant_id, e in tenants.items():
+        e["last_used"] = max(e["last_used"], last_used.get(tenant_id, 0.0))
+        e["bytes"] = (
+            e["index_bytes"] + e["db_bytes"] + e["conversation_bytes"] + e["answer_cache_bytes"]
+        )
+    return tenants
+
+
+# =====================================================
+# Enforcement
+# =====================================================
+def evict(tenant_id: str) -> None:
+    """
+    Releases everything a tenant holds in this process.
+    """
+    from app.retrieve import evict_store
+
+    global _evictions
+
+    evict_store(tenant_id)
+    snapshot.evict(tenant_id)
+    db_pool.close(os.path.join(DB_ROOT, tenant_id, DB_FILENAME))
+    conversation_cache.invalidate(tenant_id)
+    answer_cache.clear(tenant_id)
+
+    with _lock:
+        _last_used.pop(tenant_id, None)
+        _evictions += 1
+    metrics.inc("p1_memory_evictions_total", {"tenant_id": tenant_id})
+
+
+def enforce(protect: Optional[str] = None) -> List[str]:
+    """
+    Evicts least recently used tenants until the estimate fits the
+    budget. `protect` (the tenant being served) is never evicted.
+    Returns the evicted tenant ids.
+    """
+    if BUDGET_BYTES <= 0:
+        return []
+    # One pass at a time; a concurrent caller's pass covers this one
+    if not _enforce_lock.acquire(blocking=False):
+        return []
+
+    try:
+        tenants = _tenant_footprints()
+        total = _model_bytes() + sum(e["bytes"] for e in tenants.values())
+
+        evicted = []
+        for tenant_id, e in sorted(tenants.items(), key=lambda item: item[1]["last_used"]):
+            if total <= BUDGET_BYTES:
+                break
+            if tenant_id == protect or e["bytes"] == 0:
+                continue
+            evict(tenant_id)
+            total -= e["bytes"]
+            evicted.append(tenant_id)
+        return evicted
+    finally:
+        _enforce_lock.release()
+
+
+# =====================================================
+# Introspection
+# =====================================================
+def report() -> Dict[str, Any]:
+    tenants = _tenant_footprints()
+    shared = _model_bytes()
+    now = time.monotonic()
+
+    rows = [
+        {
+            "tenant_id": tenant_id,
+            "bytes": e["bytes"],
+            "index_bytes": e["index_bytes"],
+            "db_bytes": e["db_bytes"],
+            "conversation_bytes": e["conversation_bytes"],
+            "answer_cache_bytes": e["answer_cache_bytes"],
+            "idle_seconds": round(now - e["last_used"], 1) if e["last_used"] else None,
+        }
+        for tenant_id, e in tenants.items()
+    ]
+    rows.sort(key=lambda row: row["bytes"], reverse=True)
+
+    return {
+        "pid": os.getpid(),
+        "budget_bytes": BUDGET_BYTES or None,
+        "estimated_bytes": shared + sum(row["bytes"] for row in rows),
+        "shared_bytes": shared,
+        "evictions": _evictions,
+        "tenants": rows,
+    }
+
+
+def _gauges():
+    snapshot = report()
+    samples = [
+        ("p1_memory_estimated_bytes", {}, snapshot["estimated_bytes"]),
+        ("p1_memory_budget_bytes", {}, snapshot["budget_bytes"] or 0),
+    ]
+    samples.extend(
+        ("p1_memory_tenant_bytes", {"tenant_id": row["tenant_id"]}, row["bytes"])
+        for row in snapshot["tenants"]
+    )
+    return samples
+
+
+metrics.register_gauges(_gauges)
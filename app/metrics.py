@@ -0,0 +1,188 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# =====================================================
+# In-process metrics (Prometheus text exposition)
+# =====================================================
+# Histograms and counters are per worker process; Prometheus sums
+# them across workers. No external client library is needed.
+
+# Seconds; spans from a dict lookup to a slow LLM call
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+_Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_help: Dict[str, Tuple[str, str]] = {}  # name -> (type, help)
+_histograms: Dict[Tuple[str, _Labels], "_Histogram"] = {}
+_counters: Dict[Tuple[str, _Labels], float] = {}
+_gauge_sources: List[Callable[[], List[Tuple[str, Dict[str, str], float]]]] = []
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+def _key(name: str, labels: Dict[str, str]) -> Tuple[str, _Labels]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def describe(name: str, kind: str, help_text: str) -> None:
+    _help[name] = (kind, help_text)
+
+
+def observe(name: str, labels: Dict[str, str], seconds: float) -> None:
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = _Histogram()
+        hist.observe(seconds)
+
+
+def inc(name: str, labels: Dict[str, str], amount: float = 1.0) -> None:
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + amount
+
+
+def register_gauges(source: Callable[[], List[Tuple[str, Dict[str, str], float]]]) -> None:
+    """
+    source() -> [(name, labels, value), ...], evaluated at scrape time.
+    """
+    _gauge_sources.append(source)
+
+
+# =====================================================
+# Per-request stage timings
+# =====================================================
+class Timings:
+    """
+    Collects wall-clock durations of named stages for one request.
+    A stage entered more than once accumulates.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def as_ms(self) -> Dict[str, float]:
+        timings = {stage: round(s * 1000.0, 3) for stage, s in self.stages.items()}
+        timings["total"] = round(self.total() * 1000.0, 3)
+        return timings
+
+
+describe("p1_query_stage_seconds", "histogram", "Time spent per /query stage")
+describe("p1_query_seconds", "histogram", "End-to-end /query handler time")
+describe("p1_queries_total", "counter", "Completed /query requests")
+describe("p1_ingest_stage_seconds", "histogram", "Time spent per ingestion stage")
+describe("p1_ingest_items_total", "counter", "Pages, chunks and vectors processed by ingestion")
+
+
+def observe_query(tenant_id: str, mode: str, timings: Timings) -> None:
+    for stage, seconds in timings.stages.items():
+        observe(
+            "p1_query_stage_seconds",
+            {"tenant_id": tenant_id, "mode": mode, "stage": stage},
+            seconds,
+        )
+    observe("p1_query_seconds", {"tenant_id": tenant_id, "mode": mode}, timings.total())
+    inc("p1_queries_total", {"tenant_id": tenant_id, "mode": mode})
+
+
+def observe_ingest(tenant_id: str, timings: Timings, items: Optional[Dict[str, int]] = None) -> None:
+    for stage, seconds in timings.stages.items():
+        observe("p1_ingest_stage_seconds", {"tenant_id": tenant_id, "stage": stage}, seconds)
+    for kind, count in (items or {}).items():
+        inc("p1_ingest_items_total", {"tenant_id": tenant_id, "kind": kind}, count)
+
+
+# =====================================================
+# Exposition
+# =====================================================
+def _format_labels(labels: _Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _header(lines: List[str], name: str, default_kind: str) -> None:
+    kind, help_text = _help.get(name, (default_kind, ""))
+    if help_text:
+        lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def render_prometheus() -> str:
+    with _lock:
+        histograms = {k: (list(h.counts), h.total, h.count) for k, h in _histograms.items()}
+        counters = dict(_counters)
+
+    lines: List[str] = []
+
+    seen = set()
+    for (name, labels), (counts, total, count) in sorted(histograms.items()):
+        if name not in seen:
+            _header(lines, name, "histogram")
+            seen.add(name)
+        cumulative = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS, counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', repr(bound)),))} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+    for (name, labels), value in sorted(counters.items()):
+        if name not in seen:
+            _header(lines, name, "counter")
+            seen.add(name)
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    for source in _gauge_sources:
+        try:
+            samples = source()
+        except Exception:
+            continue
+        for name, labels, value in samples:
+            if name not in seen:
+                _header(lines, name, "gauge")
+                seen.add(name)
+            lines.append(f"{name}{_format_labels(_key(name, labels)[1])} {value}")
+
+    return "\n".join(lines) + "\n"
@@ -1,34 +1,28 @@
 import os
 import json
 import re
+import zlib
+import hashlib
 import sqlite3
-from typing import Any, Dict, Optional
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from app import db_pool
 
 DB_ROOT = os.path.join("data", "tenants")
 DB_FILENAME = "p1.db"
 
+# JSON columns at least this large are stored zlib-compressed (BLOB)
+COMPRESS_MIN_BYTES = int(os.getenv("P1_COMPRESS_MIN_BYTES", "1024"))
+
 
 # ----------------------------
-# Paths / connections
+# Paths (connections: app.db_pool)
 # ----------------------------
 def _tenant_db_path(tenant_id: str) -> str:
     return os.path.join(DB_ROOT, tenant_id, DB_FILENAME)
 
 
-def _connect(db_path: str) -> sqlite3.Connection:
-    # Autocommit mode for simplicity + durability
-    conn = sqlite3.connect(db_path, isolation_level=None)
-    conn.row_factory = sqlite3.Row
-
-    # Safer concurrent reads/writes + fewer "database is locked" issues
-    conn.execute("PRAGMA journal_mode=WAL;")
-    conn.execute("PRAGMA synchronous=NORMAL;")
-    conn.execute("PRAGMA foreign_keys=ON;")
-    conn.execute("PRAGMA busy_timeout=5000;")  # 5s
-
-    return conn
-
-
 # ----------------------------
 # Schema
 # ----------------------------
@@ -176,6 +170,260 @@ def _backfill_missing_conversation_titles(conn: sqlite3.Connection) -> None:
         )
 
 
+# ----------------------------
+# Migrations (PRAGMA user_version)
+# ----------------------------
+def _execute_script(conn: sqlite3.Connection, script: str) -> None:
+    """
+    Runs a multi-statement script inside the caller's transaction
+    (executescript() would COMMIT first).
+    """
+    statement = ""
+    for part in script.split(";"):
+        statement += part + ";"
+        if sqlite3.complete_statement(statement):
+            if statement.strip(" \n;"):
+                conn.execute(statement)
+            statement = ""
+
+
+def _migration_base_schema(conn: sqlite3.Connection) -> None:
+    _execute_script(conn, _SCHEMA)
+    # DBs created before titles existed
+    _ensure_conversation_title_column(conn)
+
+
+def _migration_backfill_titles(conn: sqlite3.Connection) -> None:
+    _backfill_missing_conversation_titles(conn)
+
+
+def _migration_keyset_indexes(conn: sqlite3.Connection) -> None:
+    # Keyset pagination: (last_activity_at, conversation_id) for the
+    # conversation list, (created_at, request_id) within a conversation.
+    _execute_script(
+        conn,
+        """
+        CREATE INDEX IF NOT EXISTS idx_conversations_activity
+          ON conversations(tenant_id, last_activity_at, conversation_id);
+
+        CREATE INDEX IF NOT EXISTS idx_queries_conv_created_request
+          ON queries(tenant_id, conversation_id, created_at, request_id);
+
+        DROP INDEX IF EXISTS idx_queries_conv_created;
+        """,
+    )
+
+
+def _migration_compact_queries(conn: sqlite3.Connection) -> None:
+    # Drops the duplicated response_json column, moves citation snippets
+    # into a shared chunks table and compresses large JSON columns.
+    _execute_script(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS chunks (
+          chunk_id TEXT PRIMARY KEY,
+          source TEXT,
+          page INTEGER,
+          snippet TEXT NOT NULL
+        );
+
+        CREATE TABLE queries_compact (
+          tenant_id TEXT NOT NULL,
+          request_id TEXT NOT NULL,
+          conversation_id TEXT NOT NULL,
+          created_at TEXT NOT NULL,
+          query TEXT NOT NULL,
+          mode TEXT NOT NULL,
+          answer TEXT NOT NULL,
+          citations_json NOT NULL,
+          artifacts_json NOT NULL,
+          debug_json,
+          PRIMARY KEY (tenant_id, request_id),
+          FOREIGN KEY (tenant_id, conversation_id)
+            REFERENCES conversations(tenant_id, conversation_id)
+            ON DELETE CASCADE
+        );
+        """,
+    )
+
+    rows = conn.execute(
+        """
+        SELECT
+          tenant_id, request_id, conversation_id, created_at,
+          query, mode, answer, citations_json, artifacts_json, debug_json
+        FROM queries
+        """
+    )
+    for row in rows:
+        citations, chunk_rows = _compact_citations(json.loads(row["citations_json"] or "[]"))
+        _insert_chunks(conn, chunk_rows)
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO queries_compact (
+              tenant_id, request_id, conversation_id, created_at,
+              query, mode, answer,
+              citations_json, artifacts_json, debug_json
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                row["tenant_id"],
+                row["request_id"],
+                row["conversation_id"],
+                row["created_at"],
+                row["query"],
+                row["mode"],
+                row["answer"],
+                _pack_text(json.dumps(citations, ensure_ascii=False)),
+                _pack_text(row["artifacts_json"]),
+                _pack_text(row["debug_json"]),
+            ),
+        )
+
+    _execute_script(
+        conn,
+        """
+        DROP TABLE queries;
+        ALTER TABLE queries_compact RENAME TO queries;
+
+        CREATE INDEX IF NOT EXISTS idx_queries_conv_created_request
+          ON queries(tenant_id, conversation_id, created_at, request_id);
+        """,
+    )
+
+
+def fts5_available(conn: sqlite3.Connection) -> bool:
+    options = {row[0] for row in conn.execute("PRAGMA compile_options")}
+    return "ENABLE_FTS5" in options
+
+
+def _migration_query_search_index(conn: sqlite3.Connection) -> None:
+    # External-content FTS5 index over queries.query / queries.answer,
+    # kept in sync by triggers. Skipped on SQLite builds without FTS5
+    # (search then reports itself unavailable).
+    if not fts5_available(conn):
+        return
+
+    _execute_script(
+        conn,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS queries_fts USING fts5(
+          query,
+          answer,
+          content='queries',
+          content_rowid='rowid',
+          tokenize='unicode61 remove_diacritics 2'
+        );
+
+        CREATE TRIGGER IF NOT EXISTS queries_fts_insert AFTER INSERT ON queries BEGIN
+          INSERT INTO queries_fts(rowid, query, answer)
+          VALUES (new.rowid, new.query, new.answer);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS queries_fts_delete AFTER DELETE ON queries BEGIN
+          INSERT INTO queries_fts(queries_fts, rowid, query, answer)
+          VALUES ('delete', old.rowid, old.query, old.answer);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS queries_fts_update AFTER UPDATE OF query, answer ON queries BEGIN
+          INSERT INTO queries_fts(queries_fts, rowid, query, answer)
+          VALUES ('delete', old.rowid, old.query, old.answer);
+          INSERT INTO queries_fts(rowid, query, answer)
+          VALUES (new.rowid, new.query, new.answer);
+        END;
+
+        INSERT INTO queries_fts(queries_fts) VALUES ('rebuild');
+        """,
+    )
+
+
+def _migration_change_counter(conn: sqlite3.Connection) -> None:
+    # Per-DB change counter bumped by triggers on every history write.
+    # Read APIs derive ETags from (epoch, version) without touching rows;
+    # the random epoch keeps ETags unique if a DB is ever recreated.
+    _execute_script(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS change_counter (
+          id INTEGER PRIMARY KEY CHECK (id = 1),
+          epoch TEXT NOT NULL,
+          version INTEGER NOT NULL
+        );
+
+        INSERT OR IGNORE INTO change_counter (id, epoch, version)
+        VALUES (1, lower(hex(randomblob(8))), 0);
+
+        CREATE TRIGGER IF NOT EXISTS change_counter_queries_insert AFTER INSERT ON queries BEGIN
+          UPDATE change_counter SET version = version + 1 WHERE id = 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS change_counter_queries_delete AFTER DELETE ON queries BEGIN
+          UPDATE change_counter SET version = version + 1 WHERE id = 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS change_counter_conversations_insert AFTER INSERT ON conversations BEGIN
+          UPDATE change_counter SET version = version + 1 WHERE id = 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS change_counter_conversations_update AFTER UPDATE ON conversations BEGIN
+          UPDATE change_counter SET version = version + 1 WHERE id = 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS change_counter_conversations_delete AFTER DELETE ON conversations BEGIN
+          UPDATE change_counter SET version = version + 1 WHERE id = 1;
+        END;
+        """,
+    )
+
+
+# Append only: position N-1 upgrades a DB from user_version N-1 to N.
+_MIGRATIONS = [
+    _migration_base_schema,
+    _migration_backfill_titles,
+    _migration_keyset_indexes,
+    _migration_compact_queries,
+    _migration_query_search_index,
+    _migration_change_counter,
+]
+
+SCHEMA_VERSION = len(_MIGRATIONS)
+
+_migrated_paths: set[str] = set()
+_migrate_lock = threading.Lock()
+
+
+def migrate_db(db_path: str) -> int:
+    """
+    Applies pending migrations to one DB file, each in its own
+    transaction. Safe to race with other processes: the version is
+    re-read under the write lock. Returns the resulting version.
+    """
+    with db_pool.connection(db_path) as conn:
+        while True:
+            with db_pool.transaction(conn):
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version >= SCHEMA_VERSION:
+                    return version
+
+                _MIGRATIONS[version](conn)
+                conn.execute(f"PRAGMA user_version = {version + 1}")
+
+
+def ensure_schema(db_path: str) -> None:
+    """
+    Migrates a DB at most once per process. Hot paths call this
+    instead of re-running DDL on every request.
+    """
+    if db_path in _migrated_paths and os.path.isfile(db_path):
+        return
+
+    with _migrate_lock:
+        if db_path in _migrated_paths and os.path.isfile(db_path):
+            return
+        migrate_db(db_path)
+        _migrated_paths.add(db_path)
+
+
 def init_db(tenant_id: str) -> str:
     """
     Ensures the tenant DB exists and schema is applied.
@@ -184,21 +432,32 @@ def init_db(tenant_id: str) -> str:
     if not tenant_id or not isinstance(tenant_id, str):
         raise ValueError("tenant_id is required")
 
-    tenant_dir = os.path.join(DB_ROOT, tenant_id)
-    os.makedirs(tenant_dir, exist_ok=True)
-
     db_path = _tenant_db_path(tenant_id)
-    conn = _connect(db_path)
-    try:
-        conn.executescript(_SCHEMA)
-        _ensure_conversation_title_column(conn)
-        _backfill_missing_conversation_titles(conn)
-    finally:
-        conn.close()
+    if db_path not in _migrated_paths:
+        os.makedirs(os.path.join(DB_ROOT, tenant_id), exist_ok=True)
 
+    ensure_schema(db_path)
     return db_path
 
 
+def migrate_all_tenants() -> Dict[str, int]:
+    """
+    Startup/CLI helper: migrates every existing tenant DB.
+    """
+    versions: Dict[str, int] = {}
+    if not os.path.isdir(DB_ROOT):
+        return versions
+
+    for tenant_id in sorted(os.listdir(DB_ROOT)):
+        db_path = _tenant_db_path(tenant_id)
+        if not os.path.isfile(db_path):
+            continue
+        ensure_schema(db_path)
+        versions[tenant_id] = SCHEMA_VERSION
+
+    return versions
+
+
 # ----------------------------
 # Public API (Option A)
 # ----------------------------
@@ -211,6 +470,34 @@ def save_query_result(*, tenant_id: str, conversation_id: str, payload: Dict[str
 
     IMPORTANT: caller must pass tenant_id from request.state.tenant_id (authoritative).
     """
+    save_query_results(tenant_id=tenant_id, items=[(conversation_id, payload)])
+
+
+def save_query_results(
+    *, tenant_id: str, items: List[Tuple[str, Dict[str, Any]]]
+) -> None:
+    """
+    Persists several final /query responses for ONE tenant in a single
+    transaction. items = [(conversation_id, payload), ...] in commit order.
+
+    All payloads are validated before anything is written; the batch is
+    applied atomically.
+    """
+    if not tenant_id:
+        raise ValueError("tenant_id is required")
+
+    rows = [_query_row(tenant_id, conversation_id, payload) for conversation_id, payload in items]
+    if not rows:
+        return
+
+    db_path = init_db(tenant_id)
+
+    with db_pool.connection(db_path) as conn, db_pool.transaction(conn):
+        for row in rows:
+            _insert_query_row(conn, row)
+
+
+def _query_row(tenant_id: str, conversation_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
     if not tenant_id or not conversation_id:
         raise ValueError("tenant_id and conversation_id are required")
     if not isinstance(payload, dict):
@@ -223,68 +510,290 @@ def save_query_result(*, tenant_id: str, conversation_id: str, payload: Dict[str
     if not request_id or not created_at:
         raise ValueError("payload missing request_id/created_at")
 
-    query_text = str(payload.get("query", ""))
-    mode = str(payload.get("mode", ""))
-    answer = str(payload.get("answer", ""))
-
-    citations = payload.get("citations", [])
+    citations, chunk_rows = _compact_citations(payload.get("citations", []))
     artifacts = payload.get("artifacts", {})
     debug = payload.get("debug", None)
 
-    citations_json = json.dumps(citations, ensure_ascii=False)
-    artifacts_json = json.dumps(artifacts, ensure_ascii=False)
-    debug_json = json.dumps(debug, ensure_ascii=False) if debug is not None else None
-    response_json = json.dumps(payload, ensure_ascii=False)
+    # response_json is NOT stored: it is rebuilt from these columns on read
+    return {
+        "tenant_id": tenant_id,
+        "conversation_id": conversation_id,
+        "request_id": request_id,
+        "created_at": created_at,
+        "query": str(payload.get("query", "")),
+        "mode": str(payload.get("mode", "")),
+        "answer": str(payload.get("answer", "")),
+        "citations_json": _pack_text(json.dumps(citations, ensure_ascii=False)),
+        "artifacts_json": _pack_text(json.dumps(artifacts, ensure_ascii=False)),
+        "debug_json": _pack_text(json.dumps(debug, ensure_ascii=False)) if debug is not None else None,
+        "chunks": chunk_rows,
+    }
 
-    db_path = init_db(tenant_id)
-    conn = _connect(db_path)
 
-    try:
-        # Upsert conversation
-        conn.execute(
-            """
-            INSERT INTO conversations (
-              tenant_id, conversation_id, title, created_at, last_activity_at
-            )
-            VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT(tenant_id, conversation_id) DO UPDATE SET
-              last_activity_at = excluded.last_activity_at
-            """,
-            (
-                tenant_id,
-                conversation_id,
-                generate_conversation_title(query_text) or None,
-                created_at,
-                created_at,
-            ),
+def _insert_query_row(conn: sqlite3.Connection, row: Dict[str, Any]) -> None:
+    # Upsert conversation
+    conn.execute(
+        """
+        INSERT INTO conversations (
+          tenant_id, conversation_id, title, created_at, last_activity_at
         )
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(tenant_id, conversation_id) DO UPDATE SET
+          last_activity_at = excluded.last_activity_at
+        """,
+        (
+            row["tenant_id"],
+            row["conversation_id"],
+            generate_conversation_title(row["query"]) or None,
+            row["created_at"],
+            row["created_at"],
+        ),
+    )
 
-        # Insert query record (idempotent per request_id)
-        conn.execute(
+    # Cited chunks are stored once per tenant DB
+    _insert_chunks(conn, row["chunks"])
+
+    # Insert query record (idempotent per request_id)
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO queries (
+          tenant_id, request_id, conversation_id, created_at,
+          query, mode, answer,
+          citations_json, artifacts_json, debug_json
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            row["tenant_id"],
+            row["request_id"],
+            row["conversation_id"],
+            row["created_at"],
+            row["query"],
+            row["mode"],
+            row["answer"],
+            row["citations_json"],
+            row["artifacts_json"],
+            row["debug_json"],
+        ),
+    )
+
+
+# ----------------------------
+# Compact storage (codec)
+# ----------------------------
+_CITATION_KEYS = {"source", "page", "score", "snippet"}
+
+
+def _pack_text(text: Optional[str]) -> Union[str, bytes, None]:
+    """
+    Small values stay TEXT; large ones become a zlib BLOB.
+    The SQLite storage class tells them apart on read.
+    """
+    if text is None:
+        return None
+    raw = text.encode("utf-8")
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return text
+    return zlib.compress(raw, 6)
+
+
+def unpack_text(value: Union[str, bytes, None]) -> Optional[str]:
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value
+
+
+def chunk_id_for(source: Any, page: Any, snippet: str) -> str:
+    key = json.dumps([source, page, snippet], ensure_ascii=False)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _compact_citations(citations: Any) -> Tuple[Any, List[Tuple[str, Any, Any, str]]]:
+    """
+    Replaces {source, page, score, snippet} citations with
+    {chunk_id, score}; returns the chunk rows to store.
+    Citations with any other shape are kept verbatim.
+    """
+    if not isinstance(citations, list):
+        return citations, []
+
+    compact: List[Any] = []
+    chunk_rows: List[Tuple[str, Any, Any, str]] = []
+    for c in citations:
+        if not isinstance(c, dict) or set(c) != _CITATION_KEYS or not isinstance(c["snippet"], str):
+            compact.append(c)
+            continue
+        chunk_id = chunk_id_for(c["source"], c["page"], c["snippet"])
+        chunk_rows.append((chunk_id, c["source"], c["page"], c["snippet"]))
+        compact.append({"chunk_id": chunk_id, "score": c["score"]})
+
+    return compact, chunk_rows
+
+
+def _insert_chunks(conn: sqlite3.Connection, chunk_rows: List[Tuple[str, Any, Any, str]]) -> None:
+    if chunk_rows:
+        conn.executemany(
             """
-            INSERT OR IGNORE INTO queries (
-              tenant_id, request_id, conversation_id, created_at,
-              query, mode, answer,
-              citations_json, artifacts_json, debug_json, response_json
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT OR IGNORE INTO chunks (chunk_id, source, page, snippet)
+            VALUES (?, ?, ?, ?)
             """,
-            (
-                tenant_id,
-                request_id,
-                conversation_id,
-                created_at,
-                query_text,
-                mode,
-                answer,
-                citations_json,
-                artifacts_json,
-                debug_json,
-                response_json,
-            ),
+            chunk_rows,
         )
 
-        _backfill_missing_conversation_titles(conn)
 
-    finally:
-        conn.close()
+def _load_chunks(conn: sqlite3.Connection, chunk_ids: Iterable[str]) -> Dict[str, sqlite3.Row]:
+    ids = list(set(chunk_ids))
+    found: Dict[str, sqlite3.Row] = {}
+
+    # Stay well below SQLITE_MAX_VARIABLE_NUMBER
+    for i in range(0, len(ids), 500):
+        batch = ids[i:i + 500]
+        placeholders = ", ".join("?" for _ in batch)
+        for row in conn.execute(
+            f"SELECT chunk_id, source, page, snippet FROM chunks WHERE chunk_id IN ({placeholders})",
+            batch,
+        ):
+            found[row["chunk_id"]] = row
+
+    return found
+
+
+def prune_unreferenced_chunks(conn: sqlite3.Connection) -> int:
+    """
+    Deletes chunks no remaining query cites (after retention/deletes).
+    Scans citations, so it belongs in maintenance jobs, not hot paths.
+    """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS live_chunks (chunk_id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM live_chunks")
+
+    for row in conn.execute("SELECT citations_json FROM queries"):
+        citations = json.loads(unpack_text(row["citations_json"]) or "[]")
+        if not isinstance(citations, list):
+            continue
+        ids = [(c["chunk_id"],) for c in citations if isinstance(c, dict) and "chunk_id" in c]
+        if ids:
+            conn.executemany("INSERT OR IGNORE INTO live_chunks (chunk_id) VALUES (?)", ids)
+
+    deleted = conn.execute(
+        "DELETE FROM chunks WHERE chunk_id NOT IN (SELECT chunk_id FROM live_chunks)"
+    ).rowcount
+    conn.execute("DROP TABLE live_chunks")
+    return deleted
+
+
+# ----------------------------
+# Read-side reconstruction
+# ----------------------------
+STORED_QUERY_COLUMNS = (
+    "request_id",
+    "created_at",
+    "query",
+    "mode",
+    "answer",
+    "citations_json",
+    "artifacts_json",
+    "debug_json",
+)
+
+
+def stored_columns_for(fields: Iterable[str]) -> List[str]:
+    """
+    Maps API item fields to the stored columns needed to produce them
+    (response_json is derived from all of them).
+    """
+    wanted = set(fields)
+    if "response_json" in wanted:
+        return list(STORED_QUERY_COLUMNS)
+    return [c for c in STORED_QUERY_COLUMNS if c in wanted]
+
+
+def decode_query_rows(
+    conn: sqlite3.Connection,
+    *,
+    tenant_id: str,
+    rows: Iterable[sqlite3.Row],
+    fields: Iterable[str],
+    conversation_id: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Turns stored query rows back into API items with the original
+    JSON-string columns (citations_json, ..., response_json).
+    conversation_id is taken from the row when not given.
+    """
+    fields = list(fields)
+    rows = list(rows)
+
+    needs_json = {"citations_json", "artifacts_json", "debug_json", "response_json"}
+    if not needs_json.intersection(fields):
+        return [{f: row[f] for f in fields} for row in rows]
+
+    decoded = []
+    chunk_ids: List[str] = []
+    for row in rows:
+        citations = None
+        if "citations_json" in row.keys():
+            citations = json.loads(unpack_text(row["citations_json"]) or "[]")
+            if isinstance(citations, list):
+                chunk_ids.extend(
+                    c["chunk_id"] for c in citations if isinstance(c, dict) and "chunk_id" in c
+                )
+        decoded.append(citations)
+
+    chunks = _load_chunks(conn, chunk_ids) if chunk_ids else {}
+
+    items = []
+    for row, citations in zip(rows, decoded):
+        if isinstance(citations, list):
+            citations = [_expand_citation(c, chunks) for c in citations]
+
+        item: Dict[str, Any] = {}
+        for f in fields:
+            if f == "citations_json":
+                item[f] = json.dumps(citations, ensure_ascii=False)
+            elif f in ("artifacts_json", "debug_json"):
+                item[f] = unpack_text(row[f])
+            elif f != "response_json":
+                item[f] = row[f]
+
+        if "response_json" in fields:
+            debug_json = unpack_text(row["debug_json"])
+            item["response_json"] = json.dumps(
+                {
+                    "request_id": row["request_id"],
+                    "created_at": row["created_at"],
+                    "tenant_id": tenant_id,
+                    "conversation_id": conversation_id or row["conversation_id"],
+                    "query": row["query"],
+                    "mode": row["mode"],
+                    "answer": row["answer"],
+                    "citations": citations,
+                    "artifacts": json.loads(unpack_text(row["artifacts_json"]) or "{}"),
+                    "debug": json.loads(debug_json) if debug_json is not None else None,
+                },
+                ensure_ascii=False,
+            )
+
+        items.append(item)
+
+    return items
+
+
+def _expand_citation(citation: Any, chunks: Dict[str, sqlite3.Row]) -> Any:
+    if not isinstance(citation, dict) or "chunk_id" not in citation:
+        return citation
+
+    chunk = chunks.get(citation["chunk_id"])
+    return {
+        "source": chunk["source"] if chunk else None,
+        "page": chunk["page"] if chunk else None,
+        "score": citation.get("score"),
+        "snippet": chunk["snippet"] if chunk else "",
+    }
+
+
+# ----------------------------
+# CLI usage (explicit migration)
+# ----------------------------
+if __name__ == "__main__":
+    for tenant, version in migrate_all_tenants().items():
+        print(f"{tenant}: schema v{version}")
@@ -0,0 +1,335 @@
+import os
+import time
+import queue
+import logging
+import sqlite3
+import threading
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.persist import save_query_result, save_query_results
+from app.tenant_config import get_tenant_setting
+
+# =====================================================
+# Write-behind persistence
+# =====================================================
+# /query responses are handed to a background writer instead of
+# being written inline. The writer drains a bounded queue, groups
+# responses per tenant and commits each group in ONE transaction.
+#
+# Modes (P1_PERSIST_MODE, overridable per tenant via the
+# "persist_mode" tenant setting):
+#   - async: enqueue and return immediately (default)
+#   - sync:  write before the response is returned (durable)
+#
+# A full queue never drops responses: the caller writes synchronously.
+#
+# A tenant batch that fails on a transient SQLite error (locked/busy)
+# is retried with backoff. If it still fails, its rows are written one
+# by one so only the rows that fail on their own are lost; those are
+# logged and listed by recent_failures().
+
+logger = logging.getLogger("p1.persist")
+
+PERSIST_MODE = os.getenv("P1_PERSIST_MODE", "async")
+QUEUE_MAX_SIZE = int(os.getenv("P1_PERSIST_QUEUE_SIZE", "10000"))
+FLUSH_INTERVAL_SECONDS = float(os.getenv("P1_PERSIST_FLUSH_INTERVAL_MS", "5")) / 1000.0
+MAX_BATCH_SIZE = int(os.getenv("P1_PERSIST_MAX_BATCH", "500"))
+RETRY_ATTEMPTS = int(os.getenv("P1_PERSIST_RETRIES", "3"))
+RETRY_BACKOFF_SECONDS = float(os.getenv("P1_PERSIST_RETRY_BACKOFF_MS", "50")) / 1000.0
+
+# Lost rows kept for recent_failures()
+RECENT_FAILURES = 50
+
+MODE_ASYNC = "async"
+MODE_SYNC = "sync"
+
+# (enqueued_at, tenant_id, conversation_id, payload) or None (stop)
+_Item = Optional[Tuple[float, str, str, Dict[str, Any]]]
+
+_queue: "queue.Queue[_Item]" = queue.Queue(maxsize=QUEUE_MAX_SIZE)
+_lock = threading.Lock()
+_writer: Optional[threading.Thread] = None
+_writer_pid: Optional[int] = None
+
+_stats = {
+    "committed": 0,
+    "failed": 0,
+    "retries": 0,
+    "sync_writes": 0,
+    "queue_full_fallbacks": 0,
+    "last_batch_size": 0,
+    "last_batch_lag_ms": 0.0,
+    "max_batch_lag_ms": 0.0,
+}
+_oldest_pending: Dict[int, float] = {}
+_recent_failures: "deque[Dict[str, Any]]" = deque(maxlen=RECENT_FAILURES)
+
+
+def persist_mode(tenant_id: str) -> str:
+    mode = get_tenant_setting(tenant_id, "persist_mode", PERSIST_MODE)
+    return MODE_SYNC if mode == MODE_SYNC else MODE_ASYNC
+
+
+# ----------------------------
+# Producer side
+# ----------------------------
+def submit(response: dict) -> None:
+    """
+    Hands a final /query response to persistence.
+    Raises only when a synchronous write fails.
+    """
+    tenant_id = response["tenant_id"]
+    conversation_id = response["conversation_id"]
+
+    if persist_mode(tenant_id) == MODE_SYNC:
+        _write_sync(tenant_id, conversation_id, response)
+        return
+
+    _ensure_writer()
+
+    enqueued_at = time.monotonic()
+    with _lock:
+        _oldest_pending[id(response)] = enqueued_at
+
+    try:
+        _queue.put_nowait((enqueued_at, tenant_id, conversation_id, response))
+    except queue.Full:
+        with _lock:
+            _oldest_pending.pop(id(response), None)
+            _stats["queue_full_fallbacks"] += 1
+        _write_sync(tenant_id, conversation_id, response)
+
+
+def submit_many(responses: List[dict]) -> None:
+    """
+    Hands several responses for ONE tenant to persistence. In sync mode
+    they are written in a single transaction; in async mode they are
+    enqueued back to back and the writer commits them together.
+    """
+    if not responses:
+        return
+
+    tenant_id = responses[0]["tenant_id"]
+    if persist_mode(tenant_id) == MODE_SYNC:
+        save_query_results(
+            tenant_id=tenant_id,
+            items=[(r["conversation_id"], r) for r in responses],
+        )
+        with _lock:
+            _stats["sync_writes"] += len(responses)
+        return
+
+    for response in responses:
+        submit(response)
+
+
+def _write_sync(tenant_id: str, conversation_id: str, response: dict) -> None:
+    save_query_result(
+        tenant_id=tenant_id,
+        conversation_id=conversation_id,
+        payload=response,
+    )
+    with _lock:
+        _stats["sync_writes"] += 1
+
+
+def _ensure_writer() -> None:
+    global _writer, _writer_pid
+
+    pid = os.getpid()
+    if _writer is not None and _writer_pid == pid and _writer.is_alive():
+        return
+
+    with _lock:
+        if _writer is not None and _writer_pid == pid and _writer.is_alive():
+            return
+        _writer = threading.Thread(
+            target=_run_writer, name="p1-persist-writer", daemon=True
+        )
+        _writer_pid = pid
+        _writer.start()
+
+
+# ----------------------------
+# Writer side
+# ----------------------------
+def _run_writer() -> None:
+    while True:
+        first = _queue.get()
+        if first is None:
+            _queue.task_done()
+            return
+
+        batch = [first]
+        deadline = first[0] + FLUSH_INTERVAL_SECONDS
+        stop = False
+
+        # Collect for up to FLUSH_INTERVAL after the oldest item arrived
+        while len(batch) < MAX_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = _queue.get(timeout=remaining)
+                else:
+                    item = _queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+
+        try:
+            _commit_batch(batch)
+        finally:
+            for _ in range(len(batch) + (1 if stop else 0)):
+                _queue.task_done()
+
+        if stop:
+            return
+
+
+def _commit_batch(batch: List[Tuple[float, str, str, Dict[str, Any]]]) -> None:
+    by_tenant: Dict[str, List[Tuple[float, str, Dict[str, Any]]]] = defaultdict(list)
+    for enqueued_at, tenant_id, conversation_id, payload in batch:
+        by_tenant[tenant_id].append((enqueued_at, conversation_id, payload))
+
+    for tenant_id, entries in by_tenant.items():
+        items = [(conversation_id, payload) for _, conversation_id, payload in entries]
+        try:
+            _save_with_retry(tenant_id, items)
+            lost: List[Dict[str, Any]] = []
+        except Exception:
+            logger.exception(
+                "Write-behind batch failed; writing rows individually",
+                extra={"tenant_id": tenant_id, "batch_size": len(entries)},
+            )
+            lost = _save_rows(tenant_id, items)
+
+        now = time.monotonic()
+        lag_ms = (now - min(e[0] for e in entries)) * 1000.0
+        with _lock:
+            _stats["committed"] += len(entries) - len(lost)
+            _stats["failed"] += len(lost)
+            _recent_failures.extend(lost)
+            _stats["last_batch_size"] = len(entries)
+            _stats["last_batch_lag_ms"] = round(lag_ms, 3)
+            _stats["max_batch_lag_ms"] = round(max(_stats["max_batch_lag_ms"], lag_ms), 3)
+            for _, _, payload in entries:
+                _oldest_pending.pop(id(payload), None)
+
+
+def _is_transient(exc: Exception) -> bool:
+    if not isinstance(exc, sqlite3.OperationalError):
+        return False
+    message = str(exc).lower()
+    return "locked" in message or "busy" in message or "pool exhausted" in message
+
+
+def _save_with_retry(tenant_id: str, items: List[Tuple[str, Dict[str, Any]]]) -> None:
+    delay = RETRY_BACKOFF_SECONDS
+    for attempt in range(RETRY_ATTEMPTS + 1):
+        try:
+            save_query_results(tenant_id=tenant_id, items=items)
+            return
+        except Exception as exc:
+            if attempt == RETRY_ATTEMPTS or not _is_transient(exc):
+                raise
+        with _lock:
+            _stats["retries"] += 1
+        time.sleep(delay)
+        delay *= 2
+
+
+def _save_rows(tenant_id: str, items: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    # Returns the rows that could not be written
+    lost = []
+    for conversation_id, payload in items:
+        try:
+            _save_with_retry(tenant_id, [(conversation_id, payload)])
+        except Exception as exc:
+            request_id = payload.get("request_id") if isinstance(payload, dict) else None
+            logger.error(
+                "Write-behind row lost",
+                extra={
+                    "tenant_id": tenant_id,
+                    "conversation_id": conversation_id,
+                    "request_id": request_id,
+                    "error": repr(exc),
+                },
+            )
+            lost.append(
+                {
+                    "tenant_id": tenant_id,
+                    "conversation_id": conversation_id,
+                    "request_id": request_id,
+                    "error": repr(exc),
+                }
+            )
+    return lost
+
+
+# ----------------------------
+# Lifecycle / introspection
+# ----------------------------
+def flush(timeout: float = 10.0) -> bool:
+    """
+    Blocks until everything enqueued so far is committed (or failed).
+    Returns False if the timeout elapsed first.
+    """
+    if _writer is None or not _writer.is_alive():
+        return _queue.unfinished_tasks == 0
+
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(FLUSH_INTERVAL_SECONDS or 0.001)
+    return True
+
+
+def shutdown(timeout: float = 10.0) -> None:
+    """
+    Flushes pending responses and stops the writer thread.
+    """
+    global _writer
+
+    writer = _writer
+    if writer is None or not writer.is_alive():
+        return
+
+    _queue.put(None)
+    writer.join(timeout)
+    if writer.is_alive():
+        logger.warning(
+            "Persistence writer did not stop in time",
+            extra={"pending": _queue.qsize()},
+        )
+        return
+    _writer = None
+
+
+def stats() -> Dict[str, Any]:
+    now = time.monotonic()
+    with _lock:
+        oldest = min(_oldest_pending.values()) if _oldest_pending else None
+        snapshot = dict(_stats)
+
+    snapshot.update(
+        {
+            "mode": PERSIST_MODE,
+            "queue_depth": _queue.qsize(),
+            "queue_capacity": QUEUE_MAX_SIZE,
+            "oldest_pending_ms": round((now - oldest) * 1000.0, 3) if oldest is not None else 0.0,
+        }
+    )
+    return snapshot
+
+
+def recent_failures() -> List[Dict[str, Any]]:
+    """
+    Rows the writer gave up on (most recent last), with the error.
+    """
+    with _lock:
+        return list(_recent_failures)
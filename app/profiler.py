@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from app.persist import DB_ROOT
+
+# =====================================================
+# Per-request sampling profiler
+# =====================================================
+# Opt-in (/query "profile": true, privileged tokens only). A sampler
+# thread reads the handler thread's Python stack every INTERVAL via
+# sys._current_frames() and counts identical stacks. Nothing is
+# installed in the profiled thread (no sys.setprofile), so the overhead
+# is the sampler waking up, not per-call tracing.
+#
+# Output is the collapsed-stack ("folded") format understood by
+# flamegraph.pl, speedscope and inferno:
+#   root;caller (file.py:12);callee (file.py:40) <samples>
+#
+# Time inside C extensions (torch, onnx, sqlite, hnswlib) is attributed
+# to the Python frame that called into them.
+
+INTERVAL_SECONDS = float(os.getenv("P1_PROFILE_INTERVAL_MS", "5")) / 1000.0
+MAX_SECONDS = float(os.getenv("P1_PROFILE_MAX_SECONDS", "120"))
+
+
+def _tenant_profile_path(tenant_id: str) -> str:
+    return os.path.join(DB_ROOT, tenant_id, "profiles")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's stack until stop(). Use as a context manager
+    around the code to profile, from the thread being profiled.
+    """
+
+    def __init__(self, interval: float = INTERVAL_SECONDS):
+        self.interval = interval
+        self.thread_id: Optional[int] = None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        self.thread_id = threading.get_ident()
+        self.started = time.perf_counter()
+        self._sampler = threading.Thread(
+            target=self._run, name="p1-profiler", daemon=True
+        )
+        self._sampler.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.duration = time.perf_counter() - self.started
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        deadline = time.perf_counter() + MAX_SECONDS
+        while not self._stop.wait(self.interval):
+            if time.perf_counter() > deadline:
+                return
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.reverse()
+
+            self.stacks[";".join(labels)] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+
+def save(profiler: SamplingProfiler, tenant_id: str, request_id: str) -> Dict[str, Any]:
+    """
+    Writes data/tenants/<tenant_id>/profiles/<request_id>.folded and
+    returns a summary for the response debug block.
+    """
+    profile_dir = _tenant_profile_path(tenant_id)
+    os.makedirs(profile_dir, exist_ok=True)
+    path = os.path.join(profile_dir, f"{request_id}.folded")
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(profiler.folded())
+
+    return {
+        "path": path,
+        "format": "folded",
+        "samples": profiler.samples,
+        "interval_ms": round(profiler.interval * 1000.0, 3),
+        "duration_ms": round(profiler.duration * 1000.0, 3),
+    }
@@ -1,7 +1,20 @@
 import os
+import re
+import html
+import json
+import base64
 import sqlite3
-from fastapi import APIRouter, Request, HTTPException
-from app.persist import generate_conversation_title
+from datetime import datetime, timezone
+from typing import ContextManager, Iterator, Optional
+from fastapi import APIRouter, Request, Response, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.persist import (
+    STORED_QUERY_COLUMNS,
+    decode_query_rows,
+    ensure_schema,
+    stored_columns_for,
+)
+from app import conversation_cache, db_pool
 
 # =====================================================
 # Router
@@ -12,6 +25,31 @@ router = APIRouter(tags=["read"])
 DB_ROOT = os.path.join("data", "tenants")
 DB_FILENAME = "p1.db"
 
+DEFAULT_CONVERSATIONS_LIMIT = 50
+DEFAULT_ITEMS_LIMIT = 100
+DEFAULT_SEARCH_LIMIT = 20
+EXPORT_BATCH_SIZE = 500
+MAX_PAGE_LIMIT = 500
+
+# Search hit markers: control characters that do not occur in stored
+# text, swapped for <mark> tags after the snippet is HTML-escaped
+_MARK_OPEN = "\x02"
+_MARK_CLOSE = "\x03"
+
+# Selectable columns for conversation items (request_id/created_at are
+# always returned: they form the pagination key)
+QUERY_ITEM_FIELDS = (
+    "request_id",
+    "created_at",
+    "query",
+    "mode",
+    "answer",
+    "citations_json",
+    "artifacts_json",
+    "debug_json",
+    "response_json",
+)
+
 
 # =====================================================
 # Helpers
@@ -21,157 +59,410 @@ def _tenant_db_path(tenant_id: str) -> str:
     return os.path.join(DB_ROOT, tenant_id, DB_FILENAME)
 
 
-def _connect(db_path: str) -> sqlite3.Connection:
+def _connect(db_path: str) -> ContextManager[sqlite3.Connection]:
+    """
+    Returns a pooled connection (use as a context manager).
+    """
     if not os.path.isfile(db_path):
         raise FileNotFoundError("Persistence DB not found")
 
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # Schema/migrations are applied once per process, not per read
+    ensure_schema(db_path)
 
+    return db_pool.connection(db_path)
 
-def _ensure_conversation_title_column(conn: sqlite3.Connection) -> None:
-    columns = {
-        row["name"]
-        for row in conn.execute("PRAGMA table_info(conversations)").fetchall()
-    }
-    if "title" not in columns:
-        conn.execute("ALTER TABLE conversations ADD COLUMN title TEXT")
-
-
-def _backfill_missing_conversation_titles(
-    conn: sqlite3.Connection, tenant_id: str
-) -> None:
-    rows = conn.execute(
-        """
-        SELECT conversation_id
-        FROM conversations
-        WHERE tenant_id = ?
-          AND (title IS NULL OR TRIM(title) = '')
-        """,
-        (tenant_id,),
-    ).fetchall()
-
-    for row in rows:
-        first_query_row = conn.execute(
-            """
-            SELECT query
-            FROM queries
-            WHERE tenant_id = ?
-              AND conversation_id = ?
-            ORDER BY created_at ASC
-            LIMIT 1
-            """,
-            (tenant_id, row["conversation_id"]),
-        ).fetchone()
 
-        if not first_query_row:
-            continue
+def _encode_cursor(*values: str) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
 
-        title = generate_conversation_title(str(first_query_row["query"] or ""))
-        if not title:
-            continue
 
-        conn.execute(
-            """
-            UPDATE conversations
-            SET title = ?
-            WHERE tenant_id = ?
-              AND conversation_id = ?
-              AND (title IS NULL OR TRIM(title) = '')
-            """,
-            (title, tenant_id, row["conversation_id"]),
+def _decode_cursor(cursor: str, size: int) -> list:
+    """
+    Opaque keyset cursor -> list of `size` key values (400 if malformed).
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if (
+        not isinstance(values, list)
+        or len(values) != size
+        or not all(isinstance(v, str) for v in values)
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _fts_match_expression(q: str) -> str:
+    """
+    User text -> FTS5 MATCH expression: every word must match, each
+    quoted so FTS5 operators/syntax in the input are treated literally.
+    """
+    terms = re.findall(r"\w+", q, flags=re.UNICODE)
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def _etag(conn: sqlite3.Connection) -> Optional[str]:
+    """
+    Weak ETag from the DB change counter (bumped by triggers on every
+    history write). One single-row read, no query rows touched.
+    """
+    row = conn.execute(
+        "SELECT epoch, version FROM change_counter WHERE id = 1"
+    ).fetchone()
+    return f'W/"{row["epoch"]}-{row["version"]}"' if row else None
+
+
+def _not_modified(request: Request, response: Response, etag: Optional[str]) -> Optional[Response]:
+    """
+    Sets validators on the response; returns a 304 response if the
+    client's If-None-Match already matches.
+    """
+    if etag is None:
+        return None
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+
+    # Weak comparison (RFC 9110): ignore W/ prefixes
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    if "*" in tags or etag.removeprefix("W/") in tags:
+        return Response(status_code=304, headers=headers)
+    return None
+
+
+def _highlight(snippet: Optional[str]) -> Optional[str]:
+    # Stored questions/answers are untrusted: <mark> is the only markup
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+
+def _select_fields(fields: Optional[str]) -> list[str]:
+    if not fields:
+        return list(QUERY_ITEM_FIELDS)
+
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested.difference(QUERY_ITEM_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}",
         )
 
+    requested.update({"request_id", "created_at"})
+    # Keep a stable column order
+    return [f for f in QUERY_ITEM_FIELDS if f in requested]
+
 
 # =====================================================
 # Read APIs (READ-ONLY)
 # =====================================================
 
 @router.get("/conversations")
-def list_conversations(request: Request):
+def list_conversations(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_CONVERSATIONS_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+):
     """
-    Lists all conversations for the authenticated tenant.
+    Lists conversations for the authenticated tenant, most recent first.
+    Keyset-paginated on (last_activity_at, conversation_id); pass
+    next_cursor back as `cursor` for the following page.
     """
     tenant_id = request.state.tenant_id
     db_path = _tenant_db_path(tenant_id)
 
+    after = _decode_cursor(cursor, 2) if cursor else None
+
     try:
-        conn = _connect(db_path)
+        pooled = _connect(db_path)
     except FileNotFoundError:
-        return {"tenant_id": tenant_id, "conversations": []}
+        return {"tenant_id": tenant_id, "conversations": [], "next_cursor": None}
+
+    # One read snapshot for the ETag and the rows
+    with pooled as conn, db_pool.transaction(conn, immediate=False):
+        not_modified = _not_modified(request, response, _etag(conn))
+        if not_modified is not None:
+            return not_modified
+
+        if after is None:
+            rows = conn.execute(
+                """
+                SELECT
+                  conversation_id,
+                  title,
+                  created_at,
+                  last_activity_at
+                FROM conversations
+                WHERE tenant_id = ?
+                ORDER BY last_activity_at DESC, conversation_id DESC
+                LIMIT ?
+                """,
+                (tenant_id, limit + 1),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                """
+                SELECT
+                  conversation_id,
+                  title,
+                  created_at,
+                  last_activity_at
+                FROM conversations
+                WHERE tenant_id = ?
+                  AND (last_activity_at, conversation_id) < (?, ?)
+                ORDER BY last_activity_at DESC, conversation_id DESC
+                LIMIT ?
+                """,
+                (tenant_id, after[0], after[1], limit + 1),
+            ).fetchall()
+
+    conversations = [dict(row) for row in rows[:limit]]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = conversations[-1]
+        next_cursor = _encode_cursor(last["last_activity_at"], last["conversation_id"])
+
+    return {
+        "tenant_id": tenant_id,
+        "conversations": conversations,
+        "next_cursor": next_cursor,
+    }
+
+
+@router.get("/conversations/search")
+def search_conversations(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+):
+    """
+    Full-text search over the tenant's past questions and answers.
+    Hits are ranked by BM25 (question matches weigh double) and carry
+    highlighted snippets; paginate with next_cursor.
+    """
+    tenant_id = request.state.tenant_id
+    db_path = _tenant_db_path(tenant_id)
+
+    match = _fts_match_expression(q)
+    if not match:
+        raise HTTPException(status_code=400, detail="Search query has no searchable terms")
+
+    offset = 0
+    if cursor:
+        value = _decode_cursor(cursor, 1)[0]
+        if not value.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        offset = int(value)
 
     try:
-        _ensure_conversation_title_column(conn)
-        _backfill_missing_conversation_titles(conn, tenant_id)
+        pooled = _connect(db_path)
+    except FileNotFoundError:
+        return {"tenant_id": tenant_id, "query": q, "hits": [], "next_cursor": None}
+
+    with pooled as conn, db_pool.transaction(conn, immediate=False):
+        not_modified = _not_modified(request, response, _etag(conn))
+        if not_modified is not None:
+            return not_modified
+
+        has_index = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'queries_fts'"
+        ).fetchone()
+        if not has_index:
+            raise HTTPException(status_code=501, detail="Search is not available")
+
         rows = conn.execute(
             """
             SELECT
-              conversation_id,
-              title,
-              created_at,
-              last_activity_at
-            FROM conversations
-            ORDER BY last_activity_at DESC
-            """
+              q.request_id,
+              q.conversation_id,
+              q.created_at,
+              q.mode,
+              snippet(queries_fts, 0, ?, ?, '…', 16) AS query_snippet,
+              snippet(queries_fts, 1, ?, ?, '…', 24) AS answer_snippet,
+              bm25(queries_fts, 2.0, 1.0) AS score
+            FROM queries_fts
+            JOIN queries q ON q.rowid = queries_fts.rowid
+            WHERE queries_fts MATCH ?
+              AND q.tenant_id = ?
+            ORDER BY score ASC, q.rowid ASC
+            LIMIT ? OFFSET ?
+            """,
+            (
+                _MARK_OPEN, _MARK_CLOSE, _MARK_OPEN, _MARK_CLOSE,
+                match, tenant_id, limit + 1, offset,
+            ),
         ).fetchall()
 
-        conversations = [dict(row) for row in rows]
-
-        return {
-            "tenant_id": tenant_id,
-            "conversations": conversations,
-        }
-    finally:
-        conn.close()
+    hits = []
+    for row in rows[:limit]:
+        hit = dict(row)
+        hit["query_snippet"] = _highlight(hit["query_snippet"])
+        hit["answer_snippet"] = _highlight(hit["answer_snippet"])
+        hits.append(hit)
+    next_cursor = _encode_cursor(str(offset + limit)) if len(rows) > limit else None
+
+    return {
+        "tenant_id": tenant_id,
+        "query": q,
+        "hits": hits,
+        "next_cursor": next_cursor,
+    }
 
 
-@router.get("/conversations/{conversation_id}")
-def get_conversation(conversation_id: str, request: Request):
+@router.get("/conversations/export")
+def export_conversations(request: Request, since: Optional[str] = None):
     """
-    Returns all persisted query results for a conversation.
+    Streams every persisted query for the tenant as NDJSON (one /query
+    response object per line, oldest first). `since` (ISO-8601) limits
+    the export to queries created at or after that instant.
+    Memory stays constant: rows are read from a server-side cursor in
+    batches and written out as they are decoded.
     """
     tenant_id = request.state.tenant_id
     db_path = _tenant_db_path(tenant_id)
 
+    if since is not None:
+        try:
+            since_dt = datetime.fromisoformat(since)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="since must be an ISO-8601 timestamp")
+        # created_at is stored as UTC isoformat(): compare like with like
+        if since_dt.tzinfo is None:
+            since_dt = since_dt.replace(tzinfo=timezone.utc)
+        since = since_dt.astimezone(timezone.utc).isoformat()
+
     try:
-        conn = _connect(db_path)
+        pooled = _connect(db_path)
     except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+        return StreamingResponse(iter(()), media_type="application/x-ndjson")
 
-    try:
+    return StreamingResponse(
+        _export_lines(pooled, tenant_id, since),
+        media_type="application/x-ndjson",
+    )
+
+
+def _export_lines(
+    pooled: ContextManager[sqlite3.Connection], tenant_id: str, since: Optional[str]
+) -> Iterator[str]:
+    columns = ", ".join(("conversation_id",) + STORED_QUERY_COLUMNS)
+
+    # The pooled connection is held for the whole stream and returned
+    # when the generator finishes or the client disconnects
+    with pooled as conn:
         rows = conn.execute(
-            """
-            SELECT
-              request_id,
-              created_at,
-              query,
-              mode,
-              answer,
-              citations_json,
-              artifacts_json,
-              debug_json,
-              response_json
+            f"""
+            SELECT {columns}
             FROM queries
             WHERE tenant_id = ?
-              AND conversation_id = ?
-            ORDER BY created_at ASC
+              AND created_at >= ?
+            ORDER BY created_at ASC, request_id ASC
             """,
-            (tenant_id, conversation_id),
-        ).fetchall()
+            (tenant_id, since or ""),
+        )
+
+        while True:
+            batch = rows.fetchmany(EXPORT_BATCH_SIZE)
+            if not batch:
+                return
+
+            items = decode_query_rows(
+                conn, tenant_id=tenant_id, rows=batch, fields=["response_json"]
+            )
+            yield "".join(item["response_json"] + "\n" for item in items)
+
+
+@router.get("/conversations/{conversation_id}")
+def get_conversation(
+    conversation_id: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_ITEMS_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """
+    Returns persisted query results for a conversation, oldest first.
+    Keyset-paginated on (created_at, request_id). `fields` is a
+    comma-separated subset of QUERY_ITEM_FIELDS (e.g. to skip the JSON blobs).
+    """
+    tenant_id = request.state.tenant_id
+    db_path = _tenant_db_path(tenant_id)
+
+    after = _decode_cursor(cursor, 2) if cursor else None
+    selected = _select_fields(fields)
+    columns = ", ".join(stored_columns_for(selected))
+
+    try:
+        pooled = _connect(db_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Conversation not found")
 
-        if not rows:
+    with pooled as conn, db_pool.transaction(conn, immediate=False):
+        not_modified = _not_modified(request, response, _etag(conn))
+        if not_modified is not None:
+            return not_modified
+
+        if after is None:
+            rows = conn.execute(
+                f"""
+                SELECT {columns}
+                FROM queries
+                WHERE tenant_id = ?
+                  AND conversation_id = ?
+                ORDER BY created_at ASC, request_id ASC
+                LIMIT ?
+                """,
+                (tenant_id, conversation_id, limit + 1),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                f"""
+                SELECT {columns}
+                FROM queries
+                WHERE tenant_id = ?
+                  AND conversation_id = ?
+                  AND (created_at, request_id) > (?, ?)
+                ORDER BY created_at ASC, request_id ASC
+                LIMIT ?
+                """,
+                (tenant_id, conversation_id, after[0], after[1], limit + 1),
+            ).fetchall()
+
+        if not rows and after is None:
             raise HTTPException(status_code=404, detail="Conversation not found")
 
-        items = [dict(row) for row in rows]
+        items = decode_query_rows(
+            conn,
+            tenant_id=tenant_id,
+            conversation_id=conversation_id,
+            rows=rows[:limit],
+            fields=selected,
+        )
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = _encode_cursor(last["created_at"], last["request_id"])
 
-        return {
-            "tenant_id": tenant_id,
-            "conversation_id": conversation_id,
-            "items": items,
-        }
-    finally:
-        conn.close()
+    return {
+        "tenant_id": tenant_id,
+        "conversation_id": conversation_id,
+        "items": items,
+        "next_cursor": next_cursor,
+    }
 
 
 @router.delete("/conversations/{conversation_id}")
@@ -183,11 +474,11 @@ def delete_conversation(conversation_id: str, request: Request):
     db_path = _tenant_db_path(tenant_id)
 
     try:
-        conn = _connect(db_path)
+        pooled = _connect(db_path)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    try:
+    with pooled as conn, db_pool.transaction(conn):
         conn.execute(
             """
             DELETE FROM queries
@@ -205,8 +496,7 @@ def delete_conversation(conversation_id: str, request: Request):
             """,
             (tenant_id, conversation_id),
         )
-        conn.commit()
 
-        return {"status": "deleted"}
-    finally:
-        conn.close()
+    conversation_cache.invalidate(tenant_id, conversation_id)
+
+    return {"status": "deleted"}
@@ -0,0 +1,423 @@
+import os
+import json
+import gzip
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app import conversation_cache, db_pool, persist_queue
+from app.persist import (
+    DB_FILENAME,
+    DB_ROOT,
+    STORED_QUERY_COLUMNS,
+    decode_query_rows,
+    ensure_schema,
+    prune_unreferenced_chunks,
+)
+from app.tenant_config import get_tenant_setting
+
+# =====================================================
+# Retention, archival and incremental vacuum
+# =====================================================
+# Per tenant ("retention_days" tenant setting; unset = keep forever):
+#   1. rows older than N days are written to gzip NDJSON archive
+#      chunks under data/tenants/<tenant_id>/archive/ and deleted, in
+#      small transactions so /query writes are never blocked for long
+#   2. emptied conversations and uncited chunks are removed
+#   3. free pages are returned with PRAGMA incremental_vacuum and the
+#      WAL is checkpointed, a few pages at a time
+#
+# Runs from the CLI (python -m app.retention) or as a background task
+# (P1_RETENTION_INTERVAL_SECONDS > 0) that only touches quiet tenants.
+# DBs created before auto_vacuum=INCREMENTAL need a one-time full VACUUM
+# (exclusive lock on the whole file): only the CLI does that, with
+# --convert-vacuum. The background task skips reclaiming space for them.
+# The scheduler runs in every API worker, so a run holds a per-tenant
+# file lock; a tenant already being processed elsewhere is skipped.
+
+logger = logging.getLogger("p1.retention")
+
+BATCH_SIZE = int(os.getenv("P1_RETENTION_BATCH_SIZE", "500"))
+VACUUM_PAGES_PER_STEP = int(os.getenv("P1_RETENTION_VACUUM_PAGES", "256"))
+VACUUM_MAX_STEPS = int(os.getenv("P1_RETENTION_VACUUM_MAX_STEPS", "1000"))
+STEP_PAUSE_SECONDS = float(os.getenv("P1_RETENTION_STEP_PAUSE_MS", "20")) / 1000.0
+INTERVAL_SECONDS = float(os.getenv("P1_RETENTION_INTERVAL_SECONDS", "0"))
+QUIET_SECONDS = float(os.getenv("P1_RETENTION_QUIET_SECONDS", "300"))
+
+# Fallback for _tenant_lock() where fcntl is unavailable
+_local_lock = threading.Lock()
+
+
+def _tenant_db_path(tenant_id: str) -> str:
+    return os.path.join(DB_ROOT, tenant_id, DB_FILENAME)
+
+
+def _tenant_archive_path(tenant_id: str) -> str:
+    return os.path.join(DB_ROOT, tenant_id, "archive")
+
+
+def _db_bytes(db_path: str) -> int:
+    total = 0
+    for suffix in ("", "-wal"):
+        try:
+            total += os.path.getsize(db_path + suffix)
+        except OSError:
+            pass
+    return total
+
+
+def retention_days(tenant_id: str) -> Optional[int]:
+    days = get_tenant_setting(tenant_id, "retention_days", None)
+    return int(days) if days is not None else None
+
+
+# =====================================================
+# Steps
+# =====================================================
+@contextmanager
+def _tenant_lock(tenant_id: str) -> Iterator[bool]:
+    """
+    Yields True if this process now owns retention for the tenant, False
+    if another process (or thread) is already running it.
+    """
+    archive_dir = _tenant_archive_path(tenant_id)
+    os.makedirs(archive_dir, exist_ok=True)
+
+    try:
+        import fcntl
+    except ImportError:  # not POSIX: in-process only
+        if not _local_lock.acquire(blocking=False):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            _local_lock.release()
+        return
+
+    with open(os.path.join(archive_dir, ".lock"), "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _write_archive_chunk(path: str, lines: List[str]) -> None:
+    # Complete gzip file or nothing: a crash leaves only a .tmp behind
+    directory, name = os.path.split(path)
+    tmp = os.path.join(directory, f".{name}.tmp")
+    try:
+        with open(tmp, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as out:
+                for line in lines:
+                    out.write(line.encode("utf-8"))
+                    out.write(b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _archive_and_delete(conn, tenant_id: str, cutoff: str, archive_prefix: str) -> Tuple[int, List[str]]:
+    """
+    Moves rows created before cutoff into archive chunks
+    (<archive_prefix>-<n>.ndjson.gz), BATCH_SIZE rows each. Each chunk is
+    published before its rows are deleted, so a crash can at worst
+    archive a batch twice, never lose it. Returns (rows, chunk paths).
+    """
+    columns = ", ".join(("conversation_id",) + STORED_QUERY_COLUMNS)
+    archived = 0
+    files: List[str] = []
+
+    while True:
+        rows = conn.execute(
+            f"""
+            SELECT {columns}
+            FROM queries
+            WHERE tenant_id = ?
+              AND created_at < ?
+            ORDER BY created_at ASC, request_id ASC
+            LIMIT ?
+            """,
+            (tenant_id, cutoff, BATCH_SIZE),
+        ).fetchall()
+        if not rows:
+            return archived, files
+
+        items = decode_query_rows(
+            conn, tenant_id=tenant_id, rows=rows, fields=["response_json"]
+        )
+        path = f"{archive_prefix}-{len(files) + 1:05d}.ndjson.gz"
+        _write_archive_chunk(path, [item["response_json"] for item in items])
+        files.append(path)
+
+        with db_pool.transaction(conn):
+            conn.executemany(
+                "DELETE FROM queries WHERE tenant_id = ? AND request_id = ?",
+                [(tenant_id, row["request_id"]) for row in rows],
+            )
+
+        archived += len(rows)
+        time.sleep(STEP_PAUSE_SECONDS)
+
+
+def _delete_empty_conversations(conn, tenant_id: str, cutoff: str) -> int:
+    with db_pool.transaction(conn):
+        return conn.execute(
+            """
+            DELETE FROM conversations
+            WHERE tenant_id = ?
+              AND last_activity_at < ?
+              AND NOT EXISTS (
+                SELECT 1 FROM queries q
+                WHERE q.tenant_id = conversations.tenant_id
+                  AND q.conversation_id = conversations.conversation_id
+              )
+            """,
+            (tenant_id, cutoff),
+        ).rowcount
+
+
+def _is_incremental(conn) -> bool:
+    return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def _convert_to_incremental_vacuum(conn) -> None:
+    """
+    One-time conversion of a DB created before auto_vacuum=INCREMENTAL.
+    Full VACUUM: blocks every other connection until it finishes, so it
+    is only run on request (CLI --convert-vacuum). VACUUM may renumber
+    rowids, so the external-content FTS index is rebuilt afterwards.
+    """
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+
+    has_fts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'queries_fts'"
+    ).fetchone()
+    if has_fts:
+        conn.execute("INSERT INTO queries_fts(queries_fts) VALUES ('rebuild')")
+
+
+def _freelist_count(conn) -> int:
+    return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def _incremental_vacuum(conn) -> int:
+    """
+    Releases free pages in steps of VACUUM_PAGES_PER_STEP, at most
+    VACUUM_MAX_STEPS per run. Stops early once a step no longer shrinks
+    the freelist (concurrent writers reusing pages). Returns the pages
+    actually released.
+    """
+    freed = 0
+    free_pages = _freelist_count(conn)
+    for _ in range(VACUUM_MAX_STEPS):
+        if free_pages <= 0:
+            break
+        step = min(free_pages, VACUUM_PAGES_PER_STEP)
+        # execute() would stop after the first page; connections are in
+        # autocommit mode, so executescript() commits nothing early
+        conn.executescript(f"PRAGMA incremental_vacuum({step});")
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+
+        remaining = _freelist_count(conn)
+        if remaining >= free_pages:
+            break
+        freed += free_pages - remaining
+        free_pages = remaining
+        time.sleep(STEP_PAUSE_SECONDS)
+
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    return freed
+
+
+# =====================================================
+# Public API
+# =====================================================
+def run_retention(
+    tenant_id: str, days: Optional[int] = None, convert_vacuum: bool = False
+) -> Dict[str, Any]:
+    """
+    Applies the retention policy to one tenant DB and reports what was
+    archived, deleted and reclaimed. days overrides the tenant setting;
+    convert_vacuum allows the one-time full VACUUM of an old DB.
+    """
+    if days is None:
+        days = retention_days(tenant_id)
+
+    db_path = _tenant_db_path(tenant_id)
+    report: Dict[str, Any] = {"tenant_id": tenant_id, "retention_days": days}
+
+    if days is None or not os.path.isfile(db_path):
+        report["skipped"] = "no retention policy" if days is None else "no database"
+        return report
+
+    with _tenant_lock(tenant_id) as owned:
+        if not owned:
+            report["skipped"] = "already running in another process"
+            return report
+        report.update(_run_locked(tenant_id, db_path, days, convert_vacuum))
+    return report
+
+
+def _run_locked(tenant_id: str, db_path: str, days: int, convert_vacuum: bool) -> Dict[str, Any]:
+    started = time.monotonic()
+    bytes_before = _db_bytes(db_path)
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    archive_prefix = os.path.join(_tenant_archive_path(tenant_id), f"queries-{stamp}")
+
+    ensure_schema(db_path)
+    with db_pool.connection(db_path) as conn:
+        archived, files = _archive_and_delete(conn, tenant_id, cutoff, archive_prefix)
+        conversations = _delete_empty_conversations(conn, tenant_id, cutoff)
+
+        with db_pool.transaction(conn):
+            chunks = prune_unreferenced_chunks(conn)
+
+        converted = False
+        if not _is_incremental(conn) and convert_vacuum:
+            _convert_to_incremental_vacuum(conn)
+            converted = True
+
+        if _is_incremental(conn):
+            vacuum_skipped = None
+            freed_pages = _incremental_vacuum(conn)
+        else:
+            vacuum_skipped = "auto_vacuum is not INCREMENTAL (run python -m app.retention --convert-vacuum)"
+            freed_pages = 0
+            logger.warning(
+                "Retention cannot reclaim space: DB needs a one-time VACUUM",
+                extra={"tenant_id": tenant_id},
+            )
+
+    if archived:
+        conversation_cache.invalidate(tenant_id)
+
+    bytes_after = _db_bytes(db_path)
+    return {
+        "cutoff": cutoff,
+        "archived_queries": archived,
+        "archive_files": files,
+        "deleted_conversations": conversations,
+        "deleted_chunks": chunks,
+        "converted_to_incremental_vacuum": converted,
+        "freed_pages": freed_pages,
+        "vacuum_skipped": vacuum_skipped,
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "reclaimed_bytes": max(bytes_before - bytes_after, 0),
+        "duration_ms": round((time.monotonic() - started) * 1000.0, 1),
+    }
+
+
+def _is_quiet(tenant_id: str) -> bool:
+    db_path = _tenant_db_path(tenant_id)
+    try:
+        last_write = max(
+            os.path.getmtime(db_path + suffix)
+            for suffix in ("", "-wal")
+            if os.path.exists(db_path + suffix)
+        )
+    except ValueError:
+        return False
+    return time.time() - last_write >= QUIET_SECONDS
+
+
+def run_all(quiet_only: bool = False, convert_vacuum: bool = False) -> List[Dict[str, Any]]:
+    reports: List[Dict[str, Any]] = []
+    if not os.path.isdir(DB_ROOT):
+        return reports
+
+    for tenant_id in sorted(os.listdir(DB_ROOT)):
+        if retention_days(tenant_id) is None:
+            continue
+        if quiet_only and not _is_quiet(tenant_id):
+            continue
+        try:
+            reports.append(run_retention(tenant_id, convert_vacuum=convert_vacuum))
+        except Exception:
+            logger.exception("Retention failed", extra={"tenant_id": tenant_id})
+
+    return reports
+
+
+# =====================================================
+# Background task
+# =====================================================
+_scheduler: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def _run_scheduler() -> None:
+    while not _stop.wait(INTERVAL_SECONDS):
+        # Quiet period: nothing waiting to be written on this worker
+        if persist_queue.stats()["queue_depth"]:
+            continue
+        for report in run_all(quiet_only=True):
+            logger.info("Retention run", extra={"report": report})
+
+
+def start_scheduler() -> None:
+    global _scheduler
+
+    if INTERVAL_SECONDS <= 0 or (_scheduler is not None and _scheduler.is_alive()):
+        return
+    _stop.clear()
+    _scheduler = threading.Thread(
+        target=_run_scheduler, name="p1-retention", daemon=True
+    )
+    _scheduler.start()
+
+
+def stop_scheduler() -> None:
+    _stop.set()
+
+
+# =====================================================
+# CLI usage (manual retention)
+# =====================================================
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m app.retention",
+        description="Archive and delete old query history, then reclaim space",
+    )
+    parser.add_argument("tenant_ids", nargs="*", help="Tenants to process (default: all with a policy)")
+    parser.add_argument("--days", type=int, help="Override the tenant retention_days setting")
+    parser.add_argument(
+        "--convert-vacuum",
+        action="store_true",
+        help="One-time full VACUUM of DBs without incremental vacuum (locks each DB while it runs)",
+    )
+    args = parser.parse_args()
+
+    if args.tenant_ids:
+        results = [
+            run_retention(t, days=args.days, convert_vacuum=args.convert_vacuum)
+            for t in args.tenant_ids
+        ]
+    elif args.days is not None:
+        results = [
+            run_retention(t, days=args.days, convert_vacuum=args.convert_vacuum)
+            for t in sorted(os.listdir(DB_ROOT))
+            if os.path.isfile(_tenant_db_path(t))
+        ] if os.path.isdir(DB_ROOT) else []
+    else:
+        results = run_all(convert_vacuum=args.convert_vacuum)
+
+    for result in results:
+        print(json.dumps(result))
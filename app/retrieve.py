@@ -1,4 +1,8 @@
 import os
+import threading
+
+from app import snapshot
+from app.metrics import Timings
 
 CI_MODE = os.getenv("CI") == "true"
 
@@ -13,16 +17,165 @@ STATUS_CI_MODE = "ci_mode"
 STATUS_NO_TENANT_STORE = "no_documents_ingested"
 STATUS_EMPTY_RESULTS = "no_chunks"
 
-if not CI_MODE:
-    from langchain_community.vectorstores import Chroma
-    from langchain_huggingface import HuggingFaceEmbeddings
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Open tenant stores kept per process (each holds a Chroma client)
+STORE_CACHE_SIZE = int(os.getenv("P1_STORE_CACHE_SIZE", "16"))
 
 
 def _tenant_chroma_path(tenant_id: str) -> str:
     return os.path.join(TENANTS_ROOT, tenant_id, "chroma")
 
 
-def retrieve(query: str, k: int = 3, tenant_id: str | None = None, return_status: bool = False):
+# =====================================================
+# Lazily loaded engine (langchain / chromadb / torch)
+# =====================================================
+# Nothing heavy is imported at module import: the first retrieval (or
+# app.startup warmup) pays for the imports and the model load, once
+# per process.
+
+_engine_lock = threading.Lock()
+_embeddings = None
+_stores: dict = {}  # persist_dir -> Chroma, insertion order = LRU
+
+
+def get_embeddings():
+    """
+    Process-wide embedding model (shared with ingestion).
+    """
+    global _embeddings
+
+    if _embeddings is None:
+        with _engine_lock:
+            if _embeddings is None:
+                from langchain_huggingface import HuggingFaceEmbeddings
+
+                _embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    return _embeddings
+
+
+def _tenant_of(persist_dir: str) -> str | None:
+    # data/tenants/<tenant_id>/chroma -> tenant_id (None for the legacy store)
+    tenant_dir = os.path.dirname(os.path.abspath(persist_dir))
+    if os.path.dirname(tenant_dir) != os.path.abspath(TENANTS_ROOT):
+        return None
+    return os.path.basename(tenant_dir)
+
+
+def _open_store(persist_dir: str):
+    from app import memory_budget
+
+    tenant_id = _tenant_of(persist_dir)
+    if tenant_id is not None:
+        memory_budget.touch(tenant_id)
+
+    with _engine_lock:
+        db = _stores.pop(persist_dir, None)
+        if db is not None:
+            _stores[persist_dir] = db
+            return db
+
+    from langchain_community.vectorstores import Chroma
+
+    db = Chroma(persist_directory=persist_dir, embedding_function=get_embeddings())
+
+    evicted = []
+    with _engine_lock:
+        _stores[persist_dir] = db
+        while len(_stores) > STORE_CACHE_SIZE:
+            key = next(iter(_stores))
+            _stores.pop(key)
+            _release_client(key)
+            evicted.append(key)
+
+    for key in evicted:
+        evicted_tenant = _tenant_of(key)
+        if evicted_tenant is not None:
+            memory_budget.forget(evicted_tenant)
+
+    # A newly resident index may push the process over its memory budget
+    memory_budget.enforce(protect=tenant_id)
+    return db
+
+
+def _release_client(persist_dir: str) -> None:
+    # chromadb keeps one System (with the loaded HNSW index) per path for
+    # the whole process; forget it so dropping the store frees the index.
+    # The next open builds a fresh one from disk.
+    import sys
+
+    client_module = sys.modules.get("chromadb.api.client")
+    systems = getattr(getattr(client_module, "SharedSystemClient", None), "_identifer_to_system", None)
+    if systems is not None:
+        systems.pop(persist_dir, None)
+
+
+def get_tenant_store(tenant_id: str):
+    """
+    Cached store for a tenant, or None if nothing has been indexed.
+    """
+    persist_dir = _tenant_chroma_path(tenant_id)
+    if not os.path.isdir(persist_dir):
+        return None
+    return _open_store(persist_dir)
+
+
+def evict_store(tenant_id: str) -> bool:
+    """
+    Drops a tenant's cached store in this process only; the next
+    retrieval reopens it. Returns whether it was resident.
+    """
+    persist_dir = _tenant_chroma_path(tenant_id)
+    with _engine_lock:
+        db = _stores.pop(persist_dir, None)
+        if db is not None:
+            _release_client(persist_dir)
+
+    from app import memory_budget
+
+    memory_budget.forget(tenant_id)
+    return db is not None
+
+
+def invalidate_store(tenant_id: str) -> None:
+    """
+    Drops a tenant's cached store (after reindexing or deleting it),
+    here and in the pool worker that owns the tenant.
+    """
+    evict_store(tenant_id)
+
+    from app import worker_pool
+
+    if worker_pool.routing_enabled():
+        worker_pool.notify_invalidate(tenant_id)
+
+
+def cached_store_count() -> int:
+    with _engine_lock:
+        return len(_stores)
+
+
+def cached_tenants() -> list[str]:
+    with _engine_lock:
+        paths = list(_stores)
+    return [t for t in map(_tenant_of, paths) if t is not None]
+
+
+def cached_embeddings():
+    """
+    The embedding model if it has been loaded, else None (no load).
+    """
+    return _embeddings
+
+
+def retrieve(
+    query: str,
+    k: int = 3,
+    tenant_id: str | None = None,
+    return_status: bool = False,
+    timings: Timings | None = None,
+    scope: list | None = None,
+):
     """
     Tenant-aware retrieval (wrapping only).
     - CI_MODE: returns [] always (status=ci_mode)
@@ -30,13 +183,44 @@ def retrieve(query: str, k: int = 3, tenant_id: str | None = None, return_status
         - If tenant chroma dir missing: returns [] (status=no_documents_ingested)
         - Else: queries that tenant store only
     - If tenant_id not provided (backward compatible): uses legacy DB_PATH="data"
+    - timings (optional): records "open", "embed" and "search" stages
+    - scope (optional): [(source, first_page, last_page), ...] searches
+      only those documents/pages (pages inclusive, None = open-ended),
+      before top-k is taken; empty = whole tenant
+    """
+    results, status, _ = retrieve_with_embedding(
+        query, k=k, tenant_id=tenant_id, timings=timings, scope=scope
+    )
+    return (results, status) if return_status else results
+
+
+def retrieve_with_embedding(
+    query: str,
+    k: int = 3,
+    tenant_id: str | None = None,
+    timings: Timings | None = None,
+    scope: list | None = None,
+):
+    """
+    retrieve(..., return_status=True) plus the query embedding it
+    searched with: (results, status, embedding). embedding is None
+    when nothing was embedded (CI mode, no tenant store).
     """
     if CI_MODE:
-        return ([], STATUS_CI_MODE) if return_status else []
+        return [], STATUS_CI_MODE, None
 
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
-    )
+    timings = timings or Timings()
+
+    # Tenant owned by a pool worker (app.worker_pool): run it there
+    if tenant_id is not None:
+        from app import worker_pool
+
+        remote = worker_pool.remote_retrieve(query, k, tenant_id, scope) if worker_pool.routing_enabled() else None
+        if remote is not None:
+            results, status, stages, query_embedding = remote
+            for stage, seconds in stages.items():
+                timings.add(stage, seconds)
+            return results, status, query_embedding
 
     # Backward compatible path (will be eliminated once api.py passes tenant_id)
     if tenant_id is None:
@@ -46,17 +230,179 @@ def retrieve(query: str, k: int = 3, tenant_id: str | None = None, return_status
 
         # Fail closed: no global fallback
         if not os.path.isdir(persist_dir):
-            return ([], STATUS_NO_TENANT_STORE) if return_status else []
+            return [], STATUS_NO_TENANT_STORE, None
+
+    with timings.span("open"):
+        embeddings = get_embeddings()
+        snap, db = _open_index(tenant_id, persist_dir, scope)
+
+    try:
+        # Same as similarity_search_with_score(), split so each stage is timed
+        with timings.span("embed"):
+            query_embedding = embeddings.embed_query(query)
+        with timings.span("search"):
+            if snap is not None:
+                results = _snapshot_results(snap, tenant_id, [query_embedding], k, scope)[0]
+            else:
+                results = db.similarity_search_by_vector_with_relevance_scores(
+                    query_embedding, k=k, filter=_chroma_where(scope)
+                )
+    finally:
+        if snap is not None:
+            snapshot.release(snap)
+
+    return results, STATUS_OK if results else STATUS_EMPTY_RESULTS, query_embedding
 
-    db = Chroma(
-        persist_directory=persist_dir,
-        embedding_function=embeddings
+
+def retrieve_many(
+    queries: list[str],
+    k: int = 3,
+    tenant_id: str | None = None,
+    timings: Timings | None = None,
+    scope: list | None = None,
+):
+    """
+    Batch form of retrieve(..., return_status=True) for one tenant:
+    the store is opened once, all queries are embedded in one pass and
+    searched in one collection query. Returns [(results, status), ...]
+    in input order; results match retrieve() for the same query. scope
+    applies to every query.
+    """
+    batch, _ = retrieve_many_with_embeddings(
+        queries, k=k, tenant_id=tenant_id, timings=timings, scope=scope
     )
-    results = db.similarity_search_with_score(query, k=k)
+    return batch
+
+
+def retrieve_many_with_embeddings(
+    queries: list[str],
+    k: int = 3,
+    tenant_id: str | None = None,
+    timings: Timings | None = None,
+    scope: list | None = None,
+):
+    """
+    retrieve_many() plus the query embeddings: (batch, embeddings),
+    with None embeddings when nothing was embedded.
+    """
+    if not queries:
+        return [], []
+
+    if CI_MODE:
+        return [([], STATUS_CI_MODE) for _ in queries], [None] * len(queries)
+
+    timings = timings or Timings()
+
+    if tenant_id is not None:
+        from app import worker_pool
+
+        remote = worker_pool.remote_retrieve_many(list(queries), k, tenant_id, scope) if worker_pool.routing_enabled() else None
+        if remote is not None:
+            batch, stages, query_embeddings = remote
+            for stage, seconds in stages.items():
+                timings.add(stage, seconds)
+            return batch, query_embeddings
+
+    if tenant_id is None:
+        persist_dir = DB_PATH
+    else:
+        persist_dir = _tenant_chroma_path(tenant_id)
+        if not os.path.isdir(persist_dir):
+            return [([], STATUS_NO_TENANT_STORE) for _ in queries], [None] * len(queries)
+
+    with timings.span("open"):
+        embeddings = get_embeddings()
+        snap, db = _open_index(tenant_id, persist_dir, scope)
+
+    try:
+        # embed_query() per item, not embed_documents(): the model may
+        # encode queries differently, and batch results must match /query
+        with timings.span("embed"):
+            query_embeddings = [embeddings.embed_query(query) for query in queries]
+
+        if snap is not None:
+            with timings.span("search"):
+                batch = _snapshot_results(snap, tenant_id, query_embeddings, k, scope)
+            return [
+                (results, STATUS_OK if results else STATUS_EMPTY_RESULTS) for results in batch
+            ], list(query_embeddings)
+
+        # Same query as similarity_search_by_vector_with_relevance_scores(),
+        # one call for every query vector
+        with timings.span("search"):
+            raw = db._collection.query(
+                query_embeddings=query_embeddings,
+                n_results=k,
+                where=_chroma_where(scope),
+                include=["documents", "metadatas", "distances"],
+            )
+    finally:
+        if snap is not None:
+            snapshot.release(snap)
+
+    from langchain_core.documents import Document
+
+    batch = []
+    for documents, metadatas, distances in zip(
+        raw["documents"], raw["metadatas"], raw["distances"]
+    ):
+        results = [
+            (Document(page_content=text, metadata=meta or {}), distance)
+            for text, meta, distance in zip(documents, metadatas, distances)
+        ]
+        batch.append((results, STATUS_OK if results else STATUS_EMPTY_RESULTS))
+    return batch, list(query_embeddings)
+
+
+def _open_index(tenant_id: str | None, persist_dir: str, scope):
+    # Compiled snapshot if the tenant has one (and it can apply the
+    # scope), else the Chroma store: (snapshot, None) or (None, store)
+    snap = snapshot.acquire(tenant_id) if tenant_id is not None else None
+    if snap is not None and scope and not snap.supports_scope:
+        snapshot.release(snap)
+        snap = None
+    return snap, (_open_store(persist_dir) if snap is None else None)
+
+
+def _chroma_where(scope):
+    # Metadata pre-filter, applied by Chroma before the nearest-neighbour
+    # search (None = whole collection)
+    if not scope:
+        return None
+
+    clauses = []
+    for source, first_page, last_page in scope:
+        terms = [{"source": {"$eq": source}}]
+        if first_page is not None:
+            terms.append({"page": {"$gte": first_page}})
+        if last_page is not None:
+            terms.append({"page": {"$lte": last_page}})
+        clauses.append(terms[0] if len(terms) == 1 else {"$and": terms})
+
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def document_source(tenant_id: str, document: str) -> str:
+    """
+    The "source" metadata value ingestion gives a tenant document.
+    document is a file name (or a citation source path).
+    """
+    return os.path.join(TENANTS_ROOT, tenant_id, "docs", os.path.basename(document))
+
+
+def _snapshot_results(snap, tenant_id: str, query_embeddings, k: int, scope=None):
+    # [(Document, distance), ...] per query, shaped like Chroma's results
+    from langchain_core.documents import Document
 
-    if return_status:
-        return (results, STATUS_OK if results else STATUS_EMPTY_RESULTS)
-    return results
+    batch = []
+    top_m = snapshot.routing_top_m(tenant_id, snap)
+    for hits in snap.search(query_embeddings, k, top_m=top_m, scope=scope or None):
+        results = []
+        for row, distance in hits:
+            text, metadata = snap.chunk(row)
+            results.append((Document(page_content=text, metadata=metadata), distance))
+        batch.append(results)
+    return batch
 
 
 def dedupe_results(results):
@@ -79,7 +425,7 @@ if __name__ == "__main__":
     import sys
 
     if len(sys.argv) < 2:
-        print('Usage: python app/retrieve.py "your query here" [tenant_id]')
+        print('Usage: python -m app.retrieve "your query here" [tenant_id]')
         sys.exit(1)
 
     query = sys.argv[1]
@@ -0,0 +1,726 @@
+import os
+import json
+import mmap
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# =====================================================
+# Read-optimized tenant index snapshots
+# =====================================================
+# After ingestion, a tenant's Chroma collection (vectors, chunk text,
+# metadata) is compiled into one immutable file:
+#
+#   data/tenants/<tenant_id>/snapshots/v<N>.snap
+#   data/tenants/<tenant_id>/snapshots/CURRENT      -> "v<N>.snap"
+#
+# Retrieval mmaps the newest version (no SQLite or HNSW load) and scans
+# it exactly with numpy, using the same squared-L2 distance as the Chroma
+# collection, so scores stay comparable with MAX_DISTANCE. Ingestion
+# never touches a published file: it writes v<N+1> and swaps CURRENT
+# with os.replace().
+#
+# Old versions are deleted once no reader in this process uses them.
+# Readers in other processes are safe too: an unlinked file stays mapped
+# until they drop it, and a reader that loses the race between reading
+# CURRENT and opening the file simply reads CURRENT again.
+#
+#   P1_SNAPSHOTS=false   keep querying Chroma directly
+#
+# Two-level routing (large tenants): rows are stored grouped by
+# document, and the file carries one centroid per document (or per
+# section of P1_ROUTING_SECTION_CHUNKS chunks). With routing on, a query
+# first ranks the centroids and then scans only the chunks of the top M
+# groups, so its cost follows M rather than the corpus size.
+#
+#   P1_ROUTING_TOP_M=8          groups searched per query (0 = exhaustive);
+#                               tenant setting "routing_top_m" overrides
+#   P1_ROUTING_MIN_CHUNKS=5000  smaller snapshots are always scanned fully
+#
+# routing_recall() measures what routing misses against the exhaustive
+# scan (bench/retrieval_bench.py reports it per corpus size).
+#
+# Scoped queries (documents / page ranges) use the same layout as a
+# metadata index: each document's rows are one contiguous range sorted
+# by page, so a scope resolves to row ranges with a binary search on the
+# per-row page array and only those rows are scanned.
+
+SNAPSHOTS_ENABLED = os.getenv("P1_SNAPSHOTS", "true") != "false"
+
+ROUTING_TOP_M = int(os.getenv("P1_ROUTING_TOP_M", "0"))
+ROUTING_MIN_CHUNKS = int(os.getenv("P1_ROUTING_MIN_CHUNKS", "5000"))
+ROUTING_SECTION_CHUNKS = int(os.getenv("P1_ROUTING_SECTION_CHUNKS", "0"))  # 0 = whole documents
+
+TENANTS_ROOT = os.path.join("data", "tenants")
+CURRENT = "CURRENT"
+
+# Rows read from Chroma per get() call while compiling
+COMPILE_BATCH_SIZE = 5000
+
+_MAGIC_V1 = b"P1SNAP\x00\x01"
+_MAGIC_V2 = b"P1SNAP\x00\x02"
+_MAGIC = b"P1SNAP\x00\x03"
+# magic, dim, reserved, count, then (offset, length) for: vectors,
+# norms, text offsets, text, metadata offsets, metadata
+_FORMAT_V1 = "<8sIIQ" + "QQ" * 6
+# v2 adds: group count, then (offset, length) for: group centroids,
+# centroid norms, group row offsets
+_FORMAT_V2 = _FORMAT_V1 + "Q" + "QQ" * 3
+# v3 adds: (offset, length) for per-row pages (int32, -1 = none)
+_FORMAT_V3 = _FORMAT_V2 + "QQ"
+
+_HEADER = struct.Struct(_FORMAT_V3)
+_HEADERS = {
+    _MAGIC_V1: (1, struct.Struct(_FORMAT_V1)),
+    _MAGIC_V2: (2, struct.Struct(_FORMAT_V2)),
+    _MAGIC: (3, _HEADER),
+}
+_FIELDS = len(_HEADER.unpack(bytes(_HEADER.size)))
+_ALIGN = 64
+
+
+def _snapshot_dir(tenant_id: str) -> str:
+    return os.path.join(TENANTS_ROOT, tenant_id, "snapshots")
+
+
+def _version_of(name: str) -> Optional[int]:
+    if not (name.startswith("v") and name.endswith(".snap")):
+        return None
+    try:
+        return int(name[1:-len(".snap")])
+    except ValueError:
+        return None
+
+
+def _read_current(tenant_id: str) -> Optional[str]:
+    try:
+        with open(os.path.join(_snapshot_dir(tenant_id), CURRENT), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return name or None
+
+
+class Snapshot:
+    """
+    One mmapped snapshot file. Arrays are views into the mapping, so
+    opening costs a header read regardless of size.
+    """
+
+    def __init__(self, path: str):
+        import numpy as np
+
+        self.path = path
+        self.version = _version_of(os.path.basename(path))
+        self.readers = 0
+        self.retired = False
+
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        known = _HEADERS.get(self._map[:8])
+        if known is None:
+            self._map.close()
+            raise ValueError(f"{path}: not a snapshot file")
+
+        # Sections missing from older formats read as (0, 0)
+        self.format, header = known
+        fields = header.unpack_from(self._map, 0)
+        fields += (0,) * (_FIELDS - len(fields))
+
+        self.dim, self.count = fields[1], fields[3]
+        sections = [fields[4 + 2 * i: 6 + 2 * i] for i in range(6)]
+        (vectors, norms, text_offsets, text, meta_offsets, meta) = sections
+        self.groups = fields[16]
+        centroids, centroid_norms, group_offsets = [fields[17 + 2 * i: 19 + 2 * i] for i in range(3)]
+
+        self.size_bytes = len(self._map)
+        self.vectors = np.frombuffer(
+            self._map, dtype=np.float32, count=self.count * self.dim, offset=vectors[0]
+        ).reshape(self.count, self.dim)
+        self.norms = np.frombuffer(self._map, dtype=np.float32, count=self.count, offset=norms[0])
+        self._text_offsets = np.frombuffer(
+            self._map, dtype=np.uint64, count=self.count + 1, offset=text_offsets[0]
+        )
+        self._meta_offsets = np.frombuffer(
+            self._map, dtype=np.uint64, count=self.count + 1, offset=meta_offsets[0]
+        )
+        self._text_start = text[0]
+        self._meta_start = meta[0]
+
+        self.centroids = np.frombuffer(
+            self._map, dtype=np.float32, count=self.groups * self.dim, offset=centroids[0]
+        ).reshape(self.groups, self.dim)
+        self.centroid_norms = np.frombuffer(
+            self._map, dtype=np.float32, count=self.groups, offset=centroid_norms[0]
+        )
+        self.group_offsets = np.frombuffer(
+            self._map, dtype=np.uint64, count=self.groups + 1 if self.groups else 0, offset=group_offsets[0]
+        )
+        self.pages = None
+        if self.format >= 3:
+            self.pages = np.frombuffer(self._map, dtype=np.int32, count=self.count, offset=fields[23])
+        self._sources: Optional[Dict[str, Tuple[int, int]]] = None
+
+    @property
+    def supports_scope(self) -> bool:
+        return self.pages is not None
+
+    def search(
+        self, query_vectors, k: int, top_m: int = 0, scope=None
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        k nearest rows per query by squared L2 distance (Chroma's
+        default "l2" space). Returns [(row, distance), ...] per query,
+        nearest first.
+
+        scope: [(source, first_page, last_page), ...] restricts the scan
+        to those rows (pages inclusive, None = open-ended; needs
+        supports_scope). Otherwise top_m > 0 routes each query to the
+        chunks of its top_m nearest document groups, and the scan is
+        exact without it.
+        """
+        import numpy as np
+
+        k = min(k, self.count)
+        if k <= 0:
+            return [[] for _ in query_vectors]
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.dim)
+
+        if scope is not None:
+            ranges = self.scope_ranges(scope)
+            return [self._scan(query, ranges, k) for query in queries]
+
+        if 0 < top_m < self.groups:
+            return [self._routed(query, k, top_m) for query in queries]
+
+        return [
+            _nearest(None, distances, k)
+            for distances in _squared_l2(queries, self.vectors, self.norms)
+        ]
+
+    def _routed(self, query, k: int, top_m: int) -> List[Tuple[int, float]]:
+        import numpy as np
+
+        group_distances = _squared_l2(query[None, :], self.centroids, self.centroid_norms)[0]
+        groups = np.sort(np.argpartition(group_distances, top_m - 1)[:top_m])
+        ranges = [(int(self.group_offsets[g]), int(self.group_offsets[g + 1])) for g in groups]
+        return self._scan(query, ranges, k)
+
+    def _scan(self, query, ranges: List[Tuple[int, int]], k: int) -> List[Tuple[int, float]]:
+        import numpy as np
+
+        if not ranges:
+            return []
+
+        rows, distances = [], []
+        for lo, hi in ranges:
+            # Contiguous slice: a view into the mapping, no copy
+            distances.append(_squared_l2(query[None, :], self.vectors[lo:hi], self.norms[lo:hi])[0])
+            rows.append(np.arange(lo, hi))
+
+        rows, distances = np.concatenate(rows), np.concatenate(distances)
+        return _nearest(rows, distances, min(k, len(rows)))
+
+    def _source_spans(self) -> Dict[str, Tuple[int, int]]:
+        # source -> its contiguous row range, from the first row of each
+        # group; built on first use (one metadata read per group)
+        if self._sources is None:
+            spans: Dict[str, Tuple[int, int]] = {}
+            for g in range(self.groups):
+                lo, hi = int(self.group_offsets[g]), int(self.group_offsets[g + 1])
+                source = self.chunk(lo)[1].get("source")
+                first = spans.get(source, (lo, hi))[0]
+                spans[source] = (first, hi)
+            self._sources = spans
+        return self._sources
+
+    def scope_ranges(self, scope) -> List[Tuple[int, int]]:
+        """
+        Row ranges matching [(source, first_page, last_page), ...],
+        sorted and non-overlapping. Like Chroma's $gte/$lte filter, any
+        page bound excludes chunks without a page (stored as -1, so they
+        sort first within their document).
+        """
+        import numpy as np
+
+        spans = self._source_spans()
+        ranges = []
+        for source, first_page, last_page in scope:
+            if source not in spans:
+                continue
+            lo, hi = spans[source]
+            pages = self.pages[lo:hi]
+            if first_page is None and last_page is None:
+                start, end = lo, hi
+            else:
+                first = max(first_page, 0) if first_page is not None else 0
+                start = lo + int(np.searchsorted(pages, first, "left"))
+                end = lo + int(np.searchsorted(pages, last_page, "right")) if last_page is not None else hi
+            if start < end:
+                ranges.append((start, end))
+
+        merged: List[Tuple[int, int]] = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def chunk(self, row: int) -> Tuple[str, Dict[str, Any]]:
+        start, end = int(self._text_offsets[row]), int(self._text_offsets[row + 1])
+        text = self._map[self._text_start + start: self._text_start + end].decode("utf-8")
+        start, end = int(self._meta_offsets[row]), int(self._meta_offsets[row + 1])
+        metadata = json.loads(self._map[self._meta_start + start: self._meta_start + end] or b"{}")
+        return text, metadata
+
+    def close(self) -> None:
+        # numpy views pin the mapping; drop them before unmapping
+        self.vectors = self.norms = self._text_offsets = self._meta_offsets = None
+        self.centroids = self.centroid_norms = self.group_offsets = self.pages = None
+        try:
+            self._map.close()
+        except BufferError:
+            pass  # a caller still holds a view; freed with it
+
+
+def _squared_l2(queries, vectors, norms):
+    # |q - v|^2 = |q|^2 - 2 q.v + |v|^2, one row per query
+    import numpy as np
+
+    distances = queries @ vectors.T
+    distances *= -2.0
+    distances += norms[None, :]
+    distances += (queries * queries).sum(axis=1)[:, None]
+    np.maximum(distances, 0.0, out=distances)
+    return distances
+
+
+def _nearest(rows, distances, k: int) -> List[Tuple[int, float]]:
+    # rows maps positions in distances to snapshot rows (None = identity)
+    import numpy as np
+
+    if k <= 0:
+        return []
+    candidates = np.argpartition(distances, k - 1)[:k]
+    order = candidates[np.argsort(distances[candidates], kind="stable")]
+    return [(int(i if rows is None else rows[i]), float(distances[i])) for i in order]
+
+
+def routing_top_m(tenant_id: str, snap: "Snapshot") -> int:
+    """
+    Groups to search for this tenant's queries (0 = exhaustive).
+    """
+    if snap.count < ROUTING_MIN_CHUNKS:
+        return 0
+    from app.tenant_config import get_tenant_setting
+
+    return int(get_tenant_setting(tenant_id, "routing_top_m", ROUTING_TOP_M) or 0)
+
+
+def routing_recall(snap: "Snapshot", query_vectors, k: int, top_m: int) -> Dict[str, Any]:
+    """
+    Recall@k of routed search against the exhaustive scan on the same
+    snapshot, with per-query latency for both.
+    """
+    import time
+
+    exact_ms, routed_ms, recalls = [], [], []
+    for query in query_vectors:
+        started = time.perf_counter()
+        exact = snap.search([query], k)[0]
+        exact_ms.append((time.perf_counter() - started) * 1000.0)
+
+        started = time.perf_counter()
+        routed = snap.search([query], k, top_m=top_m)[0]
+        routed_ms.append((time.perf_counter() - started) * 1000.0)
+
+        expected = {row for row, _ in exact}
+        if expected:
+            recalls.append(len(expected & {row for row, _ in routed}) / len(expected))
+
+    def mean(values):
+        return round(sum(values) / len(values), 4) if values else None
+
+    return {
+        "chunks": snap.count,
+        "groups": snap.groups,
+        "k": k,
+        "top_m": top_m,
+        "queries": len(exact_ms),
+        "recall": mean(recalls),
+        "exhaustive_ms": mean(exact_ms),
+        "routed_ms": mean(routed_ms),
+    }
+
+
+# =====================================================
+# Readers (per process, reference counted)
+# =====================================================
+_lock = threading.Lock()
+_open: Dict[str, Snapshot] = {}  # tenant_id -> newest opened version
+_retired: List[Snapshot] = []  # replaced or evicted, readers still active
+
+
+def _close_if_unused(snap: Snapshot) -> None:
+    # Caller holds _lock
+    if not snap.retired:
+        return
+    if snap.readers == 0:
+        if snap in _retired:
+            _retired.remove(snap)
+        snap.close()
+    elif snap not in _retired:
+        _retired.append(snap)
+
+
+def acquire(tenant_id: str) -> Optional[Snapshot]:
+    """
+    The tenant's current snapshot with a reader reference held, or
+    None if it has none. Pair with release().
+    """
+    if not SNAPSHOTS_ENABLED:
+        return None
+
+    from app import memory_budget
+
+    memory_budget.touch(tenant_id)
+
+    for _ in range(3):
+        name = _read_current(tenant_id)
+        if name is None:
+            return None
+        path = os.path.join(_snapshot_dir(tenant_id), name)
+
+        with _lock:
+            snap = _open.get(tenant_id)
+            if snap is not None and snap.path == path:
+                snap.readers += 1
+                return snap
+
+        try:
+            fresh = Snapshot(path)
+        except FileNotFoundError:
+            continue  # collected after we read CURRENT; read it again
+
+        with _lock:
+            snap = _open.get(tenant_id)
+            if snap is not None and snap.path == path:
+                fresh.retired = True  # another thread opened it first
+                _close_if_unused(fresh)
+            else:
+                if snap is not None:
+                    snap.retired = True
+                    _close_if_unused(snap)
+                snap = _open[tenant_id] = fresh
+            snap.readers += 1
+
+        if snap is fresh:
+            memory_budget.enforce(protect=tenant_id)
+        return snap
+    return None
+
+
+def release(snap: Snapshot) -> None:
+    with _lock:
+        snap.readers -= 1
+        _close_if_unused(snap)
+        last_reader = snap.retired and snap.readers == 0
+
+    if last_reader:
+        # Superseded while in use: its publisher skipped it in GC
+        tenant_id = os.path.basename(os.path.dirname(os.path.dirname(snap.path)))
+        if _read_current(tenant_id) != os.path.basename(snap.path):
+            try:
+                os.remove(snap.path)
+            except OSError:
+                pass
+
+
+@contextmanager
+def reader(tenant_id: str) -> Iterator[Optional[Snapshot]]:
+    snap = acquire(tenant_id)
+    try:
+        yield snap
+    finally:
+        if snap is not None:
+            release(snap)
+
+
+def evict(tenant_id: str) -> bool:
+    """
+    Unmaps a tenant's snapshot in this process (once its readers are
+    done). The next acquire() maps it again.
+    """
+    with _lock:
+        snap = _open.pop(tenant_id, None)
+        if snap is None:
+            return False
+        snap.retired = True
+        _close_if_unused(snap)
+    return True
+
+
+def resident() -> Dict[str, int]:
+    """
+    Mapped snapshot size per tenant in this process.
+    """
+    with _lock:
+        return {tenant_id: snap.size_bytes for tenant_id, snap in _open.items()}
+
+
+# =====================================================
+# Compile + publish
+# =====================================================
+def _pad(f) -> int:
+    offset = f.tell()
+    padding = -offset % _ALIGN
+    if padding:
+        f.write(b"\x00" * padding)
+    return offset + padding
+
+
+def _page_of(meta: Optional[Dict[str, Any]]) -> int:
+    page = (meta or {}).get("page")
+    return page if isinstance(page, int) and not isinstance(page, bool) else -1
+
+
+def _groups(metadatas: List[Dict[str, Any]]) -> Tuple[List[int], List[int]]:
+    """
+    Row order grouped by document (source, then page), and the row
+    offsets of each routing group: a document, or a section of at most
+    ROUTING_SECTION_CHUNKS of its chunks.
+    """
+    def sort_key(row):
+        meta = metadatas[row] or {}
+        return (str(meta.get("source") or ""), _page_of(meta), row)
+
+    order = sorted(range(len(metadatas)), key=sort_key)
+
+    offsets = [0] if order else []
+    previous = None
+    for i, row in enumerate(order):
+        source = (metadatas[row] or {}).get("source")
+        section_full = ROUTING_SECTION_CHUNKS > 0 and i - offsets[-1] >= ROUTING_SECTION_CHUNKS
+        if i and (source != previous or section_full):
+            offsets.append(i)
+        previous = source
+    if order:
+        offsets.append(len(order))
+    return order, offsets
+
+
+def _write_snapshot(path: str, vectors, texts: List[str], metadatas: List[Dict[str, Any]]) -> int:
+    """
+    Writes the snapshot file; returns its number of routing groups.
+    """
+    import numpy as np
+
+    order, group_offsets = _groups(metadatas)
+    texts = [texts[i] for i in order]
+    metadatas = [metadatas[i] for i in order]
+    vectors = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32)[order], dtype=np.float32)
+
+    count = len(texts)
+    dim = vectors.shape[1] if count else 0
+    norms = (vectors * vectors).sum(axis=1).astype(np.float32)
+
+    groups = max(len(group_offsets) - 1, 0)
+    centroids = np.zeros((groups, dim), dtype=np.float32)
+    for g in range(groups):
+        centroids[g] = vectors[group_offsets[g]:group_offsets[g + 1]].mean(axis=0)
+    centroid_norms = (centroids * centroids).sum(axis=1).astype(np.float32)
+    pages = np.asarray([_page_of(m) for m in metadatas], dtype=np.int32)
+
+    encoded_texts = [t.encode("utf-8") for t in texts]
+    encoded_meta = [json.dumps(m or {}, separators=(",", ":")).encode("utf-8") for m in metadatas]
+    text_offsets = np.zeros(count + 1, dtype=np.uint64)
+    np.cumsum([len(b) for b in encoded_texts], out=text_offsets[1:])
+    meta_offsets = np.zeros(count + 1, dtype=np.uint64)
+    np.cumsum([len(b) for b in encoded_meta], out=meta_offsets[1:])
+
+    sections = []
+    routing = []
+    with open(path, "wb") as f:
+        f.write(b"\x00" * _HEADER.size)
+        for target, blob in (
+            (sections, vectors.tobytes()),
+            (sections, norms.tobytes()),
+            (sections, text_offsets.tobytes()),
+            (sections, b"".join(encoded_texts)),
+            (sections, meta_offsets.tobytes()),
+            (sections, b"".join(encoded_meta)),
+            (routing, centroids.tobytes()),
+            (routing, centroid_norms.tobytes()),
+            (routing, np.asarray(group_offsets, dtype=np.uint64).tobytes()),
+            (routing, pages.tobytes()),
+        ):
+            offset = _pad(f)
+            f.write(blob)
+            target.extend((offset, len(blob)))
+
+        f.seek(0)
+        f.write(_HEADER.pack(_MAGIC, dim, 0, count, *sections, groups, *routing))
+        f.flush()
+        os.fsync(f.fileno())
+
+    return groups
+
+
+def _read_collection(collection) -> Tuple[Any, List[str], List[Dict[str, Any]]]:
+    import numpy as np
+
+    total = collection.count()
+    vectors, texts, metadatas = [], [], []
+    for offset in range(0, total, COMPILE_BATCH_SIZE):
+        batch = collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=COMPILE_BATCH_SIZE,
+            offset=offset,
+        )
+        vectors.append(np.asarray(batch["embeddings"], dtype=np.float32))
+        texts.extend(batch["documents"])
+        metadatas.extend(batch["metadatas"])
+
+    if not vectors:
+        return np.zeros((0, 0), dtype=np.float32), [], []
+    return np.concatenate(vectors), texts, metadatas
+
+
+def compile_snapshot(tenant_id: str, collection) -> Optional[Dict[str, Any]]:
+    """
+    Writes the next snapshot version from a Chroma collection and makes
+    it current, then collects old versions. Returns its summary, or
+    None when snapshots are disabled.
+    """
+    if not SNAPSHOTS_ENABLED:
+        return None
+
+    directory = _snapshot_dir(tenant_id)
+    os.makedirs(directory, exist_ok=True)
+
+    vectors, texts, metadatas = _read_collection(collection)
+
+    with _publish_lock(directory):
+        versions = [v for v in map(_version_of, os.listdir(directory)) if v is not None]
+        name = f"v{max(versions, default=0) + 1}.snap"
+        path = os.path.join(directory, name)
+
+        tmp = os.path.join(directory, f".{name}.tmp")
+        try:
+            groups = _write_snapshot(tmp, vectors, texts, metadatas)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        # The pointer swap is the publish step
+        pointer = os.path.join(directory, f".{CURRENT}.tmp")
+        with open(pointer, "w", encoding="utf-8") as f:
+            f.write(name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer, os.path.join(directory, CURRENT))
+
+        collected = collect_garbage(tenant_id)
+
+    return {
+        "tenant_id": tenant_id,
+        "version": _version_of(name),
+        "path": path,
+        "vectors": len(texts),
+        "groups": groups,
+        "bytes": os.path.getsize(path),
+        "collected": collected,
+    }
+
+
+@contextmanager
+def _publish_lock(directory: str) -> Iterator[None]:
+    # Serializes publishers of one tenant across processes (ingestion
+    # runs in the API and in the CLI)
+    try:
+        import fcntl
+    except ImportError:  # not POSIX: in-process only
+        with _lock:
+            yield
+        return
+
+    with open(os.path.join(directory, ".lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def collect_garbage(tenant_id: str) -> List[str]:
+    """
+    Deletes snapshot versions other than CURRENT that no reader in this
+    process holds. Returns the deleted file names.
+    """
+    directory = _snapshot_dir(tenant_id)
+    current = _read_current(tenant_id)
+    if current is None or not os.path.isdir(directory):
+        return []
+
+    with _lock:
+        in_use = {
+            os.path.basename(snap.path)
+            for snap in list(_open.values()) + _retired
+            if snap.readers > 0 and os.path.dirname(snap.path) == directory
+        }
+
+    deleted = []
+    for name in os.listdir(directory):
+        if _version_of(name) is None or name == current or name in in_use:
+            continue
+        try:
+            os.remove(os.path.join(directory, name))
+            deleted.append(name)
+        except OSError:
+            pass  # retried on the next publish
+    return sorted(deleted, key=_version_of)
+
+
+def current(tenant_id: str) -> Optional[str]:
+    """
+    File name of the tenant's current snapshot (None if it has none).
+    """
+    return _read_current(tenant_id)
+
+
+def status(tenant_id: str) -> Dict[str, Any]:
+    directory = _snapshot_dir(tenant_id)
+    versions = []
+    if os.path.isdir(directory):
+        versions = sorted(n for n in os.listdir(directory) if _version_of(n) is not None)
+    return {
+        "tenant_id": tenant_id,
+        "current": _read_current(tenant_id),
+        "versions": sorted(versions, key=_version_of),
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3 or sys.argv[1] not in ("compile", "gc", "status"):
+        print("Usage: python -m app.snapshot {compile|gc|status} <tenant_id>")
+        sys.exit(1)
+
+    command, tenant = sys.argv[1], sys.argv[2]
+    if command == "compile":
+        from app.retrieve import get_tenant_store
+
+        store = get_tenant_store(tenant)
+        if store is None:
+            print(f"No index for tenant '{tenant}'.")
+            sys.exit(1)
+        print(json.dumps(compile_snapshot(tenant, store._collection), indent=2))
+    elif command == "gc":
+        print(json.dumps(collect_garbage(tenant)))
+    else:
+        print(json.dumps(status(tenant), indent=2))
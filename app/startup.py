@@ -0,0 +1,250 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import subprocess
+from typing import Any, Dict, List, Optional
+
+from app.persist import DB_FILENAME, DB_ROOT
+
+# =====================================================
+# Warmup and readiness
+# =====================================================
+# Importing the API is cheap (heavy libraries load on first use), so
+# /health answers as soon as the process is up. Warmup then loads the
+# embedding model and opens the hottest tenant stores in a background
+# thread; /ready reports 200 once it has finished.
+#
+# Only the embedding model gates readiness: a tenant that fails to open
+# is logged, listed under "tenant_errors" and left to lazy loading. A
+# failed model load is retried with backoff, and a lazy load that
+# succeeds in the meantime makes the process ready too.
+#
+#   P1_WARMUP=false          skip warmup (ready immediately, lazy loads)
+#   P1_WARMUP_TENANTS=a,b    tenants to preload (default: most recently
+#                            active, up to P1_WARMUP_MAX_TENANTS)
+
+logger = logging.getLogger("p1.startup")
+
+WARMUP_ENABLED = os.getenv("P1_WARMUP", "true") != "false"
+WARMUP_TENANTS = [t for t in os.getenv("P1_WARMUP_TENANTS", "").split(",") if t]
+WARMUP_MAX_TENANTS = int(os.getenv("P1_WARMUP_MAX_TENANTS", "4"))
+MODEL_RETRY_SECONDS = float(os.getenv("P1_WARMUP_RETRY_SECONDS", "5"))
+MODEL_RETRY_MAX_SECONDS = 300.0
+
+_state: Dict[str, Any] = {
+    "status": "starting",  # starting | warming_up | ready | failed
+    "started_at": None,
+    "duration_ms": None,
+    "model_load_ms": None,
+    "model_attempts": 0,
+    "tenants": [],
+    "tenant_errors": [],
+    "error": None,
+}
+_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+
+
+def _hot_tenants() -> List[str]:
+    if WARMUP_TENANTS:
+        return WARMUP_TENANTS[:WARMUP_MAX_TENANTS]
+    if not os.path.isdir(DB_ROOT):
+        return []
+
+    # Most recent query activity first
+    activity = []
+    for tenant_id in os.listdir(DB_ROOT):
+        if not os.path.isdir(os.path.join(DB_ROOT, tenant_id, "chroma")):
+            continue
+        db_path = os.path.join(DB_ROOT, tenant_id, DB_FILENAME)
+        mtimes = [
+            os.path.getmtime(db_path + suffix)
+            for suffix in ("", "-wal")
+            if os.path.exists(db_path + suffix)
+        ]
+        activity.append((max(mtimes) if mtimes else 0.0, tenant_id))
+
+    return [tenant_id for _, tenant_id in sorted(activity, reverse=True)[:WARMUP_MAX_TENANTS]]
+
+
+def _load_model() -> None:
+    from app import retrieve
+
+    delay = MODEL_RETRY_SECONDS
+    while True:
+        _state["model_attempts"] += 1
+        t0 = time.perf_counter()
+        try:
+            # Import + model load + one forward pass
+            retrieve.get_embeddings().embed_query("warmup")
+        except Exception as e:
+            # Unready until a retry (or a request's lazy load) succeeds
+            logger.exception("Warmup model load failed", extra={"retry_in_s": delay})
+            _state["status"] = "failed"
+            _state["error"] = f"{type(e).__name__}: {e}"
+            time.sleep(delay)
+            delay = min(delay * 2, MODEL_RETRY_MAX_SECONDS)
+            continue
+
+        _state["model_load_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+        _state["error"] = None
+        if _state["status"] == "failed":
+            _state["status"] = "warming_up"
+        return
+
+
+def _warm_tenant(tenant_id: str) -> None:
+    from app import retrieve, snapshot
+
+    t0 = time.perf_counter()
+    try:
+        # Maps the tenant's snapshot, or opens its Chroma store
+        with snapshot.reader(tenant_id) as snap:
+            if snap is None and retrieve.get_tenant_store(tenant_id) is None:
+                return
+    except Exception as e:
+        # Its requests retry the lazy load (and report their own errors)
+        logger.exception("Warmup failed for tenant", extra={"tenant_id": tenant_id})
+        _state["tenant_errors"].append({"tenant_id": tenant_id, "error": f"{type(e).__name__}: {e}"})
+        return
+
+    _state["tenants"].append(
+        {"tenant_id": tenant_id, "open_ms": round((time.perf_counter() - t0) * 1000.0, 1)}
+    )
+
+
+def _warmup() -> None:
+    from app import retrieve
+
+    started = time.perf_counter()
+    try:
+        if not retrieve.CI_MODE:
+            _load_model()
+
+            try:
+                tenants = _hot_tenants()
+            except OSError:
+                logger.exception("Warmup could not list tenants")
+                tenants = []
+            for tenant_id in tenants:
+                _warm_tenant(tenant_id)
+        _state["status"] = "ready"
+    finally:
+        _state["duration_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+        logger.info("Warmup finished", extra={"warmup": dict(_state)})
+
+
+def start_warmup() -> None:
+    global _thread
+
+    with _lock:
+        if _thread is not None:
+            return
+        _state["started_at"] = time.time()
+        if not WARMUP_ENABLED:
+            _state["status"] = "ready"
+            return
+        _state["status"] = "warming_up"
+        _thread = threading.Thread(target=_warmup, name="p1-warmup", daemon=True)
+        _thread.start()
+
+
+def is_ready() -> bool:
+    if _state["status"] == "failed":
+        from app.retrieve import cached_embeddings
+
+        # A request's lazy load succeeded while warmup was backing off
+        if cached_embeddings() is not None:
+            _state["status"] = "ready"
+            _state["error"] = None
+    return _state["status"] == "ready"
+
+
+def readiness(detail: bool = False) -> Dict[str, Any]:
+    """
+    Warmup state. Without detail (unauthenticated /ready) tenants are
+    only counted: their ids and errors are for privileged callers.
+    """
+    is_ready()
+    if detail:
+        return dict(
+            _state,
+            tenants=list(_state["tenants"]),
+            tenant_errors=list(_state["tenant_errors"]),
+        )
+    return {
+        "status": _state["status"],
+        "started_at": _state["started_at"],
+        "duration_ms": _state["duration_ms"],
+        "model_load_ms": _state["model_load_ms"],
+        "model_attempts": _state["model_attempts"],
+        "tenants_warmed": len(_state["tenants"]),
+        "tenants_failed": len(_state["tenant_errors"]),
+    }
+
+
+# =====================================================
+# Import-time report (python -m app.startup)
+# =====================================================
+def import_report(module: str = "app.api", top: int = 25) -> Dict[str, Any]:
+    """
+    Imports `module` in a fresh interpreter with -X importtime and
+    returns the wall time plus the slowest imports (cumulative).
+    """
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, P1_WARMUP="false"),
+    )
+    wall_ms = (time.perf_counter() - started) * 1000.0
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        self_us, cumulative_us, name = fields
+        imports.append(
+            {
+                "module": name.strip(),
+                "self_ms": round(int(self_us) / 1000.0, 2),
+                "cumulative_ms": round(int(cumulative_us) / 1000.0, 2),
+            }
+        )
+
+    total = next((i["cumulative_ms"] for i in imports if i["module"] == module), None)
+    heavy = ("torch", "langchain", "chromadb", "sentence_transformers", "transformers")
+
+    return {
+        "module": module,
+        "ok": proc.returncode == 0,
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+        "interpreter_wall_ms": round(wall_ms, 1),
+        "import_ms": total,
+        "heavy_modules_imported": sorted(
+            {i["module"].split(".")[0] for i in imports if i["module"].split(".")[0].startswith(heavy)}
+        ),
+        "slowest": sorted(imports, key=lambda i: i["cumulative_ms"], reverse=True)[:top],
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m app.startup",
+        description="Report import time of the API (startup regressions)",
+    )
+    parser.add_argument("--module", default="app.api")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    print(json.dumps(import_report(args.module, args.top), indent=2))
@@ -1,8 +1,12 @@
 import os
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import uuid
+from typing import Optional
+
+from app import answer_cache, metrics, snapshot
+from app.retrieve import EMBEDDING_MODEL, get_embeddings, invalidate_store
+
+# langchain / chromadb / pypdf are imported on first use so importing
+# this module (and the ingestion router) stays cheap
 
 # =====================================================
 # Tenant-aware ingestion configuration
@@ -11,6 +15,12 @@ from langchain_community.embeddings import HuggingFaceEmbeddings
 DATA_ROOT = "data"
 TENANTS_ROOT = os.path.join(DATA_ROOT, "tenants")
 
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 150
+
+# Chunks embedded and written per Chroma call
+WRITE_BATCH_SIZE = 1000
+
 
 def _tenant_docs_path(tenant_id: str) -> str:
     return os.path.join(TENANTS_ROOT, tenant_id, "docs")
@@ -24,71 +34,85 @@ def _tenant_chroma_path(tenant_id: str) -> str:
 # Load + chunk PDFs for a specific tenant
 # =====================================================
 
-def load_and_chunk(tenant_id: str):
+def load_and_chunk(tenant_id: str, timings: Optional[metrics.Timings] = None):
     """
     Loads and chunks all PDFs for a given tenant.
     Source PDFs must already exist under:
       data/tenants/<tenant_id>/docs/
+    Stage times (parse, chunk) are added to timings when given.
     """
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
     docs_path = _tenant_docs_path(tenant_id)
 
     if not os.path.isdir(docs_path):
         raise RuntimeError(f"No docs directory found for tenant '{tenant_id}'")
 
+    timings = timings or metrics.Timings()
     documents = []
 
-    for file in os.listdir(docs_path):
-        if not file.lower().endswith(".pdf"):
-            continue
+    with timings.span("parse"):
+        for file in os.listdir(docs_path):
+            if not file.lower().endswith(".pdf"):
+                continue
 
-        file_path = os.path.join(docs_path, file)
-        loader = PyPDFLoader(file_path)
-        pages = loader.load()
+            file_path = os.path.join(docs_path, file)
+            loader = PyPDFLoader(file_path)
+            pages = loader.load()
 
-        for p in pages:
-            # Normalize metadata ONCE at ingestion time
-            p.metadata["source"] = file_path
-            p.metadata["page"] = p.metadata.get("page", None)
+            for p in pages:
+                # Normalize metadata ONCE at ingestion time
+                p.metadata["source"] = file_path
+                p.metadata["page"] = p.metadata.get("page", None)
 
-        documents.extend(pages)
+            documents.extend(pages)
 
     if not documents:
         return []
 
     splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,
-        chunk_overlap=150
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP
     )
 
-    return splitter.split_documents(documents)
+    with timings.span("chunk"):
+        chunks = splitter.split_documents(documents)
+
+    return chunks
 
 
 # =====================================================
 # Store vectors (tenant-scoped, idempotent)
 # =====================================================
 
-def store_vectors(tenant_id: str, chunks):
+def store_vectors(tenant_id: str, chunks, timings: Optional[metrics.Timings] = None) -> int:
     """
     Stores document chunks into the tenant-specific Chroma store.
     - Never writes globally
     - Never creates shared vector spaces
     - Safe to re-run (idempotent per source)
+    Returns the number of chunks indexed. Stage times (open, embed,
+    write, snapshot) are added to timings when given.
     """
     if not chunks:
         print("No chunks to index.")
-        return
+        return 0
 
     chroma_path = _tenant_chroma_path(tenant_id)
     os.makedirs(chroma_path, exist_ok=True)
 
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
-    )
+    timings = timings or metrics.Timings()
 
-    db = Chroma(
-        persist_directory=chroma_path,
-        embedding_function=embeddings
-    )
+    with timings.span("open"):
+        from langchain_community.vectorstores import Chroma
+
+        embeddings = get_embeddings()
+
+        db = Chroma(
+            persist_directory=chroma_path,
+            embedding_function=embeddings
+        )
 
     # Detect already-indexed sources (safe even for empty DB)
     existing = db.get(include=["metadatas"])
@@ -108,11 +132,42 @@ def store_vectors(tenant_id: str, chunks):
 
     if not new_chunks:
         print("No new documents to index.")
-        return
+        # Indexed before snapshots existed: compile the first one
+        if snapshot.SNAPSHOTS_ENABLED and snapshot.status(tenant_id)["current"] is None:
+            snapshot.compile_snapshot(tenant_id, db._collection)
+            invalidate_store(tenant_id)
+        return 0
+
+    # Embedded here rather than inside Chroma so each stage is timed alone
+    for start in range(0, len(new_chunks), WRITE_BATCH_SIZE):
+        batch = new_chunks[start:start + WRITE_BATCH_SIZE]
+        texts = [c.page_content for c in batch]
+
+        with timings.span("embed"):
+            vectors = embeddings.embed_documents(texts)
+
+        with timings.span("write"):
+            db._collection.upsert(
+                ids=[str(uuid.uuid4()) for _ in batch],
+                embeddings=vectors,
+                metadatas=[c.metadata for c in batch],
+                documents=texts,
+            )
+
+    with timings.span("write"):
+        db.persist()
+
+    # Immutable read copy for retrieval (app.snapshot)
+    with timings.span("snapshot"):
+        snapshot.compile_snapshot(tenant_id, db._collection)
+
+    # Retrieval reopens the store with the new vectors; answers built
+    # from the old index are not reused
+    invalidate_store(tenant_id)
+    answer_cache.clear(tenant_id)
 
-    db.add_documents(new_chunks)
-    db.persist()
     print(f"Indexed {len(new_chunks)} new chunks for tenant '{tenant_id}'.")
+    return len(new_chunks)
 
 
 # =====================================================
@@ -123,7 +178,7 @@ if __name__ == "__main__":
     import sys
 
     if len(sys.argv) != 2:
-        print("Usage: python app/store_vectors.py <tenant_id>")
+        print("Usage: python -m app.store_vectors <tenant_id>")
         sys.exit(1)
 
     tenant_id = sys.argv[1]
@@ -0,0 +1,69 @@
+import os
+import json
+import logging
+import threading
+from typing import Any, Dict
+
+# =====================================================
+# Tenant configuration (local file, optional)
+# =====================================================
+# Format:
+#   {
+#     "defaults": { "<setting>": <value>, ... },
+#     "tenants":  { "<tenant_id>": { "<setting>": <value>, ... } }
+#   }
+#
+# Missing file = every setting falls back to the caller's default.
+# The file is re-read when its mtime changes.
+
+logger = logging.getLogger("p1.config")
+
+TENANT_CONFIG_PATH = os.getenv(
+    "P1_TENANT_CONFIG", os.path.join("data", "tenant_config.json")
+)
+
+_lock = threading.Lock()
+_cache: Dict[str, Any] = {"mtime": None, "config": {}}
+
+
+def _load() -> Dict[str, Any]:
+    try:
+        mtime = os.path.getmtime(TENANT_CONFIG_PATH)
+    except OSError:
+        return {}
+
+    with _lock:
+        if _cache["mtime"] == mtime:
+            return _cache["config"]
+
+        try:
+            with open(TENANT_CONFIG_PATH, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            if not isinstance(config, dict):
+                raise ValueError("tenant config must be a JSON object")
+        except Exception:
+            logger.exception("Failed to load tenant config")
+            config = _cache["config"]
+
+        _cache["mtime"] = mtime
+        _cache["config"] = config
+        return config
+
+
+def get_tenant_setting(tenant_id: str, key: str, default: Any = None) -> Any:
+    """
+    Resolves a setting for a tenant:
+      tenants.<tenant_id>.<key>  ->  defaults.<key>  ->  default
+    """
+    config = _load()
+
+    tenant_settings = (config.get("tenants") or {}).get(tenant_id) or {}
+    if key in tenant_settings:
+        return tenant_settings[key]
+
+    defaults = config.get("defaults") or {}
+    if key in defaults:
+        return defaults[key]
+
+    return default
+
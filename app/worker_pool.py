@@ -0,0 +1,451 @@
+import os
+import sys
+import json
+import bisect
+import hashlib
+import logging
+import secrets
+import signal
+import threading
+import multiprocessing
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, List, Optional, Tuple
+
+# =====================================================
+# Tenant-affinity retrieval worker pool
+# =====================================================
+# A supervisor (python -m app.worker_pool serve --workers N) runs N
+# retrieval worker processes. Each tenant is owned by exactly one worker,
+# picked by consistent hashing on tenant_id, so each tenant's Chroma
+# index and the embedding model are loaded once instead of once per
+# HTTP worker.
+#
+# HTTP front-ends route retrieve() calls to the owning worker over local
+# IPC (multiprocessing.connection, pickled messages, shared authkey)
+# when P1_WORKER_POOL_REGISTRY points at the supervisor's registry file.
+# The registry lists the live workers and is rewritten whenever workers
+# are added or removed (python -m app.worker_pool scale N); front-ends
+# reload it on change and workers drop tenants they no longer own.
+# If the owner is unreachable, does not answer within
+# P1_WORKER_POOL_TIMEOUT_MS or reports an error, the front-end
+# retrieves locally.
+
+logger = logging.getLogger("p1.worker_pool")
+
+REGISTRY_PATH = os.getenv("P1_WORKER_POOL_REGISTRY")
+DEFAULT_REGISTRY_PATH = os.path.join("data", "worker_pool.json")
+HOST = "127.0.0.1"
+RING_REPLICAS = 64  # virtual nodes per worker
+CALL_TIMEOUT_SECONDS = float(os.getenv("P1_WORKER_POOL_TIMEOUT_MS", "10000")) / 1000.0
+
+
+# =====================================================
+# Consistent hashing
+# =====================================================
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Adding or removing a worker only moves the tenants on its arcs.
+    """
+
+    def __init__(self, nodes: List[str], replicas: int = RING_REPLICAS):
+        self.nodes = sorted(nodes)
+        points = sorted(
+            (_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(replicas)
+        )
+        self._keys = [p for p, _ in points]
+        self._owners = [n for _, n in points]
+
+    def owner(self, tenant_id: str) -> Optional[str]:
+        if not self._keys:
+            return None
+        i = bisect.bisect(self._keys, _hash(tenant_id)) % len(self._keys)
+        return self._owners[i]
+
+
+def _address(addr: str) -> Tuple[str, int]:
+    host, port = addr.rsplit(":", 1)
+    return host, int(port)
+
+
+def _write_registry(path: str, registry: Dict[str, Any]) -> None:
+    # Atomic replace; the authkey makes it a secret
+    tmp = f"{path}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp, path)
+
+
+# =====================================================
+# Worker process
+# =====================================================
+_worker_name: Optional[str] = None  # set inside pool workers
+
+
+def in_worker() -> bool:
+    return _worker_name is not None
+
+
+def _evict_unowned(ring: HashRing) -> List[str]:
+    from app import retrieve, snapshot
+
+    resident = set(retrieve.cached_tenants()) | set(snapshot.resident())
+    dropped = sorted(t for t in resident if ring.owner(t) != _worker_name)
+    for tenant_id in dropped:
+        retrieve.invalidate_store(tenant_id)
+        snapshot.evict(tenant_id)
+    return dropped
+
+
+def _handle(message: Dict[str, Any]) -> Dict[str, Any]:
+    from app import retrieve
+    from app.metrics import Timings
+
+    op = message.get("op")
+
+    if op == "retrieve":
+        timings = Timings()
+        results, status, embedding = retrieve.retrieve_with_embedding(
+            message["query"], k=message["k"], tenant_id=message["tenant_id"], timings=timings,
+            scope=message.get("scope"),
+        )
+        return {
+            "ok": True, "results": results, "status": status,
+            "timings": timings.stages, "embedding": embedding,
+        }
+
+    if op == "retrieve_many":
+        timings = Timings()
+        batch, embeddings = retrieve.retrieve_many_with_embeddings(
+            message["queries"], k=message["k"], tenant_id=message["tenant_id"], timings=timings,
+            scope=message.get("scope"),
+        )
+        return {"ok": True, "batch": batch, "timings": timings.stages, "embeddings": embeddings}
+
+    if op == "invalidate":
+        retrieve.invalidate_store(message["tenant_id"])
+        return {"ok": True}
+
+    if op == "ring":
+        return {"ok": True, "dropped": _evict_unowned(HashRing(message["workers"]))}
+
+    if op == "ping":
+        return {"ok": True, "worker": _worker_name, "pid": os.getpid(), "tenants": retrieve.cached_tenants()}
+
+    return {"ok": False, "error": f"unknown op {op!r}"}
+
+
+def _serve_connection(conn) -> None:
+    with conn:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                reply = _handle(message)
+            except Exception as e:  # reported to the caller, worker keeps serving
+                logger.exception("Worker request failed")
+                reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            conn.send(reply)
+
+
+def _worker_main(name: str, port: int, authkey: bytes, ready) -> None:
+    global _worker_name
+
+    _worker_name = name
+    listener = Listener((HOST, port), authkey=authkey)
+    ready.set()
+
+    from app import retrieve
+
+    if not retrieve.CI_MODE:
+        retrieve.get_embeddings()  # one model per worker, loaded up front
+
+    while True:
+        try:
+            conn = listener.accept()
+        except Exception:
+            # Failed handshake (wrong authkey) or transient accept error
+            logger.warning("Rejected worker connection", exc_info=True)
+            continue
+        threading.Thread(target=_serve_connection, args=(conn,), daemon=True).start()
+
+
+# =====================================================
+# Supervisor
+# =====================================================
+class Supervisor:
+    def __init__(self, workers: int, base_port: int, registry_path: str):
+        self.base_port = base_port
+        self.registry_path = registry_path
+        self.authkey = secrets.token_bytes(32)
+        self.ctx = multiprocessing.get_context("spawn")  # clean interpreters
+        self.procs: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+        self.version = 0
+        self.desired = workers
+        self.stopping = threading.Event()
+
+    def _port(self, name: str) -> int:
+        return self.base_port + 1 + int(name.rsplit("-", 1)[1])
+
+    def _start(self, name: str) -> None:
+        ready = self.ctx.Event()
+        proc = self.ctx.Process(
+            target=_worker_main,
+            args=(name, self._port(name), self.authkey, ready),
+            name=f"p1-{name}",
+            daemon=True,
+        )
+        proc.start()
+        ready.wait(30)
+        self.procs[name] = proc
+
+    def _publish(self) -> None:
+        self.version += 1
+        workers = {name: f"{HOST}:{self._port(name)}" for name in sorted(self.procs)}
+        _write_registry(
+            self.registry_path,
+            {
+                "version": self.version,
+                "control": f"{HOST}:{self.base_port}",
+                "workers": workers,
+                "authkey": self.authkey.hex(),
+            },
+        )
+        # Rebalance: every worker drops tenants it no longer owns
+        for name, addr in workers.items():
+            try:
+                with Client(_address(addr), authkey=self.authkey) as conn:
+                    conn.send({"op": "ring", "workers": list(workers)})
+                    conn.recv()
+            except OSError:
+                logger.warning("Could not send ring update", extra={"worker": name})
+        logger.info("Worker pool updated", extra={"version": self.version, "workers": list(workers)})
+
+    def scale(self, workers: int) -> Dict[str, Any]:
+        with self.lock:
+            self.desired = max(workers, 1)
+            names = [f"worker-{i}" for i in range(self.desired)]
+            for name in names:
+                if name not in self.procs:
+                    self._start(name)
+            for name in [n for n in self.procs if n not in names]:
+                proc = self.procs.pop(name)
+                proc.terminate()
+                proc.join(10)
+            self._publish()
+            return {"ok": True, "version": self.version, "workers": sorted(self.procs)}
+
+    def _control_loop(self) -> None:
+        listener = Listener((HOST, self.base_port), authkey=self.authkey)
+        while not self.stopping.is_set():
+            try:
+                with listener.accept() as conn:
+                    message = conn.recv()
+                    if message.get("op") == "scale":
+                        conn.send(self.scale(int(message["workers"])))
+                    elif message.get("op") == "status":
+                        conn.send({"ok": True, "version": self.version, "workers": sorted(self.procs)})
+                    else:
+                        conn.send({"ok": False, "error": "unknown op"})
+            except Exception:
+                logger.warning("Control request failed", exc_info=True)
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, lambda *_: self.stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: self.stopping.set())
+
+        self.scale(self.desired)
+        threading.Thread(target=self._control_loop, name="p1-pool-control", daemon=True).start()
+        print(f"Worker pool ready: {sorted(self.procs)} (registry {self.registry_path})", flush=True)
+
+        try:
+            while not self.stopping.wait(1.0):
+                # Restart crashed workers in place (same ring position)
+                with self.lock:
+                    for name, proc in list(self.procs.items()):
+                        if not proc.is_alive():
+                            logger.warning("Restarting worker", extra={"worker": name})
+                            self._start(name)
+        finally:
+            for proc in self.procs.values():
+                proc.terminate()
+            for proc in self.procs.values():
+                proc.join(10)
+            try:
+                os.remove(self.registry_path)
+            except OSError:
+                pass
+
+
+# =====================================================
+# Front-end routing
+# =====================================================
+_registry_lock = threading.Lock()
+_registry: Dict[str, Any] = {"mtime": None, "data": None, "ring": None}
+_local = threading.local()
+
+
+def routing_enabled() -> bool:
+    return bool(REGISTRY_PATH) and not in_worker()
+
+
+def _load_registry():
+    try:
+        mtime = os.path.getmtime(REGISTRY_PATH)
+    except OSError:
+        return None, None
+
+    with _registry_lock:
+        if _registry["mtime"] != mtime:
+            try:
+                with open(REGISTRY_PATH, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return _registry["data"], _registry["ring"]
+            _registry.update(mtime=mtime, data=data, ring=HashRing(list(data["workers"])))
+            # Connections to removed workers are dropped lazily
+        return _registry["data"], _registry["ring"]
+
+
+def owner_of(tenant_id: str) -> Optional[str]:
+    _, ring = _load_registry()
+    return ring.owner(tenant_id) if ring else None
+
+
+def _call(tenant_id: str, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Sends message to the tenant's owner on a per-thread persistent
+    connection. None = no pool, owner unreachable, timed out or failed
+    (caller runs locally).
+    """
+    data, ring = _load_registry()
+    if not data or not ring:
+        return None
+
+    owner = ring.owner(tenant_id)
+    addr = data["workers"].get(owner)
+    if addr is None:
+        return None
+
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+
+    for attempt in range(2):
+        conn = conns.get(addr)
+        try:
+            if conn is None:
+                conn = conns[addr] = Client(_address(addr), authkey=bytes.fromhex(data["authkey"]))
+            conn.send(message)
+            if not conn.poll(CALL_TIMEOUT_SECONDS):
+                # Hung worker: a late reply must not be read by the next call
+                _drop(conns, addr, conn)
+                logger.warning(
+                    "Worker timed out, retrieving locally",
+                    extra={"worker": owner, "op": message.get("op"), "timeout_s": CALL_TIMEOUT_SECONDS},
+                )
+                return None
+            reply = conn.recv()
+            break
+        except (OSError, EOFError):
+            _drop(conns, addr, conn)
+            if attempt:
+                logger.warning("Worker unreachable, retrieving locally", extra={"worker": owner})
+                return None
+
+    if not reply.get("ok"):
+        logger.warning(
+            "Worker failed, retrieving locally",
+            extra={"worker": owner, "op": message.get("op"), "error": reply.get("error")},
+        )
+        return None
+    return reply
+
+
+def _drop(conns: Dict[str, Any], addr: str, conn) -> None:
+    conns.pop(addr, None)
+    if conn is not None:
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+
+def remote_retrieve(query: str, k: int, tenant_id: str, scope: Optional[list] = None):
+    """
+    (results, status, timings, embedding) from the owning worker, or
+    None to retrieve locally.
+    """
+    reply = _call(
+        tenant_id, {"op": "retrieve", "query": query, "k": k, "tenant_id": tenant_id, "scope": scope}
+    )
+    if reply is None:
+        return None
+    return reply["results"], reply["status"], reply["timings"], reply.get("embedding")
+
+
+def remote_retrieve_many(queries: List[str], k: int, tenant_id: str, scope: Optional[list] = None):
+    """
+    (batch, timings, embeddings) from the owning worker, or None to
+    retrieve locally.
+    """
+    reply = _call(
+        tenant_id,
+        {"op": "retrieve_many", "queries": queries, "k": k, "tenant_id": tenant_id, "scope": scope},
+    )
+    if reply is None:
+        return None
+    return reply["batch"], reply["timings"], reply.get("embeddings") or [None] * len(queries)
+
+
+def notify_invalidate(tenant_id: str) -> None:
+    if _call(tenant_id, {"op": "invalidate", "tenant_id": tenant_id}) is None:
+        logger.warning("Store invalidation failed", extra={"tenant_id": tenant_id})
+
+
+# =====================================================
+# CLI
+# =====================================================
+def _control(registry_path: str, message: Dict[str, Any]) -> Dict[str, Any]:
+    with open(registry_path, "r", encoding="utf-8") as f:
+        registry = json.load(f)
+    with Client(_address(registry["control"]), authkey=bytes.fromhex(registry["authkey"])) as conn:
+        conn.send(message)
+        return conn.recv()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(prog="python -m app.worker_pool")
+    parser.add_argument("--registry", default=REGISTRY_PATH or DEFAULT_REGISTRY_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="Run the supervisor and N retrieval workers")
+    serve.add_argument("--workers", type=int, default=2)
+    serve.add_argument("--base-port", type=int, default=int(os.getenv("P1_WORKER_POOL_PORT", "8700")))
+
+    scale = sub.add_parser("scale", help="Add or remove workers (tenants are rebalanced)")
+    scale.add_argument("workers", type=int)
+
+    sub.add_parser("status", help="Show the live workers")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        os.makedirs(os.path.dirname(args.registry) or ".", exist_ok=True)
+        Supervisor(args.workers, args.base_port, args.registry).run()
+    elif args.command == "scale":
+        print(json.dumps(_control(args.registry, {"op": "scale", "workers": args.workers})))
+    else:
+        print(json.dumps(_control(args.registry, {"op": "status"})))
+    sys.exit(0)
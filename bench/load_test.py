@@ -0,0 +1,326 @@
+"""
+Load test: replays a JSONL query workload against POST /query.
+
+Each workload line is a /query body ({"query": ..., "conversation_id": ...});
+lines are cycled until --requests have been sent (or --duration elapses).
+
+  target   in-process (default): the FastAPI app via TestClient, no server
+           --url http://host:port: a running server, keep-alive per worker
+  load     --concurrency N workers; --rate R requests/s (open loop, latency
+           counted from the scheduled send time) or closed loop if omitted
+  LLM      P1_LLM_BACKEND=fake with --llm-latency-ms (in-process only; start
+           the server with the same env vars for --url)
+  data     --seed copies docs/*.pdf into the tenant and indexes them once
+
+Reports p50/p95/p99 latency, throughput and mode distribution, and writes
+the JSON to bench/results/ tagged with the git commit for comparisons.
+
+Usage:
+  python -m bench.load_test [--workload bench/workloads/volvo.jsonl]
+      [--url URL] [--concurrency 8] [--rate 20] [--requests 500]
+      [--tenant bench] [--seed] [--llm-latency-ms 300] [--out FILE]
+"""
+import os
+import sys
+import json
+import time
+import glob
+import shutil
+import argparse
+import threading
+import http.client
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from bench import REPO_ROOT, git_commit, percentile
+
+DEFAULT_WORKLOAD = os.path.join("bench", "workloads", "volvo.jsonl")
+RESULTS_DIR = os.path.join("bench", "results")
+
+
+# =====================================================
+# Workload / environment
+# =====================================================
+def _load_workload(path: str) -> List[Dict[str, Any]]:
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if "query" not in item:
+                raise ValueError(f"{path}:{i + 1}: missing 'query'")
+            item.setdefault("conversation_id", f"load-{i}")
+            items.append(item)
+    if not items:
+        raise ValueError(f"{path}: empty workload")
+    return items
+
+
+def _mint_token(tenant_id: str) -> str:
+    from jose import jwt
+
+    secret = os.environ.get("P1_JWT_SECRET")
+    if not secret:
+        raise SystemExit("Set P1_JWT_SECRET (or pass --token)")
+    now = int(time.time())
+    return jwt.encode(
+        {"tenant_id": tenant_id, "iat": now, "exp": now + 24 * 3600},
+        secret,
+        algorithm="HS256",
+    )
+
+
+def _seed_tenant(tenant_id: str) -> None:
+    """
+    Copies the bundled PDFs into the tenant and indexes them
+    (store_vectors skips chunks that are already indexed).
+    """
+    from app.store_vectors import load_and_chunk, store_vectors
+
+    docs_path = os.path.join("data", "tenants", tenant_id, "docs")
+    os.makedirs(docs_path, exist_ok=True)
+    for pdf in sorted(glob.glob(os.path.join(REPO_ROOT, "docs", "*.pdf"))):
+        target = os.path.join(docs_path, os.path.basename(pdf))
+        if not os.path.exists(target):
+            shutil.copyfile(pdf, target)
+
+    store_vectors(tenant_id, load_and_chunk(tenant_id))
+
+
+# =====================================================
+# Clients
+# =====================================================
+class InProcessClient:
+    def __init__(self, token: str):
+        from fastapi.testclient import TestClient
+        from app.api import app
+
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.client = TestClient(app)
+        self.client.__enter__()  # run startup hooks once
+
+    def post(self, body: Dict[str, Any]) -> Tuple[int, bytes]:
+        resp = self.client.post("/query", json=body, headers=self.headers)
+        return resp.status_code, resp.content
+
+    def close(self) -> None:
+        self.client.__exit__(None, None, None)
+
+
+class HttpClient:
+    """
+    One keep-alive connection per worker thread.
+    """
+
+    def __init__(self, url: str, token: str):
+        parsed = urlparse(url)
+        self.https = parsed.scheme == "https"
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port
+        self.path = (parsed.path.rstrip("/") or "") + "/query"
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        }
+        self.local = threading.local()
+
+    def _conn(self) -> http.client.HTTPConnection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = self.local.conn = cls(self.host, self.port, timeout=300)
+        return conn
+
+    def post(self, body: Dict[str, Any]) -> Tuple[int, bytes]:
+        data = json.dumps(body).encode("utf-8")
+        for attempt in range(2):
+            conn = self._conn()
+            try:
+                conn.request("POST", self.path, body=data, headers=self.headers)
+                resp = conn.getresponse()
+                return resp.status, resp.read()
+            except (http.client.HTTPException, ConnectionError):
+                # Server closed an idle keep-alive connection: reconnect once
+                conn.close()
+                self.local.conn = None
+                if attempt:
+                    raise
+        raise RuntimeError("unreachable")
+
+    def close(self) -> None:
+        pass
+
+
+# =====================================================
+# Runner
+# =====================================================
+def run(
+    client,
+    workload: List[Dict[str, Any]],
+    *,
+    concurrency: int,
+    total: int,
+    rate: Optional[float],
+    duration: Optional[float],
+) -> Dict[str, Any]:
+    lock = threading.Lock()
+    next_index = [0]
+    latencies: List[float] = []
+    modes: Counter = Counter()
+    statuses: Counter = Counter()
+    errors: Counter = Counter()
+
+    started = time.perf_counter()
+    stop_at = started + duration if duration else None
+
+    def worker() -> None:
+        while True:
+            with lock:
+                i = next_index[0]
+                if i >= total:
+                    return
+                next_index[0] += 1
+
+            scheduled = started + i / rate if rate else None
+            if scheduled is not None:
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            if stop_at is not None and time.perf_counter() >= stop_at:
+                return
+
+            t0 = scheduled if scheduled is not None else time.perf_counter()
+            try:
+                status, content = client.post(dict(workload[i % len(workload)]))
+                mode = json.loads(content).get("mode") if status == 200 else None
+                error = None
+            except Exception as e:  # noqa: BLE001 - counted, not fatal
+                status, mode, error = None, None, type(e).__name__
+            elapsed = time.perf_counter() - t0
+
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status)] += 1
+                if mode:
+                    modes[mode] += 1
+                if error:
+                    errors[error] += 1
+
+    threads = [
+        threading.Thread(target=worker, name=f"load-{n}", daemon=True)
+        for n in range(concurrency)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    wall = time.perf_counter() - started
+    ordered = sorted(latencies)
+    ok = statuses.get("200", 0)
+
+    return {
+        "requests": len(ordered),
+        "ok": ok,
+        "errors": dict(errors),
+        "status_codes": dict(statuses),
+        "duration_s": round(wall, 3),
+        "throughput_rps": round(len(ordered) / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(ordered, 50) * 1000.0, 2),
+            "p95": round(percentile(ordered, 95) * 1000.0, 2),
+            "p99": round(percentile(ordered, 99) * 1000.0, 2),
+            "mean": round(sum(ordered) / len(ordered) * 1000.0, 2) if ordered else 0.0,
+            "min": round(ordered[0] * 1000.0, 2) if ordered else 0.0,
+            "max": round(ordered[-1] * 1000.0, 2) if ordered else 0.0,
+        },
+        "modes": dict(modes),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench.load_test")
+    parser.add_argument("--workload", default=DEFAULT_WORKLOAD)
+    parser.add_argument("--url", help="Target server (default: in-process app)")
+    parser.add_argument("--token", help="Bearer token (default: minted from P1_JWT_SECRET)")
+    parser.add_argument("--tenant", default="bench")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, help="Requests/second (open loop)")
+    parser.add_argument("--requests", type=int, help="Total requests (default: 10x workload)")
+    parser.add_argument("--duration", type=float, help="Stop after N seconds")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests first")
+    parser.add_argument("--seed", action="store_true", help="Index docs/*.pdf into the tenant first")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--real-llm", action="store_true", help="In-process: keep the configured LLM")
+    parser.add_argument("--out", help="Result file (default: bench/results/load-<stamp>-<commit>.json)")
+    args = parser.parse_args()
+
+    if not args.url:
+        # Must be set before app modules are imported
+        if not args.real_llm:
+            os.environ["P1_LLM_BACKEND"] = "fake"
+            os.environ["P1_FAKE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+        os.environ.setdefault("P1_JWT_SECRET", "bench-secret")
+
+    workload = _load_workload(args.workload)
+    total = args.requests or len(workload) * 10
+    token = args.token or _mint_token(args.tenant)
+
+    if args.seed:
+        _seed_tenant(args.tenant)
+
+    client = HttpClient(args.url, token) if args.url else InProcessClient(token)
+    try:
+        if args.warmup:
+            run(client, workload, concurrency=1, total=args.warmup, rate=None, duration=None)
+        results = run(
+            client,
+            workload,
+            concurrency=args.concurrency,
+            total=total,
+            rate=args.rate,
+            duration=args.duration,
+        )
+    finally:
+        client.close()
+
+    commit, dirty = git_commit()
+    report = {
+        "benchmark": "load_test",
+        "commit": commit,
+        "dirty": dirty,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "config": {
+            "target": args.url or "in-process",
+            "workload": args.workload,
+            "workload_size": len(workload),
+            "tenant": args.tenant,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "requests": total,
+            "duration": args.duration,
+            "llm": "configured" if (args.url or args.real_llm) else f"fake:{args.llm_latency_ms}ms",
+            "ci_mode": os.getenv("CI") == "true",
+        },
+        **results,
+    }
+
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        out = os.path.join(RESULTS_DIR, f"load-{stamp}-{(commit or 'nogit')[:10]}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(report, indent=2))
+    print(f"Results written to {out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
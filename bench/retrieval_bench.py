@@ -0,0 +1,334 @@
+"""
+Ingestion and retrieval micro-benchmarks (app/store_vectors.py, app/retrieve.py).
+
+Each piece is measured on its own, in a scratch data/ directory:
+
+  parse    PDF pages/s (PyPDFLoader over docs/*.pdf)
+  chunk    chunks/s (the ingestion splitter)
+  ingest   load_and_chunk() end to end
+  embed    embeddings/s per batch size (model load reported separately)
+  write    vectors/s into a fresh tenant Chroma store (embeddings precomputed)
+  open     Chroma index open time, cold first query
+  search   single-query search latency (vector search only, and retrieve()
+           end to end with its stage breakdown)
+  snapshot exhaustive snapshot scan vs two-level routing (top-M document
+           groups): latency and recall@6 against the exhaustive scan
+
+write/open/search run at several corpus sizes. Synthetic corpora are the
+real docs/*.pdf chunks repeated with perturbed embeddings, so scores and
+text lengths stay realistic.
+
+Needs the full (non-CI) dependency set. Results are printed and written
+as JSON tagged with the git commit.
+
+Usage:
+  python -m bench.retrieval_bench [--sizes 1000,5000,20000]
+      [--batch-sizes 1,8,32,128] [--queries 50] [--routing-m 4,8,16]
+      [--out FILE]
+"""
+import os
+import sys
+import json
+import time
+import glob
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+os.environ.pop("CI", None)  # retrieve() returns [] in CI mode
+
+from bench import REPO_ROOT, git_commit, percentile  # noqa: E402
+
+DEFAULT_WORKLOAD = os.path.join(REPO_ROOT, "bench", "workloads", "volvo.jsonl")
+RESULTS_DIR = os.path.join(REPO_ROOT, "bench", "results")
+WRITE_BATCH_SIZE = 1000
+
+
+def _latency_summary(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(percentile(ordered, 50) * 1000.0, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000.0, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000.0, 3),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000.0, 3) if ordered else 0.0,
+    }
+
+
+def _rate(count: int, seconds: float) -> float:
+    return round(count / seconds, 2) if seconds > 0 else 0.0
+
+
+def _queries(path: str, n: int) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        queries = [json.loads(line)["query"] for line in f if line.strip()]
+    return [queries[i % len(queries)] for i in range(n)]
+
+
+# =====================================================
+# Ingestion
+# =====================================================
+def bench_ingestion(tenant_id: str) -> Tuple[Dict[str, Any], list]:
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    from app import store_vectors
+
+    docs_path = os.path.join(store_vectors.TENANTS_ROOT, tenant_id, "docs")
+    os.makedirs(docs_path, exist_ok=True)
+    for pdf in sorted(glob.glob(os.path.join(REPO_ROOT, "docs", "*.pdf"))):
+        shutil.copyfile(pdf, os.path.join(docs_path, os.path.basename(pdf)))
+
+    started = time.perf_counter()
+    pages = []
+    for name in sorted(os.listdir(docs_path)):
+        pages.extend(PyPDFLoader(os.path.join(docs_path, name)).load())
+    parse_s = time.perf_counter() - started
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=store_vectors.CHUNK_SIZE,
+        chunk_overlap=store_vectors.CHUNK_OVERLAP,
+    )
+    started = time.perf_counter()
+    chunks = splitter.split_documents(pages)
+    chunk_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    chunks = store_vectors.load_and_chunk(tenant_id)
+    ingest_s = time.perf_counter() - started
+
+    return {
+        "documents": len(os.listdir(docs_path)),
+        "pages": len(pages),
+        "chunks": len(chunks),
+        "parse_s": round(parse_s, 4),
+        "pages_per_s": _rate(len(pages), parse_s),
+        "chunk_s": round(chunk_s, 4),
+        "chunks_per_s": _rate(len(chunks), chunk_s),
+        "load_and_chunk_s": round(ingest_s, 4),
+    }, chunks
+
+
+# =====================================================
+# Embeddings
+# =====================================================
+def bench_embeddings(texts: List[str], batch_sizes: List[int]) -> Tuple[Dict[str, Any], Any]:
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    from app.store_vectors import EMBEDDING_MODEL
+
+    started = time.perf_counter()
+    model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    load_s = time.perf_counter() - started
+    model.embed_documents(texts[:8])  # warm up kernels
+
+    by_batch = {}
+    for batch_size in batch_sizes:
+        model.encode_kwargs = {**(model.encode_kwargs or {}), "batch_size": batch_size}
+        started = time.perf_counter()
+        model.embed_documents(texts)
+        elapsed = time.perf_counter() - started
+        by_batch[str(batch_size)] = {
+            "texts": len(texts),
+            "seconds": round(elapsed, 4),
+            "embeddings_per_s": _rate(len(texts), elapsed),
+        }
+
+    return {"model": EMBEDDING_MODEL, "model_load_s": round(load_s, 4), "by_batch_size": by_batch}, model
+
+
+# =====================================================
+# Synthetic corpora: write / open / search
+# =====================================================
+def _synthetic_corpus(chunks, vectors, size: int, seed: int = 0):
+    """
+    size documents cycled from the real chunks. Copies get a distinct
+    source (store_vectors dedupes on source) and a slightly perturbed,
+    re-normalized embedding so the index is not full of exact duplicates.
+    """
+    import numpy as np
+    from langchain_core.documents import Document
+
+    rng = np.random.default_rng(seed)
+    base = np.asarray(vectors, dtype=np.float32)
+
+    docs, embeddings = [], []
+    for i in range(size):
+        j = i % len(chunks)
+        copy = i // len(chunks)
+        chunk = chunks[j]
+        docs.append(
+            Document(
+                page_content=f"{chunk.page_content}\n[synthetic copy {copy}]",
+                metadata={
+                    **chunk.metadata,
+                    "source": f"{chunk.metadata.get('source')}#copy{copy}",
+                },
+            )
+        )
+        vec = base[j] if copy == 0 else base[j] + rng.normal(0.0, 0.02, base.shape[1]).astype(np.float32)
+        embeddings.append((vec / np.linalg.norm(vec)).tolist())
+    return docs, embeddings
+
+
+def _precomputed(model, docs, embeddings):
+    """
+    Embeddings implementation that serves the synthetic vectors so the
+    write benchmark measures Chroma, not the model.
+    """
+    from langchain_core.embeddings import Embeddings
+
+    table = {d.page_content: e for d, e in zip(docs, embeddings)}
+
+    class Precomputed(Embeddings):
+        def embed_documents(self, texts):
+            return [table[t] for t in texts]
+
+        def embed_query(self, text):
+            return model.embed_query(text)
+
+    return Precomputed()
+
+
+def bench_corpus(
+    size: int, chunks, vectors, model, queries: List[str], top_ms: List[int]
+) -> Dict[str, Any]:
+    from langchain_community.vectorstores import Chroma
+
+    from app import retrieve, snapshot, store_vectors
+    from app.metrics import Timings
+
+    tenant_id = f"bench-{size}"
+    chroma_path = os.path.join(store_vectors.TENANTS_ROOT, tenant_id, "chroma")
+    os.makedirs(chroma_path, exist_ok=True)
+
+    docs, embeddings = _synthetic_corpus(chunks, vectors, size)
+    fast = _precomputed(model, docs, embeddings)
+
+    # write
+    db = Chroma(persist_directory=chroma_path, embedding_function=fast)
+    started = time.perf_counter()
+    for i in range(0, len(docs), WRITE_BATCH_SIZE):
+        db.add_documents(docs[i:i + WRITE_BATCH_SIZE])
+    db.persist()
+    write_s = time.perf_counter() - started
+    del db
+
+    query_vectors = [model.embed_query(q) for q in queries]
+
+    # open (fresh client on the persisted directory) + cold first query
+    started = time.perf_counter()
+    db = Chroma(persist_directory=chroma_path, embedding_function=fast)
+    open_s = time.perf_counter() - started
+    started = time.perf_counter()
+    db.similarity_search_by_vector_with_relevance_scores(query_vectors[0], k=6)
+    first_query_s = time.perf_counter() - started
+
+    # vector search only
+    search = []
+    for vec in query_vectors:
+        started = time.perf_counter()
+        db.similarity_search_by_vector_with_relevance_scores(vec, k=6)
+        search.append(time.perf_counter() - started)
+
+    # retrieve() end to end, as /query calls it
+    e2e, stages = [], {}
+    for q in queries:
+        timings = Timings()
+        started = time.perf_counter()
+        retrieve.retrieve(q, k=6, tenant_id=tenant_id, timings=timings)
+        e2e.append(time.perf_counter() - started)
+        for stage, seconds in timings.stages.items():
+            stages.setdefault(stage, []).append(seconds)
+
+    # compiled snapshot: exhaustive scan vs routed to the top-M groups
+    started = time.perf_counter()
+    compiled = snapshot.compile_snapshot(tenant_id, db._collection)
+    compile_s = time.perf_counter() - started
+    with snapshot.reader(tenant_id) as snap:
+        routing = [snapshot.routing_recall(snap, query_vectors, 6, m) for m in top_ms]
+
+    return {
+        "vectors": size,
+        "write_s": round(write_s, 4),
+        "vectors_per_s": _rate(size, write_s),
+        "index_open_ms": round(open_s * 1000.0, 3),
+        "first_query_ms": round(first_query_s * 1000.0, 3),
+        "search": _latency_summary(search),
+        "retrieve": {
+            **_latency_summary(e2e),
+            "stages_p50_ms": {
+                stage: round(percentile(sorted(values), 50) * 1000.0, 3)
+                for stage, values in stages.items()
+            },
+        },
+        "snapshot": {
+            "compile_s": round(compile_s, 4),
+            "bytes": compiled["bytes"],
+            "groups": compiled["groups"],
+            "routing": routing,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench.retrieval_bench")
+    parser.add_argument("--sizes", default="1000,5000,20000", help="Synthetic corpus sizes")
+    parser.add_argument("--batch-sizes", default="1,8,32,128", help="Embedding batch sizes")
+    parser.add_argument("--queries", type=int, default=50, help="Search queries per corpus")
+    parser.add_argument("--routing-m", default="4,8,16", help="Routing top-M values to compare")
+    parser.add_argument("--workload", default=DEFAULT_WORKLOAD, help="JSONL file the queries come from")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory")
+    parser.add_argument("--out", help="Result file (default: bench/results/retrieval-<stamp>-<commit>.json)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    batch_sizes = [int(s) for s in args.batch_sizes.split(",") if s]
+    top_ms = [int(s) for s in args.routing_m.split(",") if s]
+    queries = _queries(args.workload, args.queries)
+
+    # app.* use paths relative to the working directory (data/tenants/...)
+    scratch = tempfile.mkdtemp(prefix="p1-retrieval-bench-")
+    cwd = os.getcwd()
+    os.chdir(scratch)
+    try:
+        ingestion, chunks = bench_ingestion("bench-ingest")
+        texts = [c.page_content for c in chunks]
+        embedding, model = bench_embeddings(texts, batch_sizes)
+        vectors = model.embed_documents(texts)
+        corpora = [bench_corpus(size, chunks, vectors, model, queries, top_ms) for size in sizes]
+    finally:
+        os.chdir(cwd)
+        if args.keep:
+            print(f"Scratch data kept in {scratch}", file=sys.stderr)
+        else:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    commit, dirty = git_commit()
+    report = {
+        "benchmark": "retrieval_bench",
+        "commit": commit,
+        "dirty": dirty,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "ingestion": ingestion,
+        "embedding": embedding,
+        "corpora": corpora,
+    }
+
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        out = os.path.join(RESULTS_DIR, f"retrieval-{stamp}-{(commit or 'nogit')[:10]}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(report, indent=2))
+    print(f"Results written to {out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
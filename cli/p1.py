@@ -2,14 +2,21 @@
 import argparse
 import json
 import sys
+import time
 import urllib.request
 import urllib.error
 import socket
 import os
-from typing import Any
+import threading
+import http.client
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+from urllib.parse import urlparse
 
 DEFAULT_API_URL = "http://127.0.0.1:8001/query"
 DEFAULT_TIMEOUT = 30
+DEFAULT_CONCURRENCY = 4
 
 
 def fail(msg: str, code: int = 1):
@@ -17,18 +24,20 @@ def fail(msg: str, code: int = 1):
     sys.exit(code)
 
 
-def post_json(url: str, payload: dict[str, Any], timeout: int):
-    data = json.dumps(payload).encode("utf-8")
+def auth_headers() -> dict[str, str]:
+    auth_token = os.getenv("P1_AUTH_TOKEN")
+    if not auth_token:
+        fail("P1_AUTH_TOKEN is not set", code=1)
 
-    headers = {
+    return {
         "Content-Type": "application/json",
+        "Authorization": f"Bearer {auth_token}",
     }
 
-    auth_token = os.getenv("P1_AUTH_TOKEN")
-    if not auth_token:
-        fail("P1_AUTH_TOKEN is not set", code=1)
 
-    headers["Authorization"] = f"Bearer {auth_token}"
+def post_json(url: str, payload: dict[str, Any], timeout: int):
+    data = json.dumps(payload).encode("utf-8")
+    headers = auth_headers()
 
     req = urllib.request.Request(
         url,
@@ -51,6 +60,150 @@ def post_json(url: str, payload: dict[str, Any], timeout: int):
         fail(f"Transport error: {e}", code=1)
 
 
+# =====================================================
+# Batch mode (keep-alive connection per worker thread)
+# =====================================================
+class KeepAliveClient:
+    def __init__(self, url: str, timeout: int):
+        parsed = urlparse(url)
+        self.conn_class = (
+            http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+        )
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port
+        self.path = parsed.path or "/"
+        self.timeout = timeout
+        self.headers = auth_headers()
+        self.local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.conn_class(self.host, self.port, timeout=self.timeout)
+            self.local.conn = conn
+        return conn
+
+    def post(self, payload: dict[str, Any]):
+        data = json.dumps(payload).encode("utf-8")
+        for attempt in range(2):
+            conn = self._conn()
+            try:
+                conn.request("POST", self.path, body=data, headers=self.headers)
+                resp = conn.getresponse()
+                return resp.status, resp.read().decode("utf-8")
+            except (http.client.HTTPException, ConnectionError):
+                # Server dropped an idle keep-alive connection: retry once on a new one
+                conn.close()
+                self.local.conn = None
+                if attempt:
+                    raise
+
+
+def read_batch_lines(path: str):
+    stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        for line in stream:
+            if line.strip():
+                yield line
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def build_batch_payload(line: str, args) -> dict[str, Any]:
+    item = json.loads(line)
+    if not isinstance(item, dict) or not item.get("query"):
+        raise ValueError("each line must be a JSON object with a 'query'")
+
+    conversation_id = item.get("conversation_id") or args.conversation_id
+    if not conversation_id:
+        raise ValueError("missing 'conversation_id' (or pass --conversation-id)")
+
+    payload = {
+        "query": item["query"],
+        "conversation_id": conversation_id,
+        "debug": bool(item.get("debug", args.debug)),
+    }
+    tenant_id = item.get("tenant_id") or args.tenant_id
+    if tenant_id:
+        payload["tenant_id"] = tenant_id
+    return payload
+
+
+def run_batch_item(client: KeepAliveClient, index: int, line: str, args) -> dict[str, Any]:
+    result: dict[str, Any] = {"index": index}
+    try:
+        payload = build_batch_payload(line, args)
+    except ValueError as e:
+        result.update({"status": None, "latency_ms": 0.0, "error": f"Invalid input: {e}"})
+        return result
+
+    started = time.perf_counter()
+    try:
+        status, body = client.post(payload)
+    except (OSError, http.client.HTTPException) as e:
+        result.update({
+            "status": None,
+            "latency_ms": round((time.perf_counter() - started) * 1000.0, 2),
+            "error": f"Transport error: {e}",
+        })
+        return result
+
+    result["status"] = status
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000.0, 2)
+    try:
+        result["response"] = json.loads(body)
+    except ValueError:
+        result["response"] = body
+    return result
+
+
+def run_batch(args) -> int:
+    client = KeepAliveClient(args.api_url, args.timeout)
+    concurrency = max(args.concurrency, 1)
+
+    modes: Counter = Counter()
+    total = ok = 0
+    started = time.perf_counter()
+
+    # Bounded window of in-flight futures; results are written in input order
+    pending: deque = deque()
+
+    def drain(until: int) -> None:
+        nonlocal total, ok
+        while len(pending) > until:
+            result = pending.popleft().result()
+            sys.stdout.write(json.dumps(result, ensure_ascii=False) + "\n")
+            total += 1
+            status = result.get("status")
+            if status is not None and 200 <= status < 300:
+                ok += 1
+                response = result.get("response")
+                if isinstance(response, dict) and response.get("mode"):
+                    modes[response["mode"]] += 1
+            else:
+                modes["error"] += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for index, line in enumerate(read_batch_lines(args.input)):
+            pending.append(pool.submit(run_batch_item, client, index, line, args))
+            drain(concurrency * 4)
+        drain(0)
+
+    sys.stdout.flush()
+    elapsed = time.perf_counter() - started
+    summary = {
+        "total": total,
+        "ok": ok,
+        "failed": total - ok,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed > 0 else 0.0,
+        "modes": dict(modes),
+    }
+    print(json.dumps(summary), file=sys.stderr)
+    return 0 if ok == total else 2
+
+
 def main():
     parser = argparse.ArgumentParser(prog="p1", description="P1 thin CLI (raw JSON passthrough)")
     sub = parser.add_subparsers(dest="command", required=True)
@@ -60,12 +213,25 @@ def main():
     q.add_argument("--conversation-id", required=True)
     q.add_argument("--query", help="Question text")
     q.add_argument("--reset", action="store_true", help='Reset context (maps to query="new topic")')
+    q.add_argument("--document", action="append", help="Restrict retrieval to this document (repeatable)")
     q.add_argument("--debug", action="store_true")
     q.add_argument("--api-url", default=DEFAULT_API_URL)
     q.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT)
 
+    b = sub.add_parser("batch", help="Send many queries from JSONL (one /query body per line)")
+    b.add_argument("--input", default="-", help="JSONL file (default: stdin)")
+    b.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    b.add_argument("--tenant-id", help="Default tenant_id for lines without one")
+    b.add_argument("--conversation-id", help="Default conversation_id for lines without one")
+    b.add_argument("--debug", action="store_true")
+    b.add_argument("--api-url", default=DEFAULT_API_URL)
+    b.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT)
+
     args = parser.parse_args()
 
+    if args.command == "batch":
+        sys.exit(run_batch(args))
+
     if args.command == "query":
         if not args.query and not args.reset:
             fail("Either --query or --reset must be provided", code=1)
@@ -78,6 +244,8 @@ def main():
             "tenant_id": args.tenant_id,
             "debug": bool(args.debug),
         }
+        if args.document:
+            payload["scope"] = [{"document": name} for name in args.document]
 
         status, body = post_json(args.api_url, payload, args.timeout)
 
@@ -4,16 +4,81 @@ set -e
 export CI=${CI:-true}
 
 # To run LOCAL retrieval tests: CI=false ./tests_regression.sh
+#
+# Needs the server's P1_JWT_SECRET (extra tenants' tokens are minted
+# here). Start the server with P1_JWT_KEYS_FILE set to exercise key
+# rotation; this script rewrites that file.
 
-BASE_URL="http://127.0.0.1:8001/query"
+API_URL="http://127.0.0.1:8001"
+BASE_URL="$API_URL/query"
 HEADER_JSON="Content-Type: application/json"
 HEADER_AUTH="Authorization: Bearer ${P1_AUTH_TOKEN}"
 
+REPO_DIR=$(cd "$(dirname "$0")" && pwd)
+# Keeps ids unique when re-run against the same server
+RUN_ID="$(date +%s)$$"
+
 if [ -z "${P1_AUTH_TOKEN}" ]; then
   echo "P1_AUTH_TOKEN is not set"
   exit 1
 fi
 
+if [ -z "${P1_JWT_SECRET}" ]; then
+  echo "P1_JWT_SECRET is not set"
+  exit 1
+fi
+
+# mint_token <tenant_id> [kid] [secret]; MINT_ADMIN=true adds "p1_admin"
+mint_token() {
+  python - "$@" << 'EOF'
+import os, sys, time
+from jose import jwt
+
+tenant_id = sys.argv[1]
+kid = sys.argv[2] if len(sys.argv) > 2 and sys.argv[2] else None
+secret = sys.argv[3] if len(sys.argv) > 3 else os.environ["P1_JWT_SECRET"]
+
+payload = {"tenant_id": tenant_id, "iat": int(time.time()), "exp": int(time.time()) + 3600}
+if os.environ.get("MINT_ADMIN") == "true":
+    payload["p1_admin"] = True
+print(jwt.encode(payload, secret, algorithm="HS256", headers={"kid": kid} if kid else None))
+EOF
+}
+
+ADMIN_AUTH="Authorization: Bearer $(MINT_ADMIN=true mint_token ci)"
+
+# http_status <curl args...>
+http_status() {
+  curl -s -o /dev/null -w '%{http_code}' "$@"
+}
+
+# ask <token> <conversation_id> <query>
+ask() {
+  curl -s -X POST $BASE_URL \
+    -H "$HEADER_JSON" \
+    -H "Authorization: Bearer $1" \
+    -d "$(jq -n --arg q "$3" --arg c "$2" '{query: $q, conversation_id: $c}')"
+}
+
+# wait_for_items <token> <conversation_id> <count>: write-behind lands
+# within a few ms; give it up to 5s
+wait_for_items() {
+  for i in $(seq 1 50); do
+    COUNT=$(curl -s "$API_URL/conversations/$2" -H "Authorization: Bearer $1" | jq '.items | length? // 0')
+    if [ "$COUNT" = "$3" ]; then
+      return 0
+    fi
+    sleep 0.1
+  done
+  echo "conversation $2 has $COUNT items, expected $3"
+  return 1
+}
+
+# etag_of <curl args...>
+etag_of() {
+  curl -s -o /dev/null -D - "$@" | grep -i '^etag:' | cut -d' ' -f2- | tr -d '\r'
+}
+
 echo "===== TEST 1: Direct Answer (CI → hard_refusal) ====="
 RESP=$(curl -s -X POST $BASE_URL \
   -H "$HEADER_JSON" \
@@ -90,6 +155,403 @@ echo "$RESP" | jq -e '.mode == "hard_refusal"' > /dev/null
 echo "$RESP" | jq -e '.answer | test("reset")' > /dev/null
 
 
+echo "===== TEST 6: Write-Behind Flush ====="
+CONV="t_persist_$RUN_ID"
+COMMITTED=$(curl -s "$API_URL/admin/runtime" -H "$ADMIN_AUTH" | jq '.persistence.committed')
+
+RESP=$(ask "$P1_AUTH_TOKEN" "$CONV" "What are Volvo’s core values?")
+echo "$RESP"
+FIRST_ID=$(echo "$RESP" | jq -r '.request_id')
+
+wait_for_items "$P1_AUTH_TOKEN" "$CONV" 1
+RESP=$(curl -s "$API_URL/conversations/$CONV" -H "$HEADER_AUTH")
+echo "$RESP" | jq -e --arg id "$FIRST_ID" '.items[0].request_id == $id' > /dev/null
+echo "$RESP" | jq -e --arg id "$FIRST_ID" '.items[0].response_json | fromjson | .request_id == $id' > /dev/null
+
+RESP=$(curl -s "$API_URL/admin/runtime" -H "$ADMIN_AUTH")
+echo "$RESP" | jq '.persistence'
+echo "$RESP" | jq -e --argjson before "$COMMITTED" '.persistence.committed > $before' > /dev/null
+echo "$RESP" | jq -e '.persistence.failed == 0' > /dev/null
+
+
+echo "===== TEST 7: ETag / 304 on Read APIs ====="
+for URL in "$API_URL/conversations" "$API_URL/conversations/$CONV"; do
+  ETAG=$(etag_of "$URL" -H "$HEADER_AUTH")
+  echo "$URL -> $ETAG"
+  [ -n "$ETAG" ]
+  [ "$(http_status "$URL" -H "$HEADER_AUTH" -H "If-None-Match: $ETAG")" = "304" ]
+done
+
+ETAG=$(etag_of "$API_URL/conversations/$CONV" -H "$HEADER_AUTH")
+RESP=$(ask "$P1_AUTH_TOKEN" "$CONV" "How are Volvo’s values communicated to customers?")
+SECOND_ID=$(echo "$RESP" | jq -r '.request_id')
+SECOND_AT=$(echo "$RESP" | jq -r '.created_at')
+wait_for_items "$P1_AUTH_TOKEN" "$CONV" 2
+
+# A write changes the validator: the old ETag gets a full 200
+[ "$(http_status "$API_URL/conversations/$CONV" -H "$HEADER_AUTH" -H "If-None-Match: $ETAG")" = "200" ]
+[ "$(etag_of "$API_URL/conversations/$CONV" -H "$HEADER_AUTH")" != "$ETAG" ]
+
+
+echo "===== TEST 8: Export (NDJSON, since) ====="
+RESP=$(curl -s "$API_URL/conversations/export" -H "$HEADER_AUTH")
+echo "$RESP" | jq -s -e --arg c "$CONV" --arg a "$FIRST_ID" --arg b "$SECOND_ID" \
+  '[.[] | select(.conversation_id == $c) | .request_id] == [$a, $b]' > /dev/null
+
+RESP=$(curl -s -G "$API_URL/conversations/export" -H "$HEADER_AUTH" --data-urlencode "since=$SECOND_AT")
+echo "$RESP" | jq -s -e --arg c "$CONV" --arg b "$SECOND_ID" \
+  '[.[] | select(.conversation_id == $c) | .request_id] == [$b]' > /dev/null
+echo "$RESP" | jq -s -e --arg since "$SECOND_AT" 'all(.[]; .created_at >= $since)' > /dev/null
+
+# A naive timestamp is read as UTC
+NAIVE_AT="${SECOND_AT%+00:00}"
+RESP=$(curl -s -G "$API_URL/conversations/export" -H "$HEADER_AUTH" --data-urlencode "since=$NAIVE_AT")
+echo "$RESP" | jq -s -e --arg c "$CONV" --arg b "$SECOND_ID" \
+  '[.[] | select(.conversation_id == $c) | .request_id] == [$b]' > /dev/null
+
+[ "$(http_status "$API_URL/conversations/export?since=yesterday" -H "$HEADER_AUTH")" = "400" ]
+
+
+echo "===== TEST 9: Legacy and kid Tokens ====="
+# No kid: verified with P1_JWT_SECRET
+TOKEN=$(mint_token ci)
+[ "$(http_status "$API_URL/conversations" -H "Authorization: Bearer $TOKEN")" = "200" ]
+
+# kid not in the keys file: falls back to P1_JWT_SECRET
+TOKEN=$(mint_token ci "ci-unknown-$RUN_ID")
+[ "$(http_status "$API_URL/conversations" -H "Authorization: Bearer $TOKEN")" = "200" ]
+
+TOKEN=$(mint_token ci "ci-unknown-$RUN_ID" "not-the-secret")
+[ "$(http_status "$API_URL/conversations" -H "Authorization: Bearer $TOKEN")" = "401" ]
+
+if [ -n "${P1_JWT_KEYS_FILE}" ]; then
+  echo '{"keys": {"ci-k1": "ci-rotation-1"}}' > "$P1_JWT_KEYS_FILE"
+  K1_TOKEN=$(mint_token ci ci-k1 ci-rotation-1)
+  [ "$(http_status "$API_URL/conversations" -H "Authorization: Bearer $K1_TOKEN")" = "200" ]
+
+  # Rotate: k1 stops working at once (even though it is cached), k2
+  # and legacy tokens work
+  echo '{"keys": {"ci-k2": "ci-rotation-2"}}' > "$P1_JWT_KEYS_FILE"
+  K2_TOKEN=$(mint_token ci ci-k2 ci-rotation-2)
+  [ "$(http_status "$API_URL/conversations" -H "Authorization: Bearer $K1_TOKEN")" = "401" ]
+  [ "$(http_status "$API_URL/conversations" -H "Authorization: Bearer $K2_TOKEN")" = "200" ]
+  [ "$(http_status "$API_URL/conversations" -H "$HEADER_AUTH")" = "200" ]
+
+  # A deleted keys file revokes its kids (no stale keys kept in memory)
+  rm -f "$P1_JWT_KEYS_FILE"
+  [ "$(http_status "$API_URL/conversations" -H "Authorization: Bearer $K2_TOKEN")" = "401" ]
+  [ "$(http_status "$API_URL/conversations" -H "$HEADER_AUTH")" = "200" ]
+else
+  echo "(P1_JWT_KEYS_FILE not set: key rotation skipped)"
+fi
+
+
+echo "===== TEST 10: Migration from a Baseline DB ====="
+# A tenant DB as the first release wrote it (user_version 0, no title
+# column, response_json stored), migrated on first access
+BASELINE_TENANT="ci_baseline_$RUN_ID"
+EXPECTED=$(python - "$BASELINE_TENANT" << 'EOF'
+import os, sys, json, sqlite3
+
+tenant_id = sys.argv[1]
+os.makedirs(os.path.join("data", "tenants", tenant_id))
+conn = sqlite3.connect(os.path.join("data", "tenants", tenant_id, "p1.db"))
+conn.executescript("""
+CREATE TABLE conversations (
+  tenant_id TEXT NOT NULL,
+  conversation_id TEXT NOT NULL,
+  created_at TEXT NOT NULL,
+  last_activity_at TEXT NOT NULL,
+  PRIMARY KEY (tenant_id, conversation_id)
+);
+
+CREATE TABLE queries (
+  tenant_id TEXT NOT NULL,
+  request_id TEXT NOT NULL,
+  conversation_id TEXT NOT NULL,
+  created_at TEXT NOT NULL,
+  query TEXT NOT NULL,
+  mode TEXT NOT NULL,
+  answer TEXT NOT NULL,
+  citations_json TEXT NOT NULL,
+  artifacts_json TEXT NOT NULL,
+  debug_json TEXT,
+  response_json TEXT NOT NULL,
+  PRIMARY KEY (tenant_id, request_id),
+  FOREIGN KEY (tenant_id, conversation_id)
+    REFERENCES conversations(tenant_id, conversation_id)
+    ON DELETE CASCADE
+);
+
+CREATE INDEX idx_queries_conv_created
+  ON queries(tenant_id, conversation_id, created_at);
+""")
+
+citation = {"source": "volvo.pdf", "page": 3, "score": 0.42, "snippet": "Safety, quality and care for the environment."}
+responses = [
+    {
+        "request_id": "baseline-1",
+        "created_at": "2024-01-01T10:00:00+00:00",
+        "tenant_id": tenant_id,
+        "conversation_id": "legacy",
+        "query": "What are Volvo's core values?",
+        "mode": "direct_answer",
+        "answer": "Safety, quality and environmental care.",
+        "citations": [citation],
+        "artifacts": {},
+        "debug": None,
+    },
+    {
+        "request_id": "baseline-2",
+        "created_at": "2024-01-01T10:05:00+00:00",
+        "tenant_id": tenant_id,
+        "conversation_id": "legacy",
+        "query": "Where is safety described?",
+        "mode": "direct_answer",
+        "answer": "In the values section.",
+        "citations": [citation],
+        "artifacts": {},
+        "debug": {"retrieved": 1},
+    },
+]
+
+conn.execute(
+    "INSERT INTO conversations VALUES (?, 'legacy', ?, ?)",
+    (tenant_id, responses[0]["created_at"], responses[-1]["created_at"]),
+)
+for r in responses:
+    conn.execute(
+        "INSERT INTO queries VALUES (?, ?, 'legacy', ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            tenant_id, r["request_id"], r["created_at"], r["query"], r["mode"], r["answer"],
+            json.dumps(r["citations"]), json.dumps(r["artifacts"]),
+            json.dumps(r["debug"]) if r["debug"] is not None else None,
+            json.dumps(r),
+        ),
+    )
+conn.commit()
+conn.close()
+print(json.dumps(responses))
+EOF
+)
+BASELINE_TOKEN=$(mint_token "$BASELINE_TENANT")
+
+RESP=$(curl -s "$API_URL/conversations" -H "Authorization: Bearer $BASELINE_TOKEN")
+echo "$RESP"
+echo "$RESP" | jq -e '.conversations | length == 1' > /dev/null
+echo "$RESP" | jq -e '.conversations[0].title == "Volvo'"'"'s Core Values"' > /dev/null
+
+# Rows written before compaction read back unchanged
+RESP=$(curl -s "$API_URL/conversations/legacy" -H "Authorization: Bearer $BASELINE_TOKEN")
+echo "$RESP" | jq -e --argjson expected "$EXPECTED" '[.items[].response_json | fromjson] == $expected' > /dev/null
+
+RESP=$(curl -s "$API_URL/conversations/export" -H "Authorization: Bearer $BASELINE_TOKEN")
+echo "$RESP" | jq -s -e --argjson expected "$EXPECTED" '. == $expected' > /dev/null
+
+STATUS=$(http_status -G "$API_URL/conversations/search" -H "Authorization: Bearer $BASELINE_TOKEN" --data-urlencode "q=safety")
+if [ "$STATUS" = "200" ]; then
+  RESP=$(curl -s -G "$API_URL/conversations/search" -H "Authorization: Bearer $BASELINE_TOKEN" --data-urlencode "q=safety")
+  echo "$RESP" | jq -e '[.hits[].request_id] | sort == ["baseline-1", "baseline-2"]' > /dev/null
+else
+  # SQLite built without FTS5
+  [ "$STATUS" = "501" ]
+fi
+
+# New writes land in the migrated schema
+ask "$BASELINE_TOKEN" legacy "Tell me more" > /dev/null
+wait_for_items "$BASELINE_TOKEN" legacy 3
+
+python - "$BASELINE_TENANT" << 'EOF'
+import os, sys, sqlite3
+from app.persist import SCHEMA_VERSION
+
+conn = sqlite3.connect(os.path.join("data", "tenants", sys.argv[1], "p1.db"))
+version = conn.execute("PRAGMA user_version").fetchone()[0]
+assert version == SCHEMA_VERSION, (version, SCHEMA_VERSION)
+EOF
+
+
+echo "===== TEST 11: Write-Behind Failure and Retry (in-process) ====="
+# Two transient "database is locked" errors are retried; a row that
+# fails on its own is isolated and reported, the rest of its batch lands
+(cd "$(mktemp -d)" && PYTHONPATH="$REPO_DIR" \
+  P1_PERSIST_FLUSH_INTERVAL_MS=200 P1_PERSIST_RETRY_BACKOFF_MS=1 python - << 'EOF'
+import sqlite3
+from app import persist_queue
+from app.persist import save_query_results
+
+calls = {"n": 0}
+
+def flaky_save(*, tenant_id, items):
+    calls["n"] += 1
+    if calls["n"] <= 2:
+        raise sqlite3.OperationalError("database is locked")
+    if any(payload["query"] == "poison" for _, payload in items):
+        raise ValueError("unwritable row")
+    save_query_results(tenant_id=tenant_id, items=items)
+
+persist_queue.save_query_results = flaky_save
+
+for i, query in enumerate(["first", "poison", "third"]):
+    persist_queue.submit({
+        "request_id": f"wb-{i}",
+        "created_at": f"2024-01-01T00:00:0{i}+00:00",
+        "tenant_id": "ci_writeback",
+        "conversation_id": "wb",
+        "query": query,
+        "mode": "hard_refusal",
+        "answer": "",
+        "citations": [],
+        "artifacts": {},
+        "debug": None,
+    })
+
+assert persist_queue.flush(10.0)
+stats = persist_queue.stats()
+assert stats["retries"] == 2, stats
+assert stats["committed"] == 2 and stats["failed"] == 1, stats
+assert [f["request_id"] for f in persist_queue.recent_failures()] == ["wb-1"]
+
+conn = sqlite3.connect("data/tenants/ci_writeback/p1.db")
+rows = [r[0] for r in conn.execute("SELECT request_id FROM queries ORDER BY created_at")]
+assert rows == ["wb-0", "wb-2"], rows
+persist_queue.shutdown()
+EOF
+)
+
+
+echo "===== TEST 12: Snapshot vs Chroma Results (in-process) ====="
+(cd "$(mktemp -d)" && PYTHONPATH="$REPO_DIR" python - << 'EOF'
+try:
+    import numpy as np
+    import chromadb
+except ImportError:
+    print("(numpy/chromadb not installed: skipped)")
+    raise SystemExit(0)
+
+from app import snapshot
+
+rng = np.random.default_rng(7)
+vectors = rng.standard_normal((300, 32)).astype(np.float32)
+# Some chunks have no page: page-bounded scopes must leave them out
+metadatas = [
+    {"source": f"doc{i % 7}.pdf"} if i % 11 == 0 else {"source": f"doc{i % 7}.pdf", "page": i // 7}
+    for i in range(300)
+]
+
+client = chromadb.PersistentClient(path="chroma")
+# A wide search beam makes HNSW exact at this size
+collection = client.create_collection("ci", metadata={"hnsw:search_ef": 300})
+collection.add(
+    ids=[f"c{i}" for i in range(300)],
+    embeddings=vectors.tolist(),
+    documents=[f"chunk {i}" for i in range(300)],
+    metadatas=metadatas,
+)
+
+assert snapshot.compile_snapshot("ci_snapshot", collection) is not None
+snap = snapshot.acquire("ci_snapshot")
+queries = rng.standard_normal((20, 32)).astype(np.float32)
+
+def check(hits, expected):
+    for qi, rows in enumerate(hits):
+        chunks = [snap.chunk(row) for row, _ in rows]
+        assert [text for text, _ in chunks] == expected["documents"][qi]
+        assert [meta for _, meta in chunks] == expected["metadatas"][qi]
+        assert np.allclose([d for _, d in rows], expected["distances"][qi], rtol=1e-4, atol=1e-4)
+
+include = ["documents", "metadatas", "distances"]
+check(snap.search(queries, 5), collection.query(query_embeddings=queries.tolist(), n_results=5, include=include))
+
+# Scoped search matches the metadata filter retrieval sends to Chroma
+from app.retrieve import _chroma_where
+
+for scope in (
+    [("doc3.pdf", None, None)],
+    [("doc3.pdf", 10, 30)],
+    [("doc3.pdf", None, 20)],
+    [("doc3.pdf", 25, None)],
+    [("doc1.pdf", None, 5), ("doc5.pdf", 30, None)],
+):
+    check(
+        snap.search(queries, 5, scope=scope),
+        collection.query(
+            query_embeddings=queries.tolist(), n_results=5, include=include, where=_chroma_where(scope)
+        ),
+    )
+snapshot.release(snap)
+EOF
+)
+
+
+echo "===== TEST 13: Metrics Need a Privileged Token ====="
+# Series are labelled with every tenant's id
+TOKEN=$(mint_token "ci_other_$RUN_ID")
+[ "$(http_status "$API_URL/metrics" -H "Authorization: Bearer $TOKEN")" = "403" ]
+curl -s "$API_URL/metrics" -H "$ADMIN_AUTH" | grep -q '^p1_query_seconds'
+
+
+echo "===== TEST 14: Health Is Liveness Only ====="
+# Unauthenticated: no tenant ids or queue internals
+curl -s "$API_URL/health" | jq -e '. == {"status": "ok"}' > /dev/null
+curl -s "$API_URL/ready" | jq -e 'has("tenants") or has("tenant_errors") | not' > /dev/null
+[ "$(http_status "$API_URL/admin/runtime" -H "Authorization: Bearer $TOKEN")" = "403" ]
+curl -s "$API_URL/admin/runtime" -H "$ADMIN_AUTH" | jq -e 'has("admission") and has("db_pool")' > /dev/null
+
+
+echo "===== TEST 15: Search Snippets Are Escaped ====="
+CONV="t_search_$RUN_ID"
+TERM="xsscheck$RUN_ID"
+ask "$P1_AUTH_TOKEN" "$CONV" "<script>alert(1)</script> $TERM" > /dev/null
+wait_for_items "$P1_AUTH_TOKEN" "$CONV" 1
+
+STATUS=$(http_status -G "$API_URL/conversations/search" -H "$HEADER_AUTH" --data-urlencode "q=$TERM")
+if [ "$STATUS" = "200" ]; then
+  RESP=$(curl -s -G "$API_URL/conversations/search" -H "$HEADER_AUTH" --data-urlencode "q=$TERM")
+  echo "$RESP"
+  echo "$RESP" | jq -e --arg t "$TERM" \
+    '.hits[0].query_snippet == "&lt;script&gt;alert(1)&lt;/script&gt; <mark>\($t)</mark>"' > /dev/null
+else
+  [ "$STATUS" = "501" ]
+fi
+
+
+echo "===== TEST 16: Retention Vacuum (in-process) ====="
+# Scheduled runs never VACUUM an old DB; freed_pages is what the
+# freelist actually lost
+(cd "$(mktemp -d)" && PYTHONPATH="$REPO_DIR" P1_RETENTION_STEP_PAUSE_MS=0 python - << 'EOF'
+import os, sqlite3
+from app import db_pool, retention
+from app.persist import init_db
+
+os.makedirs("data/tenants/ci_old")
+conn = sqlite3.connect("data/tenants/ci_old/p1.db")
+conn.execute("PRAGMA auto_vacuum=NONE")
+conn.execute("CREATE TABLE filler (b)")
+conn.commit()
+conn.close()
+
+report = retention.run_retention("ci_old", days=30)
+assert report["vacuum_skipped"] and not report["converted_to_incremental_vacuum"], report
+report = retention.run_retention("ci_old", days=30, convert_vacuum=True)
+assert report["converted_to_incremental_vacuum"] and report["vacuum_skipped"] is None, report
+
+db_path = init_db("ci_new")
+with db_pool.connection(db_path) as conn:
+    conn.execute("CREATE TABLE filler (b)")
+    conn.executemany("INSERT INTO filler VALUES (?)", [(os.urandom(2000),) for _ in range(2000)])
+    conn.execute("DROP TABLE filler")
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+report = retention.run_retention("ci_new", days=30)
+assert free_pages > 0 and report["freed_pages"] == free_pages, (free_pages, report)
+EOF
+)
+
+
+rm -rf "data/tenants/$BASELINE_TENANT"
+
+
 if [ "${CI}" != "true" ]; then
   echo "===== LOCAL TEST: Additional Resources ====="
   RESP=$(curl -s -X POST $BASE_URL \
@@ -21,6 +21,12 @@ function App() {
   const [isProcessing, setIsProcessing] = useState(false);
   const [documents, setDocuments] = useState<Document[]>([]);
   const [conversations, setConversations] = useState<Conversation[]>([]);
+  const [conversationsCursor, setConversationsCursor] = useState<
+    string | null
+  >(null);
+  const [isLoadingMoreConversations, setIsLoadingMoreConversations] =
+    useState(false);
+  const [isLoadingMoreTurns, setIsLoadingMoreTurns] = useState(false);
   const [selectedConversationId, setSelectedConversationId] = useState<
     string | null
   >(null);
@@ -86,8 +92,9 @@ function App() {
   const loadConversations = async () => {
     setIsLoadingConversations(true);
     try {
-      const convs = await api.listConversations();
-      setConversations(convs);
+      const page = await api.listConversations();
+      setConversations(page.conversations);
+      setConversationsCursor(page.next_cursor);
     } catch (error) {
       toast.error("Failed to load conversations");
     } finally {
@@ -95,6 +102,48 @@ function App() {
     }
   };
 
+  const loadMoreConversations = async () => {
+    if (!conversationsCursor || isLoadingMoreConversations) return;
+    setIsLoadingMoreConversations(true);
+    try {
+      const page = await api.listConversations(conversationsCursor);
+      setConversations((prev) => [...prev, ...page.conversations]);
+      setConversationsCursor(page.next_cursor);
+    } catch (error) {
+      toast.error("Failed to load conversations");
+    } finally {
+      setIsLoadingMoreConversations(false);
+    }
+  };
+
+  const loadMoreTurns = async () => {
+    const detail = selectedConversationDetail;
+    if (!detail?.next_cursor || isLoadingMoreTurns) return;
+    setIsLoadingMoreTurns(true);
+    try {
+      const page = await api.getConversation(
+        detail.conversation_id,
+        detail.next_cursor,
+      );
+      if (page) {
+        setSelectedConversationDetail((prev) =>
+          prev && prev.conversation_id === page.conversation_id
+            ? {
+                ...prev,
+                last_activity_at: page.last_activity_at,
+                turns: [...(prev.turns ?? []), ...(page.turns ?? [])],
+                next_cursor: page.next_cursor,
+              }
+            : prev,
+        );
+      }
+    } catch (error) {
+      toast.error("Failed to load conversation details");
+    } finally {
+      setIsLoadingMoreTurns(false);
+    }
+  };
+
   const handleNewConversation = () => {
     setSelectedConversationId(null);
     setSelectedConversationDetail(null);
@@ -395,6 +444,9 @@ function App() {
               onOpenSettings={() => setIsSettingsOpen(true)}
               isLoadingDocuments={isLoadingDocuments}
               isLoadingConversations={isLoadingConversations}
+              hasMoreConversations={conversationsCursor !== null}
+              onLoadMoreConversations={loadMoreConversations}
+              isLoadingMoreConversations={isLoadingMoreConversations}
               isCollapsed={isSidebarCollapsed}
               onToggleCollapse={() =>
                 setIsSidebarCollapsed(!isSidebarCollapsed)
@@ -421,6 +473,9 @@ function App() {
             onDeleteDocument={handleRequestDeleteDocument}
             isLoadingDocuments={isLoadingDocuments}
             isLoadingConversations={isLoadingConversations}
+            hasMoreConversations={conversationsCursor !== null}
+            onLoadMoreConversations={loadMoreConversations}
+            isLoadingMoreConversations={isLoadingMoreConversations}
             showDocumentBadges={settings.showDocumentBadges}
             confirmBeforeDelete={settings.confirmBeforeDelete}
           />
@@ -456,6 +511,8 @@ function App() {
                 onClose={handleCloseConversation}
                 onSubmitQuery={handleSubmitQuery}
                 isProcessing={isProcessing}
+                onLoadMore={loadMoreTurns}
+                isLoadingMore={isLoadingMoreTurns}
               />
             ) : null}
           </div>
@@ -7,9 +7,11 @@ interface ConversationViewerProps {
   onClose: () => void;
   onSubmitQuery?: (query: string) => Promise<void>;
   isProcessing?: boolean;
+  onLoadMore?: () => void;
+  isLoadingMore?: boolean;
 }
 
-export function ConversationViewer({ conversation, onClose, onSubmitQuery, isProcessing = false }: ConversationViewerProps) {
+export function ConversationViewer({ conversation, onClose, onSubmitQuery, isProcessing = false, onLoadMore, isLoadingMore = false }: ConversationViewerProps) {
   const [hoveredQueries, setHoveredQueries] = useState<Set<number>>(new Set());
   const [query, setQuery] = useState('');
   const [isFocused, setIsFocused] = useState(false);
@@ -78,7 +80,7 @@ export function ConversationViewer({ conversation, onClose, onSubmitQuery, isPro
 
       <div className="flex-1 overflow-y-auto p-4 lg:p-8 pb-32 lg:pb-8">
         <div className="max-w-3xl mx-auto space-y-6 lg:space-y-8">
-          {conversation.turns.map((turn, idx) => (
+          {(conversation.turns ?? []).map((turn, idx) => (
             <div key={idx} className="space-y-3 lg:space-y-4 animate-in fade-in slide-in-from-bottom-4 duration-300 lg:duration-500" style={{ animationDelay: `${idx * 30}ms` }}>
               {/* User's Question */}
               <div>
@@ -134,6 +136,19 @@ export function ConversationViewer({ conversation, onClose, onSubmitQuery, isPro
               </div>
             </div>
           ))}
+
+          {/* Later turns are fetched a page at a time */}
+          {conversation.next_cursor && onLoadMore && (
+            <div className="text-center">
+              <button
+                onClick={onLoadMore}
+                disabled={isLoadingMore}
+                className="px-4 py-2 text-xs lg:text-sm text-primary hover:text-primary/80 rounded-lg hover:bg-primary/5 transition-all duration-200 disabled:opacity-50"
+              >
+                {isLoadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            </div>
+          )}
         </div>
       </div>
 
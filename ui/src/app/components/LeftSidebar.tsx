@@ -17,6 +17,9 @@ interface LeftSidebarProps {
   onOpenSettings: () => void;
   isLoadingDocuments?: boolean;
   isLoadingConversations?: boolean;
+  hasMoreConversations?: boolean;
+  onLoadMoreConversations?: () => void;
+  isLoadingMoreConversations?: boolean;
   isCollapsed?: boolean;
   onToggleCollapse?: () => void;
   showDocumentBadges?: boolean;
@@ -37,6 +40,9 @@ export function LeftSidebar({
   onOpenSettings,
   isLoadingDocuments = false,
   isLoadingConversations = false,
+  hasMoreConversations = false,
+  onLoadMoreConversations,
+  isLoadingMoreConversations = false,
   isCollapsed = false,
   onToggleCollapse,
   showDocumentBadges = true,
@@ -712,6 +718,24 @@ export function LeftSidebar({
                       </button>
                     </div>
                   )}
+
+                  {/* Next page from the server (list is keyset-paginated) */}
+                  {hasMoreConversations &&
+                    onLoadMoreConversations &&
+                    (showAllConversations ||
+                      filteredConversations.length <= MAX_ITEMS_PREVIEW) && (
+                      <div className="px-2 mt-1">
+                        <button
+                          onClick={onLoadMoreConversations}
+                          disabled={isLoadingMoreConversations}
+                          className="w-full text-xs text-primary hover:text-primary/80 py-2 px-3 rounded-lg hover:bg-primary/5 transition-all duration-200 disabled:opacity-50"
+                        >
+                          {isLoadingMoreConversations
+                            ? "Loading..."
+                            : "Load older conversations"}
+                        </button>
+                      </div>
+                    )}
                 </>
               )}
             </div>
@@ -18,6 +18,9 @@ interface MobileDrawerProps {
   onDeleteDocument: (documentId: string) => void;
   isLoadingDocuments?: boolean;
   isLoadingConversations?: boolean;
+  hasMoreConversations?: boolean;
+  onLoadMoreConversations?: () => void;
+  isLoadingMoreConversations?: boolean;
   showDocumentBadges?: boolean;
   confirmBeforeDelete?: boolean;
 }
@@ -37,6 +40,9 @@ export function MobileDrawer({
   onDeleteDocument,
   isLoadingDocuments = false,
   isLoadingConversations = false,
+  hasMoreConversations = false,
+  onLoadMoreConversations,
+  isLoadingMoreConversations = false,
   showDocumentBadges = true,
   confirmBeforeDelete = true,
 }: MobileDrawerProps) {
@@ -203,6 +209,9 @@ export function MobileDrawer({
           }}
           isLoadingDocuments={isLoadingDocuments}
           isLoadingConversations={isLoadingConversations}
+          hasMoreConversations={hasMoreConversations}
+          onLoadMoreConversations={onLoadMoreConversations}
+          isLoadingMoreConversations={isLoadingMoreConversations}
           isCollapsed={false}
           onToggleCollapse={onClose}
           showDocumentBadges={showDocumentBadges}
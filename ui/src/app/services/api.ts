@@ -7,6 +7,7 @@ import {
   ConversationsListResponse,
   ConversationDetail,
   Conversation,
+  ConversationPage,
   ConversationTurn,
   DocumentsListResponse,
   Document,
@@ -152,31 +153,46 @@ export const api = {
   },
 
   // ---------------- Conversations ----------------
-  async listConversations(): Promise<Conversation[]> {
+  // One keyset page (most recent first); pass next_cursor to load more
+  async listConversations(cursor?: string | null): Promise<ConversationPage> {
     try {
-      const response =
-        await apiCall<ConversationsListResponse>("/conversations");
-
-      return response.conversations.map((conv) => ({
-        conversation_id: conv.conversation_id,
-        created_at: conv.created_at,
-        last_activity_at: conv.last_activity_at,
-        title: conv.title,
-        turns: [],
-      }));
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+      const page = await apiCall<ConversationsListResponse>(
+        `/conversations${query}`,
+      );
+
+      return {
+        conversations: page.conversations.map((conv) => ({
+          conversation_id: conv.conversation_id,
+          created_at: conv.created_at,
+          last_activity_at: conv.last_activity_at,
+          title: conv.title,
+          turns: [],
+        })),
+        next_cursor: page.next_cursor,
+      };
     } catch (error) {
       console.error("Error listing conversations:", error);
-      return [];
+      return { conversations: [], next_cursor: null };
     }
   },
 
-  async getConversation(conversationId: string): Promise<Conversation | null> {
+  // One page of turns (oldest first); pass next_cursor to load more
+  async getConversation(
+    conversationId: string,
+    cursor?: string | null,
+  ): Promise<Conversation | null> {
     try {
+      // Skip the raw response_json blob
+      const fields =
+        "query,mode,answer,citations_json,artifacts_json,debug_json";
+      const query = cursor ? `&cursor=${encodeURIComponent(cursor)}` : "";
       const response = await apiCall<ConversationDetail>(
-        `/conversations/${conversationId}`,
+        `/conversations/${conversationId}?fields=${fields}${query}`,
       );
+      const items = response.items;
 
-      const turns: ConversationTurn[] = response.items.map((item) => {
+      const turns: ConversationTurn[] = items.map((item) => {
         const citations = item.citations_json
           ? JSON.parse(item.citations_json)
           : [];
@@ -201,16 +217,16 @@ export const api = {
         };
       });
 
-      const created_at =
-        response.items[0]?.created_at || new Date().toISOString();
+      const created_at = items[0]?.created_at || new Date().toISOString();
       const last_activity_at =
-        response.items[response.items.length - 1]?.created_at || created_at;
+        items[items.length - 1]?.created_at || created_at;
 
       return {
         conversation_id: response.conversation_id,
         created_at,
         last_activity_at,
         turns,
+        next_cursor: response.next_cursor,
       };
     } catch (error) {
       console.error("Error getting conversation:", error);
@@ -48,8 +48,9 @@ export interface ConversationDetail {
     citations_json: string;
     artifacts_json: string;
     debug_json: string | null;
-    response_json: string;
+    response_json?: string;
   }>;
+  next_cursor: string | null;
 }
 
 // Backend response from GET /conversations
@@ -63,6 +64,7 @@ export interface ConversationListItem {
 export interface ConversationsListResponse {
   tenant_id: string;
   conversations: ConversationListItem[];
+  next_cursor: string | null;
 }
 
 // Derived type for UI consumption
@@ -72,6 +74,14 @@ export interface Conversation {
   last_activity_at: string;
   title?: string;
   turns?: ConversationTurn[];
+  // Detail only: cursor for the next page of turns (null = complete)
+  next_cursor?: string | null;
+}
+
+// One page of the conversation list
+export interface ConversationPage {
+  conversations: Conversation[];
+  next_cursor: string | null;
 }
 
 // Backend response from GET /tenants/{id}/documents